@@ -8,16 +8,23 @@ if sys.platform == 'win32':
     # Désactiver les émojis sur Windows pour éviter UnicodeEncodeError
     os.environ['PYTHONIOENCODING'] = 'utf-8'
 
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, render_template, request, jsonify, send_from_directory, Response, stream_with_context
 from werkzeug.utils import secure_filename
 from config import UPLOAD_FOLDER, ALLOWED_EXTENSIONS, MAX_CONTENT_LENGTH, DOLIBARR_BASE_URL
 from csv_parser import BankStatementParser
 from dolibarr_client import DolibarrClient
+from async_dolibarr_client import AsyncDolibarrClient, DolibarrSyncFacade
 from matcher import TransactionMatcher
+from thirdparty_directory import ThirdpartyDirectory
+from grouped_payments import grouped_payment_matches
+from partial_payments import PartialPaymentAggregator
+from incremental_matching import IncrementalMatcher
+from invoice_mirror import InvoiceMirror
 from database import Database
 from pdf_extractor import PdfExtractor
 from datetime import datetime
 import json
+import time
 import pandas as pd
 import numpy as np
 
@@ -37,10 +44,33 @@ os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 # Initialiser les clients
 parser = BankStatementParser()
 dolibarr = DolibarrClient()
+# Client asyncio : appels Dolibarr indépendants d'une même route lancés en parallèle
+dolibarr_async = DolibarrSyncFacade(AsyncDolibarrClient(dolibarr))
 matcher = TransactionMatcher()
 db = Database()
+# Miroir local des factures Dolibarr (synchronisé sur leur date de modification)
+invoice_mirror = InvoiceMirror(dolibarr)
+# Index des références (recherche par référence) construit depuis le miroir, sans téléchargement
+dolibarr.invoice_source = invoice_mirror
 pdf_extractor = PdfExtractor()
 
+# Annuaire des tiers Dolibarr pour la recherche par nom (rafraîchi sur leur date de modification)
+thirdparty_directory = ThirdpartyDirectory(dolibarr, matcher)
+
+# Instrumentation des règles de scoring dès le démarrage (sinon via /api/admin/matcher-profile)
+if os.getenv('MATCHER_PROFILING') == '1':
+    matcher.enable_profiling()
+
+# Processus utilisés par /api/match pour les gros relevés (1 = pas de parallélisme)
+MATCH_WORKERS = int(os.getenv('MATCH_WORKERS', '1'))
+
+# Paiements échelonnés : transactions en attente regroupées par tiers (alimenté à l'import)
+partial_payments = PartialPaymentAggregator(matcher)
+
+# Suggestions des transactions en attente, tenues à jour facture par facture
+# (chargées au premier appel de /api/reconciliation/suggestions)
+incremental_matcher = IncrementalMatcher(matcher)
+
 # Helper pour les logs sans émojis sur Windows
 def safe_print(message):
     """Print sans émojis pour éviter UnicodeEncodeError sur Windows"""
@@ -57,6 +87,105 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def invoice_already_paid(invoice: dict) -> bool:
+    """Facture soldée : marquée payée par Dolibarr ou reste à payer nul"""
+    if invoice.get('_already_paid'):
+        return True
+    remaintopay = invoice.get('remaintopay')
+    return remaintopay not in (None, '') and float(remaintopay) == 0
+
+
+def apply_invoice_change(invoice_type: str, invoice_id, invoice: dict = None) -> list:
+    """
+    Répercute une facture ajoutée, modifiée, payée ou supprimée (None) sur les suggestions en mémoire
+    
+    Returns:
+        Identifiants des transactions dont les suggestions ont changé
+    """
+    if not incremental_matcher.loaded:
+        return []
+    
+    # Facture supprimée ou qui n'est plus impayée : elle sort des suggestions
+    if not invoice or not InvoiceMirror.is_unpaid(invoice_type, invoice):
+        return incremental_matcher.remove_invoice(invoice_id, invoice_type)
+    return incremental_matcher.upsert_invoice(invoice, invoice_type)
+
+
+def refresh_invoice(invoice_type: str, invoice_id, invoice: dict = None) -> list:
+    """
+    Relit une facture dans Dolibarr (sauf si elle est fournie) et la met à jour
+    dans le miroir et dans les suggestions
+    
+    Returns:
+        Identifiants des transactions dont les suggestions ont changé
+    """
+    if invoice is None:
+        if invoice_type == 'supplier':
+            invoice = dolibarr.get_supplier_invoice(invoice_id)
+        else:
+            invoice = dolibarr.get_invoice(invoice_id)
+        # Dolibarr injoignable : le miroir sera corrigé à la prochaine synchronisation
+        if not invoice:
+            return []
+    
+    invoice_mirror.store_invoice(invoice_type, invoice)
+    return apply_invoice_change(invoice_type, invoice_id, invoice)
+
+
+def fetch_invoices(invoice_refs: list) -> list:
+    """
+    Lit plusieurs factures Dolibarr en parallèle
+    
+    Args:
+        invoice_refs: Liste de (type de facture, ID)
+    
+    Returns:
+        Factures dans le même ordre (None pour celles introuvables)
+    """
+    client = dolibarr_async.client
+    return dolibarr_async.gather(*[
+        client.get_supplier_invoice(invoice_id) if invoice_type == 'supplier' else client.get_invoice(invoice_id)
+        for invoice_type, invoice_id in invoice_refs
+    ])
+
+
+def fetch_paid_invoice_and_accounts(invoice_type: str, invoice_id) -> tuple:
+    """
+    Relit la facture (nouveau statut) et les comptes bancaires en parallèle après un paiement
+    
+    Le paiement existe déjà dans Dolibarr : un échec de lecture ne doit pas faire échouer
+    la route (l'utilisateur recréerait le paiement), seul l'historique est moins complet.
+    
+    Returns:
+        (facture mise à jour ou None, comptes bancaires)
+    """
+    client = dolibarr_async.client
+    get_invoice = client.get_supplier_invoice if invoice_type == 'supplier' else client.get_invoice
+    try:
+        updated_invoice, accounts = dolibarr_async.gather(get_invoice(invoice_id), client.get_bank_accounts())
+        return updated_invoice, accounts or []
+    except Exception as e:
+        print(f"Erreur lecture de la facture {invoice_id} après paiement: {e}")
+        return None, []
+
+
+def sync_invoice_mirror():
+    """Synchronise le miroir des factures s'il est trop ancien et répercute les changements"""
+    for invoice_type, invoice_id, invoice in invoice_mirror.sync_if_stale():
+        apply_invoice_change(invoice_type, invoice_id, invoice)
+
+
+def get_unpaid_invoices():
+    """Factures clients et fournisseurs impayées, lues dans le miroir (toutes, sans limite)"""
+    sync_invoice_mirror()
+    return invoice_mirror.get_invoices('customer', 'unpaid'), invoice_mirror.get_invoices('supplier', 'unpaid')
+
+
+def register_thirdparty(socid, name: str):
+    """Ajoute un tiers fraîchement créé à l'annuaire (sans attendre son rafraîchissement)"""
+    thirdparty_directory.add({'id': socid, 'name': name, 'fournisseur': '1'})
+
+
 @app.route('/')
 def index():
     """Page principale"""
@@ -175,27 +304,41 @@ def match_transactions():
     
     transactions = data['transactions']
     account_id = data.get('account_id')
+    # Affectation un-pour-un des meilleurs matches sur tout le relevé (optionnelle)
+    one_to_one = bool(data.get('one_to_one', False))
+    # Nombre de processus (reprise d'historique), borné au nombre de coeurs
+    try:
+        workers = int(data.get('workers', MATCH_WORKERS))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'workers doit être un nombre entier'}), 400
+    workers = max(1, min(workers, os.cpu_count() or 1))
+    # Réponse NDJSON ligne par ligne (l'affectation un-pour-un a besoin de tout le relevé)
+    stream = bool(data.get('stream', False)) and not one_to_one
     
     try:
-        # Récupérer les factures clients impayées
-        customer_invoices = dolibarr.get_invoices(status='unpaid', limit=500)
-        print(f"Factures clients récupérées: {len(customer_invoices)}")
-        
-        # Récupérer les factures fournisseurs impayées
-        supplier_invoices = dolibarr.get_supplier_invoices(status='unpaid', limit=500)
-        print(f"Factures fournisseurs récupérées: {len(supplier_invoices)}")
+        # Factures clients et fournisseurs impayées (miroir local)
+        customer_invoices, supplier_invoices = get_unpaid_invoices()
+        print(f"Factures clients: {len(customer_invoices)}, fournisseurs: {len(supplier_invoices)}")
         
         # Récupérer les lignes bancaires si un compte est spécifié
         bank_lines = []
         if account_id:
             bank_lines = dolibarr.get_bank_lines(account_id)
         
+        if stream:
+            return Response(
+                stream_with_context(stream_matches(transactions, customer_invoices, supplier_invoices, bank_lines)),
+                mimetype='application/x-ndjson'
+            )
+        
         # Faire le matching
         matched_transactions = matcher.match_transactions(
             transactions, 
             customer_invoices,
             supplier_invoices,
-            bank_lines
+            bank_lines,
+            one_to_one=one_to_one,
+            workers=workers
         )
         
         return jsonify({
@@ -210,6 +353,27 @@ def match_transactions():
         return jsonify({'error': f'Erreur lors du matching: {str(e)}'}), 500
 
 
+def stream_matches(transactions, customer_invoices, supplier_invoices, bank_lines):
+    """
+    Produit le matching au format NDJSON : une ligne 'start', une ligne 'match' par
+    transaction dès qu'elle est matchée, puis 'end' (ou 'error')
+    """
+    yield json.dumps({'type': 'start', 'total': len(transactions)}) + '\n'
+    count = 0
+    try:
+        for result in matcher.match_transactions_iter(transactions, customer_invoices,
+                                                      supplier_invoices, bank_lines):
+            yield json.dumps({'type': 'match', 'index': count, 'result': result}, default=str) + '\n'
+            count += 1
+    except Exception as e:
+        import traceback
+        print(f"Erreur lors du matching (stream): {str(e)}")
+        print(traceback.format_exc())
+        yield json.dumps({'type': 'error', 'error': f'Erreur lors du matching: {str(e)}'}) + '\n'
+        return
+    yield json.dumps({'type': 'end', 'count': count}) + '\n'
+
+
 @app.route('/api/dolibarr/accounts', methods=['GET'])
 def get_accounts():
     """Récupère la liste des comptes bancaires depuis Dolibarr"""
@@ -233,13 +397,17 @@ def test_dolibarr():
     try:
         # Tester avec un endpoint simple comme les factures
         invoices = dolibarr.get_invoices(status='unpaid', limit=1)
+        # Nouvelle détection des endpoints supportés (version de Dolibarr éventuellement changée)
+        capabilities = dolibarr.probe_capabilities(force=True)
         return jsonify({
             'success': True,
             'message': 'Connexion à Dolibarr réussie',
             'config': {
                 'url': dolibarr.base_url,
                 'api_key_set': bool(dolibarr.api_key and dolibarr.api_key != 'your_api_key_here')
-            }
+            },
+            'dolibarr_version': capabilities['version'],
+            'endpoints': capabilities['endpoints']
         })
     except Exception as e:
         return jsonify({
@@ -266,7 +434,8 @@ def get_invoices():
     """Récupère la liste des factures impayées depuis Dolibarr"""
     try:
         status = request.args.get('status', 'unpaid')
-        invoices = dolibarr.get_invoices(status=status, limit=500)
+        sync_invoice_mirror()
+        invoices = invoice_mirror.get_invoices('customer', status)
         return jsonify({'success': True, 'invoices': invoices})
     except Exception as e:
         return jsonify({'error': f'Erreur: {str(e)}'}), 500
@@ -278,8 +447,10 @@ def get_all_invoices():
     try:
         status = request.args.get('status', 'unpaid')
         
+        sync_invoice_mirror()
+        
         # Récupérer factures clients
-        customer_invoices = dolibarr.get_invoices(status=status, limit=500)
+        customer_invoices = invoice_mirror.get_invoices('customer', status)
         customer_list = []
         for inv in customer_invoices:
             # Calculer le montant à afficher
@@ -306,7 +477,7 @@ def get_all_invoices():
             })
         
         # Récupérer factures fournisseurs
-        supplier_invoices = dolibarr.get_supplier_invoices(status=status, limit=500)
+        supplier_invoices = invoice_mirror.get_invoices('supplier', status)
         supplier_list = []
         
         # Cache pour éviter de récupérer plusieurs fois le même tiers
@@ -379,6 +550,22 @@ def get_all_invoices():
         return jsonify({'error': f'Erreur: {str(e)}'}), 500
 
 
+@app.route('/api/invoices/mirror', methods=['GET', 'POST'])
+def invoice_mirror_status():
+    """
+    État du miroir local des factures (GET) ou synchronisation forcée (POST, ?full=1 pour tout relire)
+    """
+    try:
+        if request.method == 'POST':
+            full = request.args.get('full', '0') == '1'
+            for invoice_type, invoice_id, invoice in invoice_mirror.sync_if_stale(max_age=0, full=full):
+                apply_invoice_change(invoice_type, invoice_id, invoice)
+        
+        return jsonify({'success': True, 'mirror': invoice_mirror.stats()})
+    except Exception as e:
+        return jsonify({'error': f'Erreur: {str(e)}'}), 500
+
+
 @app.route('/api/dolibarr/payment-modes', methods=['GET'])
 def get_payment_modes():
     """Retourne les modes de paiement disponibles"""
@@ -438,16 +625,12 @@ def create_payment():
         )
         
         if payment_id:
-            # Récupérer la facture mise à jour pour voir le nouveau statut
-            if invoice_type == 'supplier':
-                updated_invoice = dolibarr.get_supplier_invoice(data['invoice_id'])
-            else:
-                updated_invoice = dolibarr.get_invoice(data['invoice_id'])
+            # Facture mise à jour (nouveau statut) et comptes bancaires lus en parallèle
+            updated_invoice, accounts = fetch_paid_invoice_and_accounts(invoice_type, data['invoice_id'])
             
             # Enregistrer dans l'historique
             try:
-                # Récupérer les informations du compte
-                accounts = dolibarr.get_bank_accounts()
+                # Informations du compte
                 account_label = next((acc.get('label', '') for acc in accounts if acc.get('id') == data['accountid']), '')
                 
                 # Récupérer le nom du tiers selon le type
@@ -471,6 +654,12 @@ def create_payment():
             except Exception as e:
                 print(f"Erreur lors de l'enregistrement dans l'historique: {e}")
             
+            # Reste à payer à jour dans le miroir et les suggestions sans attendre la synchronisation
+            try:
+                refresh_invoice(invoice_type, data['invoice_id'], updated_invoice)
+            except Exception as e:
+                print(f"Erreur mise à jour du miroir des factures: {e}")
+            
             return jsonify({
                 'success': True, 
                 'payment_id': payment_id,
@@ -532,12 +721,11 @@ def create_payment_and_bank_line():
             # Si la création de la ligne bancaire échoue, on continue quand même
             print(f"Erreur lors de la création de la ligne bancaire: {e}")
         
-        # 3. Récupérer la facture mise à jour
-        updated_invoice = dolibarr.get_invoice(data['invoice_id'])
+        # 3. Récupérer la facture mise à jour (et les comptes bancaires, en parallèle)
+        updated_invoice, accounts = fetch_paid_invoice_and_accounts('customer', data['invoice_id'])
         
         # Enregistrer dans l'historique
         try:
-            accounts = dolibarr.get_bank_accounts()
             account_label = next((acc.get('label', '') for acc in accounts if acc.get('id') == data['accountid']), '')
             
             db.add_payment(
@@ -566,6 +754,12 @@ def create_payment_and_bank_line():
         except Exception as e:
             print(f"Erreur lors de l'enregistrement dans l'historique: {e}")
         
+        # Reste à payer à jour dans le miroir et les suggestions sans attendre la synchronisation
+        try:
+            refresh_invoice('customer', data['invoice_id'], updated_invoice)
+        except Exception as e:
+            print(f"Erreur mise à jour du miroir des factures: {e}")
+        
         return jsonify({
             'success': True,
             'payment_id': payment_id,
@@ -760,9 +954,9 @@ def create_invoice_from_pdf():
             return jsonify({'error': 'Nom du fournisseur non trouvé dans le PDF'}), 400
         
         # Rechercher le tiers existant
-        print(f"   [SEARCH] Recherche dans Dolibarr...")
+        print(f"   [SEARCH] Recherche dans l'annuaire des tiers...")
         try:
-            existing_thirdparties = dolibarr.search_thirdparty(supplier_name)
+            existing_thirdparties = thirdparty_directory.search(supplier_name)
             print(f"   Résultats: {len(existing_thirdparties)} tiers trouvés")
         except Exception as e:
             print(f"   [ERR] Erreur recherche: {e}")
@@ -797,6 +991,7 @@ def create_invoice_from_pdf():
             if not socid:
                 return jsonify({'error': 'Impossible de créer le tiers dans Dolibarr'}), 500
             
+            register_thirdparty(socid, supplier_name)
             print(f"[OK] Tiers créé: ID {socid}")
         
         # Étape 2: Créer la facture fournisseur
@@ -954,6 +1149,12 @@ def import_bank_statement():
             # Importer en base de données (détection doublons)
             result = db.import_transactions(transactions, saved_filename)
             
+            # Seules les nouvelles transactions rejoignent les groupes des paiements échelonnés
+            new_transactions = [dict(item['transaction'], id=item['id']) for item in result['imported']]
+            partial_payments.add_transactions(new_transactions)
+            if incremental_matcher.loaded:
+                incremental_matcher.add_transactions(new_transactions)
+            
             return jsonify({
                 'success': True,
                 'filename': saved_filename,
@@ -1051,6 +1252,7 @@ def get_transaction_matches(tx_id):
             return jsonify({
                 'success': True,
                 'matches': [],
+                'grouped_matches': [],
                 'found_thirdparty': None
             })
         
@@ -1059,61 +1261,28 @@ def get_transaction_matches(tx_id):
         extracted_ref = matcher.extract_invoice_ref_from_label(tx['label'])
         search_variants = matcher.get_thirdparty_search_variants(suggested_thirdparty) if suggested_thirdparty else []
         
-        # Parser la date
-        try:
-            from datetime import datetime as dt
-            tx_date = dt.fromtimestamp(int(tx['date']))
-            tx_year = tx_date.year
-            tx_month = tx_date.month
-        except:
-            tx_year = None
-            tx_month = None
-        
         matches = []
+        grouped_matches = []
         found_thirdparty = None
         is_debit = tx['amount'] < 0
-        tx_amount = abs(tx['amount'])
+        invoice_type = 'supplier' if is_debit else 'customer'
         
         # ============ PRIORITÉ 1: Recherche par référence ============
         if extracted_ref:
             print(f"[MATCH] Recherche par référence: {extracted_ref}")
             try:
+                # L'index des références est lu dans le miroir
+                sync_invoice_mirror()
                 invoice_by_ref = dolibarr.get_invoice_by_ref(extracted_ref)
                 if invoice_by_ref:
                     print(f"[MATCH] Facture trouvée par référence: {invoice_by_ref.get('ref')}")
                     
-                    # Calculer le score
+                    # Mêmes règles que le matching en lot, sans seuil : la facture est toujours proposée
                     inv_type = invoice_by_ref.get('_invoice_type', 'customer')
-                    if is_debit:
-                        total = abs(float(invoice_by_ref.get('total_ht') or invoice_by_ref.get('total_ttc') or 0))
-                        remain = abs(float(invoice_by_ref.get('remaintopay') or total))
-                    else:
-                        total = abs(float(invoice_by_ref.get('total_ttc') or 0))
-                        remain = abs(float(invoice_by_ref.get('remaintopay') or total))
-                    
-                    is_paid = remain == 0
-                    match_amount = total if is_paid else remain
-                    amount_diff = abs(tx_amount - match_amount)
-                    
-                    score = 150  # Score de base très élevé pour match par référence
-                    reasons = [f"Référence exacte: {invoice_by_ref.get('ref')}"]
-                    
-                    # Bonus si montant correspond aussi
-                    if amount_diff < 1:
-                        score += 50
-                        reasons.append("Montant exact")
-                    elif amount_diff / max(tx_amount, match_amount, 1) < 0.05:
-                        score += 20
-                        reasons.append("Montant proche")
-                    
-                    matches.append({
-                        'invoice': invoice_by_ref,
-                        'invoice_type': inv_type,
-                        'score': score,
-                        'reasons': reasons,
-                        'amount_diff': amount_diff,
-                        'already_paid': is_paid
-                    })
+                    invoice_by_ref['_already_paid'] = invoice_already_paid(invoice_by_ref)
+                    for match in matcher.score_invoices(tx, [invoice_by_ref], inv_type, min_score=None):
+                        match['already_paid'] = invoice_by_ref['_already_paid']
+                        matches.append(match)
                     
                     # Récupérer le tiers de la facture
                     thirdparty_name = (invoice_by_ref.get('thirdparty', {}) or {}).get('name') or invoice_by_ref.get('socname', '')
@@ -1126,11 +1295,20 @@ def get_transaction_matches(tx_id):
                 print(f"[MATCH] Erreur recherche par référence: {e}")
         
         # ============ PRIORITÉ 2: Recherche par tiers ============
-        if not matches and suggested_thirdparty:
+        # Payeur déjà réconcilié : tiers mémorisé, sans recherche Dolibarr
+        alias = None
+        if not matches:
+            alias = db.get_thirdparty_alias(matcher.label_signature(tx['label']),
+                                            min_hits=matcher.alias_min_hits(tx['label']))
+            if alias:
+                found_thirdparty = {'id': alias['id'], 'name': alias['name']}
+                print(f"[MATCH] Tiers mémorisé: {alias['name']} ({alias['hits']} réconciliation(s))")
+        
+        if not matches and (suggested_thirdparty or alias):
             # Chercher le tiers dans Dolibarr
-            for variant in search_variants[:3]:
+            for variant in ([] if alias else search_variants[:3]):
                 try:
-                    thirdparties = dolibarr.search_thirdparty(variant)
+                    thirdparties = thirdparty_directory.search(variant)
                     if thirdparties:
                         found_thirdparty = {
                             'id': thirdparties[0].get('id'),
@@ -1143,72 +1321,30 @@ def get_transaction_matches(tx_id):
             if found_thirdparty:
                 # Récupérer les factures de ce tiers
                 try:
-                    thirdparty_invoices = dolibarr.get_thirdparty_invoices(
+                    sync_invoice_mirror()
+                    thirdparty_invoices = invoice_mirror.get_thirdparty_invoices(
                         found_thirdparty['id'],
-                        invoice_type='supplier' if is_debit else 'customer',
+                        invoice_type=invoice_type,
                         include_paid=True
                     )
                     
                     for inv in thirdparty_invoices:
-                        # Récupérer le montant
-                        if is_debit:
-                            total = abs(float(inv.get('total_ht') or inv.get('total_ttc') or 0))
-                            remain = abs(float(inv.get('remaintopay') or total))
-                        else:
-                            total = abs(float(inv.get('total_ttc') or 0))
-                            remain = abs(float(inv.get('remaintopay') or total))
-                        
-                        is_paid = inv.get('_already_paid', False) or remain == 0
-                        match_amount = total if is_paid else remain
-                        
-                        # Calculer le score
-                        score = 0
-                        reasons = []
-                        
-                        # 1. Correspondance de montant
-                        amount_diff = abs(tx_amount - match_amount)
-                        if amount_diff < 1:
-                            score += 100
-                            reasons.append("Montant exact")
-                        elif amount_diff / max(tx_amount, match_amount, 1) < 0.01:
-                            score += 80
-                            reasons.append("Montant proche (1%)")
-                        elif amount_diff / max(tx_amount, match_amount, 1) < 0.05:
-                            score += 50
-                            reasons.append("Montant proche (5%)")
-                        
-                        # 2. Correspondance de période
-                        inv_ref = inv.get('ref', '')
-                        inv_period = matcher.extract_period_from_invoice_ref(inv_ref)
-                        
-                        if inv_period and tx_year:
-                            inv_month_num, inv_year_short = inv_period
-                            inv_year_full = 2000 + int(inv_year_short)
-                            
-                            if inv_year_full == tx_year:
-                                score += 30
-                                reasons.append(f"Année OK ({inv_year_full})")
-                                if int(inv_month_num) == tx_month:
-                                    score += 20
-                                    reasons.append(f"Mois OK ({inv_month_num})")
-                            else:
-                                score -= 50
-                                reasons.append(f"Année différente")
-                        
-                        # 3. Correspondance de référence
-                        if extracted_ref and matcher.refs_match(extracted_ref, inv_ref):
-                            score += 80
-                            reasons.append(f"Référence: {inv_ref}")
-                        
-                        if score > 20:
-                            matches.append({
-                                'invoice': inv,
-                                'invoice_type': 'supplier' if is_debit else 'customer',
-                                'score': score,
-                                'reasons': reasons,
-                                'amount_diff': amount_diff,
-                                'already_paid': is_paid
-                            })
+                        inv['_already_paid'] = invoice_already_paid(inv)
+                        # Factures récupérées par tiers : le nom du tiers est connu même si absent de la facture
+                        if not matcher._invoice_thirdparty_name(inv):
+                            inv['thirdparty_name'] = found_thirdparty['name']
+                    
+                    # Mêmes règles et mêmes points que le matching en lot (scoring_rules)
+                    for match in matcher.score_invoices(tx, thirdparty_invoices, invoice_type):
+                        match['already_paid'] = match['invoice']['_already_paid']
+                        matches.append(match)
+                    
+                    # Aucune facture seule au bon montant : un virement peut régler plusieurs factures
+                    if not any(m['amount_diff'] < 1 and not m['already_paid'] for m in matches):
+                        grouped_matches = grouped_payment_matches(
+                            matcher, tx['amount'], thirdparty_invoices, invoice_type)
+                        if grouped_matches:
+                            print(f"[MATCH] {len(grouped_matches)} paiement(s) groupé(s) proposé(s)")
                     
                 except Exception as e:
                     print(f"Erreur récupération factures: {e}")
@@ -1220,7 +1356,10 @@ def get_transaction_matches(tx_id):
         return jsonify({
             'success': True,
             'matches': matches,
-            'found_thirdparty': found_thirdparty
+            'grouped_matches': grouped_matches,
+            'found_thirdparty': found_thirdparty,
+            # Restes à payer lus dans le miroir : date de sa dernière synchronisation
+            'mirror_synced_at': invoice_mirror.synced_at()
         })
         
     except Exception as e:
@@ -1229,6 +1368,139 @@ def get_transaction_matches(tx_id):
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/reconciliation/partial-payments', methods=['GET'])
+def get_partial_payments():
+    """
+    Propose les paiements échelonnés : plusieurs virements en attente d'un même tiers
+    dont le total solde une facture ouverte
+    """
+    try:
+        # Les transactions réconciliées ou ignorées depuis le dernier appel sortent des groupes
+        partial_payments.sync_pending(db.get_pending_transactions())
+        
+        customer_invoices, supplier_invoices = get_unpaid_invoices()
+        settlements = partial_payments.find_settlements(customer_invoices, supplier_invoices)
+        print(f"[MATCH] {len(settlements)} paiement(s) échelonné(s) trouvé(s)")
+        
+        return jsonify({
+            'success': True,
+            'settlements': settlements,
+            # Restes à payer lus dans le miroir : date de sa dernière synchronisation
+            'mirror_synced_at': invoice_mirror.synced_at()
+        })
+        
+    except Exception as e:
+        import traceback
+        print(f"Erreur get_partial_payments: {e}")
+        print(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/reconciliation/suggestions', methods=['GET'])
+def get_suggestions():
+    """
+    Suggestions de factures de toutes les transactions en attente
+    Le matching complet n'est fait qu'au premier appel (ou avec ?reload=1) ; ensuite les
+    suggestions sont tenues à jour par les événements de factures et les réconciliations
+    """
+    try:
+        pending = db.get_pending_transactions()
+        
+        if not incremental_matcher.loaded or request.args.get('reload') == '1':
+            start = time.perf_counter()
+            customer_invoices, supplier_invoices = get_unpaid_invoices()
+            incremental_matcher.load(pending, customer_invoices, supplier_invoices)
+            print(f"[MATCH] Suggestions calculées pour {len(pending)} transactions "
+                  f"en {time.perf_counter() - start:.2f}s")
+        else:
+            # Factures modifiées dans Dolibarr, transactions réinitialisées ou importées ailleurs
+            sync_invoice_mirror()
+            incremental_matcher.sync_pending(pending)
+        
+        return jsonify({
+            'success': True,
+            'suggestions': [
+                {'transaction_id': tx_id, 'invoice_matches': matches}
+                for tx_id, matches in incremental_matcher.suggestions().items()
+            ],
+            'stats': incremental_matcher.stats(),
+            # Restes à payer lus dans le miroir : date de sa dernière synchronisation
+            'mirror_synced_at': invoice_mirror.synced_at()
+        })
+        
+    except Exception as e:
+        import traceback
+        print(f"Erreur get_suggestions: {e}")
+        print(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
+
+# Types d'événements de factures acceptés par /api/reconciliation/invoice-events
+INVOICE_EVENTS = ('created', 'modified', 'paid', 'deleted')
+
+
+@app.route('/api/reconciliation/invoice-events', methods=['POST'])
+def invoice_events():
+    """
+    Événements de factures Dolibarr (création, modification, paiement, suppression)
+    Le miroir des factures est mis à jour et seules les transactions concernées
+    par chaque facture sont re-scorées
+    
+    Body: {"events": [{"event": "created|modified|paid|deleted", "invoice_type": "customer|supplier",
+                       "invoice_id": 12, "invoice": {...} (optionnel, sinon lue dans Dolibarr)}]}
+    """
+    data = request.get_json()
+    
+    if not data or not isinstance(data.get('events'), list):
+        return jsonify({'error': 'Liste d\'événements manquante'}), 400
+    
+    # Tous les événements sont vérifiés avant d'en appliquer un seul
+    events = []
+    for position, event in enumerate(data['events']):
+        if not isinstance(event, dict):
+            return jsonify({'error': f'Événement {position} invalide'}), 400
+        if event.get('event') not in INVOICE_EVENTS:
+            return jsonify({'error': f"Événement {position}: type inconnu {event.get('event')!r}"}), 400
+        invoice_type = event.get('invoice_type', 'customer')
+        if invoice_type not in ('customer', 'supplier'):
+            return jsonify({'error': f'Événement {position}: invoice_type invalide {invoice_type!r}'}), 400
+        invoice = event.get('invoice')
+        if invoice is not None and not isinstance(invoice, dict):
+            return jsonify({'error': f'Événement {position}: invoice invalide'}), 400
+        invoice_id = event.get('invoice_id') or (invoice or {}).get('id')
+        if invoice_id is None:
+            return jsonify({'error': f'Événement {position}: invoice_id manquant'}), 400
+        events.append((event['event'], invoice_type, invoice_id, invoice))
+    
+    try:
+        changed = []
+        for event_type, invoice_type, invoice_id, invoice in events:
+            if event_type == 'deleted':
+                invoice_mirror.remove_invoice(invoice_type, invoice_id)
+                changed.extend(apply_invoice_change(invoice_type, invoice_id, None))
+            elif event_type == 'paid' and invoice is None:
+                # Facture soldée : elle sort des suggestions sans attendre sa relecture
+                changed.extend(incremental_matcher.remove_invoice(invoice_id, invoice_type))
+                refresh_invoice(invoice_type, invoice_id)
+            else:
+                changed.extend(refresh_invoice(invoice_type, invoice_id, invoice))
+        
+        changed = list(dict.fromkeys(changed))
+        return jsonify({
+            'success': True,
+            'changed': [
+                {'transaction_id': tx_id, 'invoice_matches': matches}
+                for tx_id, matches in incremental_matcher.suggestions(changed).items()
+            ]
+        })
+        
+    except Exception as e:
+        import traceback
+        print(f"Erreur invoice_events: {e}")
+        print(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/reconciliation/match', methods=['POST'])
 def reconcile_transaction():
     """
@@ -1283,6 +1555,7 @@ def reconcile_transaction():
         already_paid = is_already_paid or invoice_status == '2' or invoice_paye == '1'
         
         payment_id = None
+        updated_invoice = None
         message = 'Transaction réconciliée avec succès'
         
         # Créer le paiement seulement si demandé ET facture pas déjà payée
@@ -1301,7 +1574,8 @@ def reconcile_transaction():
                 message = 'Transaction réconciliée et paiement créé'
                 # Enregistrer dans l'historique des paiements
                 try:
-                    accounts = dolibarr.get_bank_accounts()
+                    # Facture mise à jour (pour le miroir) et comptes bancaires lus en parallèle
+                    updated_invoice, accounts = fetch_paid_invoice_and_accounts(invoice_type, invoice_id)
                     account_label = next((acc.get('label', '') for acc in accounts if acc.get('id') == account_id), '')
                     
                     db.add_payment(
@@ -1321,16 +1595,23 @@ def reconcile_transaction():
         elif already_paid:
             message = 'Transaction rapprochée (facture déjà payée)'
         
-        # Marquer la transaction comme réconciliée
+        # Marquer la transaction comme réconciliée (et mémoriser le tiers du payeur)
         db.reconcile_transaction(
             transaction_id=transaction_id,
             invoice_id=invoice_id,
             invoice_type=invoice_type,
             invoice_ref=invoice_ref,
             thirdparty_name=thirdparty_name,
-            payment_id=payment_id
+            payment_id=payment_id,
+            thirdparty_id=invoice.get('socid'),
+            alias_signature=matcher.label_signature(tx['label'])
         )
         
+        # La transaction sort des suggestions, la facture payée est re-scorée
+        incremental_matcher.remove_transaction(transaction_id)
+        if payment_id:
+            refresh_invoice(invoice_type, invoice_id, updated_invoice)
+        
         return jsonify({
             'success': True,
             'message': message,
@@ -1364,6 +1645,7 @@ def ignore_transaction():
         )
         
         if success:
+            incremental_matcher.remove_transaction(data['transaction_id'])
             return jsonify({'success': True, 'message': 'Transaction ignorée'})
         else:
             return jsonify({'error': 'Transaction non trouvée'}), 404
@@ -1383,7 +1665,10 @@ def reset_transaction():
         return jsonify({'error': 'transaction_id manquant'}), 400
     
     try:
-        success = db.reset_transaction(data['transaction_id'])
+        # Oublier le tiers mémorisé pour ce libellé
+        tx = db.get_transaction_by_id(data['transaction_id'])
+        alias_signature = matcher.label_signature(tx['label']) if tx else None
+        success = db.reset_transaction(data['transaction_id'], alias_signature=alias_signature)
         
         if success:
             return jsonify({'success': True, 'message': 'Transaction réinitialisée'})
@@ -1403,7 +1688,8 @@ def get_reconciliation_stats():
         stats = db.get_transaction_stats()
         return jsonify({
             'success': True,
-            'stats': stats
+            'stats': stats,
+            'thirdparty_aliases': db.get_thirdparty_alias_stats()
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1427,8 +1713,13 @@ def batch_reconcile():
         results = []
         success_count = 0
         error_count = 0
+        paid_invoices = []
+        
+        # Toutes les factures du lot lues en parallèle
+        invoices = fetch_invoices([(match.get('invoice_type', 'supplier'), match.get('invoice_id'))
+                                   for match in data['matches']])
         
-        for match in data['matches']:
+        for match, invoice in zip(data['matches'], invoices):
             try:
                 transaction_id = match['transaction_id']
                 invoice_id = match['invoice_id']
@@ -1443,12 +1734,6 @@ def batch_reconcile():
                     error_count += 1
                     continue
                 
-                # Récupérer la facture
-                if invoice_type == 'supplier':
-                    invoice = dolibarr.get_supplier_invoice(invoice_id)
-                else:
-                    invoice = dolibarr.get_invoice(invoice_id)
-                
                 if not invoice:
                     results.append({'transaction_id': transaction_id, 'success': False, 'error': 'Facture non trouvée'})
                     error_count += 1
@@ -1485,9 +1770,15 @@ def batch_reconcile():
                     invoice_type=invoice_type,
                     invoice_ref=invoice_ref,
                     thirdparty_name=thirdparty_name,
-                    payment_id=payment_id
+                    payment_id=payment_id,
+                    thirdparty_id=invoice.get('socid'),
+                    alias_signature=matcher.label_signature(tx['label'])
                 )
                 
+                incremental_matcher.remove_transaction(transaction_id)
+                if payment_id:
+                    paid_invoices.append((invoice_type, invoice_id))
+                
                 results.append({
                     'transaction_id': transaction_id,
                     'success': True,
@@ -1504,6 +1795,16 @@ def batch_reconcile():
                 })
                 error_count += 1
         
+        # Factures payées relues en parallèle pour le miroir et les suggestions
+        # (les paiements existent déjà : un échec de lecture ne fait pas échouer le lot)
+        try:
+            paid = fetch_invoices(paid_invoices)
+        except Exception as e:
+            print(f"Erreur lecture des factures payées: {e}")
+            paid = [None] * len(paid_invoices)
+        for (invoice_type, invoice_id), invoice in zip(paid_invoices, paid):
+            refresh_invoice(invoice_type, invoice_id, invoice)
+        
         return jsonify({
             'success': True,
             'results': results,
@@ -1519,6 +1820,51 @@ def batch_reconcile():
         return jsonify({'error': f'Erreur: {str(e)}'}), 500
 
 
+@app.route('/api/admin/matcher-profile', methods=['GET', 'POST'])
+def matcher_profile():
+    """
+    Instrumentation des règles de scoring
+    GET: statistiques par règle des derniers lots (JSON téléchargeable)
+    POST {'enabled': true|false}: active ou désactive l'instrumentation
+    """
+    if request.method == 'POST':
+        data = request.get_json() or {}
+        if data.get('enabled'):
+            matcher.enable_profiling()
+        else:
+            matcher.disable_profiling()
+    
+    return jsonify({
+        'success': True,
+        'enabled': matcher.profiler is not None,
+        'report': matcher.profiler.report() if matcher.profiler else {'batches': []}
+    })
+
+
+@app.route('/api/matching/name-cache', methods=['GET'])
+def get_name_cache_stats():
+    """Statistiques du cache des noms normalisés (pour ajuster sa taille)"""
+    return jsonify({
+        'success': True,
+        'stats': matcher.name_normalizer.stats()
+    })
+
+
+@app.route('/api/thirdparties/directory', methods=['GET', 'POST'])
+def thirdparty_directory_status():
+    """
+    État de l'annuaire des tiers (GET) ou rafraîchissement forcé (POST, ?full=1 pour tout relire)
+    """
+    try:
+        if request.method == 'POST':
+            if not thirdparty_directory.refresh(full=request.args.get('full', '0') == '1'):
+                return jsonify({'error': 'Rafraîchissement de l\'annuaire des tiers impossible'}), 502
+        
+        return jsonify({'success': True, 'directory': thirdparty_directory.stats()})
+    except Exception as e:
+        return jsonify({'error': f'Erreur: {str(e)}'}), 500
+
+
 @app.route('/api/thirdparties/search', methods=['GET'])
 def search_thirdparties():
     """
@@ -1537,14 +1883,17 @@ def search_thirdparties():
         all_results = []
         seen_ids = set()
         
-        # Chercher avec max 2 variantes pour éviter trop d'appels API
+        # Index local des tiers : pas d'appel API par variante
+        index = thirdparty_directory.fuzzy_index()
+        
+        # Chercher avec max 2 variantes
         for variant in search_variants[:2]:
             try:
-                results = dolibarr.search_thirdparty(variant)
+                results = index.search(variant, limit=10)  # Max 10 par variante
                 if not results:
                     continue
                     
-                for tp in results[:10]:  # Max 10 par variante
+                for _, tp in results:
                     tp_id = tp.get('id')
                     if tp_id and tp_id not in seen_ids:
                         seen_ids.add(tp_id)
@@ -1591,17 +1940,9 @@ def get_thirdparty_invoices(thirdparty_id):
         
         invoices = []
         
-        def add_invoices(inv_list, inv_type, is_paid=False):
+        def add_invoices(inv_list, inv_type):
             for inv in inv_list:
-                # Vérifier le tiers
-                if inv_type == 'customer':
-                    thirdparty = inv.get('thirdparty', {})
-                    if not thirdparty or str(thirdparty.get('id')) != str(thirdparty_id):
-                        continue
-                else:
-                    if str(inv.get('socid')) != str(thirdparty_id):
-                        continue
-                
+                is_paid = inv.get('_already_paid', False)
                 total = float(inv.get('total_ttc') or inv.get('total_ht') or 0)
                 remain = float(inv.get('remaintopay') or 0)
                 
@@ -1618,33 +1959,12 @@ def get_thirdparty_invoices(thirdparty_id):
                     'is_paid': is_paid
                 })
         
-        # Factures clients
-        if invoice_type in ['customer', 'all']:
-            # Impayées
-            customer_unpaid = dolibarr.get_invoices(status='unpaid', limit=100)
-            add_invoices(customer_unpaid, 'customer', is_paid=False)
-            
-            # Payées
-            if include_paid:
-                try:
-                    customer_paid = dolibarr.get_invoices(status='paid', limit=100)
-                    add_invoices(customer_paid, 'customer', is_paid=True)
-                except:
-                    pass
-        
-        # Factures fournisseurs
-        if invoice_type in ['supplier', 'all']:
-            # Impayées
-            supplier_unpaid = dolibarr.get_supplier_invoices(status='unpaid', limit=100)
-            add_invoices(supplier_unpaid, 'supplier', is_paid=False)
-            
-            # Payées
-            if include_paid:
-                try:
-                    supplier_paid = dolibarr.get_supplier_invoices(status='paid', limit=100)
-                    add_invoices(supplier_paid, 'supplier', is_paid=True)
-                except:
-                    pass
+        # Factures du tiers lues dans le miroir local (toutes, sans limite de liste)
+        sync_invoice_mirror()
+        for inv_type in ('customer', 'supplier'):
+            if invoice_type in [inv_type, 'all']:
+                add_invoices(invoice_mirror.get_thirdparty_invoices(
+                    thirdparty_id, invoice_type=inv_type, include_paid=include_paid), inv_type)
         
         # Trier: impayées d'abord, puis par date décroissante
         invoices.sort(key=lambda x: (x.get('is_paid', False), -int(x.get('date') or 0)))
@@ -1705,7 +2025,7 @@ def create_invoice_and_match():
             return jsonify({'error': 'Nom du fournisseur non trouvé dans le PDF'}), 400
         
         # Chercher ou créer le tiers
-        existing_thirdparties = dolibarr.search_thirdparty(supplier_name)
+        existing_thirdparties = thirdparty_directory.search(supplier_name)
         
         socid = None
         if existing_thirdparties and len(existing_thirdparties) > 0:
@@ -1729,6 +2049,7 @@ def create_invoice_and_match():
             
             if not socid:
                 return jsonify({'error': 'Impossible de créer le tiers'}), 500
+            register_thirdparty(socid, supplier_name)
         
         # Créer la facture
         timestamp_suffix = datetime.now().strftime('%Y%m%d%H%M%S')
@@ -1814,7 +2135,9 @@ def create_invoice_and_match():
             invoice_type='supplier',
             invoice_ref=invoice_ref,
             thirdparty_name=supplier_name,
-            payment_id=payment_id
+            payment_id=payment_id,
+            thirdparty_id=socid,
+            alias_signature=matcher.label_signature(tx['label'])
         )
         
         # Nettoyer
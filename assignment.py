@@ -0,0 +1,103 @@
+"""
+Affectation un-pour-un des matches d'un relevé (couplage de poids maximum)
+Chaque transaction propose quelques candidats (factures, lignes bancaires) avec
+leur score ; on choisit au plus un candidat par transaction et au plus une
+transaction par candidat, en maximisant la somme des scores.
+"""
+from typing import List, Tuple, Optional, Hashable
+import heapq
+
+
+def max_weight_assignment(candidates: List[List[Tuple[Hashable, float]]]) -> List[Optional[Hashable]]:
+    """
+    Couplage biparti de poids maximum sur un graphe creux
+
+    Plus courts chemins augmentants successifs (Dijkstra avec potentiels) : chaque
+    transaction reçoit en plus une colonne "aucun match" qui lui est propre, ce qui
+    rend le problème équivalent à une affectation complète des transactions.
+    Dijkstra s'arrête à la première colonne libre atteinte et n'explore que la
+    composante connexe de la transaction, d'où un coût proche du linéaire sur
+    des graphes creux (quelques candidats par transaction).
+
+    Args:
+        candidates: Pour chaque transaction, liste de (clé du candidat, poids > 0)
+
+    Returns:
+        Pour chaque transaction, la clé du candidat affecté ou None
+    """
+    max_weight = max((weight for edges in candidates for _, weight in edges), default=0)
+    # Coûts positifs : coût = big - poids pour un candidat, big pour "aucun match"
+    big = max_weight + 1
+
+    # Colonnes: ('c', clé) pour un candidat, ('n', ligne) pour "aucun match"
+    row_edges = []
+    for row, edges in enumerate(candidates):
+        best = {}
+        for key, weight in edges:
+            column = ('c', key)
+            if column not in best or weight > best[column]:
+                best[column] = weight
+        row_edges.append([(column, big - weight) for column, weight in best.items()] + [(('n', row), big)])
+
+    row_of_column = {}      # colonne -> ligne affectée
+    column_of_row = {}      # ligne -> colonne affectée
+    potential = {}          # potentiels des lignes (clé int) et colonnes (clé tuple)
+
+    for start in range(len(candidates)):
+        dist = {start: 0}
+        previous = {}       # colonne -> ligne d'où l'on vient
+        done = set()
+        heap = [(0, 0, start)]
+        counter = 1
+        target = None
+        target_dist = 0
+
+        while heap:
+            d, _, node = heapq.heappop(heap)
+            if node in done:
+                continue
+            done.add(node)
+
+            if isinstance(node, tuple):
+                # Colonne : libre -> chemin augmentant trouvé, sinon on repart de sa ligne
+                row = row_of_column.get(node)
+                if row is None:
+                    target = node
+                    target_dist = d
+                    break
+                # Arc retour colonne -> ligne affectée, de coût réduit nul
+                if row not in done and d < dist.get(row, float('inf')):
+                    dist[row] = d
+                    heapq.heappush(heap, (d, counter, row))
+                    counter += 1
+                continue
+
+            row_potential = potential.get(node, 0)
+            for column, cost in row_edges[node]:
+                if column == column_of_row.get(node) or column in done:
+                    continue
+                nd = d + cost + row_potential - potential.get(column, 0)
+                if nd < dist.get(column, float('inf')):
+                    dist[column] = nd
+                    previous[column] = node
+                    heapq.heappush(heap, (nd, counter, column))
+                    counter += 1
+
+        # Mise à jour des potentiels des noeuds fixés (les autres sont inchangés)
+        for node in done:
+            if node != target:
+                potential[node] = potential.get(node, 0) + dist[node] - target_dist
+
+        # Inverser les affectations le long du chemin
+        column = target
+        while True:
+            row = previous[column]
+            next_column = column_of_row.get(row)
+            row_of_column[column] = row
+            column_of_row[row] = column
+            if row == start:
+                break
+            column = next_column
+
+    return [column[1] if column[0] == 'c' else None
+            for column in (column_of_row[row] for row in range(len(candidates)))]
@@ -0,0 +1,257 @@
+"""
+Client asyncio pour l'API Dolibarr
+Même interface que DolibarrClient, construit sur une instance de DolibarrClient dont il
+partage la configuration, les endpoints détectés (même sélection des routes, re-détection
+comprise), les données envoyées et l'index des références.
+Les requêtes unitaires (get_invoice, get_bank_accounts, add_payment, attach_document...)
+passent par aiohttp : les appels indépendants partent ensemble (asyncio.gather) sur un
+pool de connexions partagé au lieu de s'enchaîner. Les autres méthodes (listes paginées,
+recherches, créations) sont celles de DolibarrClient, exécutées dans un thread.
+DolibarrSyncFacade exécute ces coroutines depuis le code synchrone (routes Flask).
+"""
+from typing import List, Dict, Optional, AsyncIterator
+from dolibarr_client import (
+    DolibarrClient, build_api_url, parse_response_text, is_empty_list_response,
+    payment_payload, bank_line_payload, bank_accounts_from_response, document_payload
+)
+import asyncio
+import threading
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# Erreurs réseau d'une requête (aiohttp absent : _get_session lève ImportError)
+REQUEST_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError) if aiohttp is not None else (asyncio.TimeoutError,)
+
+
+class AsyncDolibarrClient:
+    """Client asyncio de l'API REST Dolibarr (aiohttp, connexions réutilisées)"""
+
+    # Connexions simultanées vers Dolibarr
+    MAX_CONNECTIONS = 10
+    # Durée maximum d'une requête (secondes)
+    REQUEST_TIMEOUT = 60
+
+    def __init__(self, dolibarr: Optional[DolibarrClient] = None, max_connections: Optional[int] = None):
+        """
+        Args:
+            dolibarr: Client synchrone partagé (URL, clé API, endpoints détectés, source des factures)
+        """
+        self.dolibarr = dolibarr or DolibarrClient()
+        self.max_connections = max_connections or self.MAX_CONNECTIONS
+        # Session aiohttp créée au premier appel, dans la boucle qui l'utilise
+        self._session = None
+
+    def __getattr__(self, name: str):
+        """Autres méthodes de DolibarrClient : exécutées dans un thread, hors de la boucle"""
+        if name == 'dolibarr':
+            raise AttributeError(name)
+        attribute = getattr(self.dolibarr, name)
+        if name.startswith('_') or not callable(attribute):
+            return attribute
+
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(attribute, *args, **kwargs)
+        call.__name__ = name
+        call.__doc__ = attribute.__doc__
+        return call
+
+    async def _routes(self, resource: str) -> AsyncIterator[str]:
+        """
+        Endpoints à essayer pour une ressource : ceux de DolibarrClient._routes (détection
+        au premier usage, re-détection si l'endpoint a échoué), chaque étape dans un thread
+        """
+        routes = self.dolibarr._routes(resource)
+        while True:
+            endpoint = await asyncio.to_thread(next, routes, None)
+            if endpoint is None:
+                return
+            yield endpoint
+
+    def _get_session(self):
+        if aiohttp is None:
+            raise ImportError("aiohttp non installé. Installez avec: pip install aiohttp")
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                headers={'DOLAPIKEY': self.dolibarr.api_key, 'Content-Type': 'application/json'},
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=self.REQUEST_TIMEOUT)
+            )
+        return self._session
+
+    async def close(self):
+        """Ferme la session et ses connexions"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _make_request(self, method: str, endpoint: str, **kwargs):
+        """Effectue une requête HTTP vers l'API Dolibarr (mêmes retours que DolibarrClient._make_request)"""
+        url = build_api_url(self.dolibarr.base_url, endpoint)
+
+        try:
+            async with self._get_session().request(method, url, **kwargs) as response:
+                if response.status == 404:
+                    print(f"Erreur 404: Endpoint non trouvé - {url}")
+                    print(f"Vérifiez que l'endpoint '{endpoint}' existe dans votre version de Dolibarr")
+                    if not is_empty_list_response(await response.text()):
+                        self.dolibarr.capabilities.route_missing(endpoint)
+                    return None
+                elif response.status == 401:
+                    print(f"Erreur 401: Authentification échouée")
+                    print(f"Vérifiez votre clé API Dolibarr dans config.py")
+                    return None
+
+                text = await response.text()
+                # Dolibarr retourne parfois 501 mais crée quand même la ressource
+                if response.status >= 400 and response.status != 501:
+                    print(f"Erreur API Dolibarr: {response.status} sur {url}")
+                    print(f"Response: {text[:500]}")
+                    return None
+
+                if text:
+                    return parse_response_text(text, url, response.status)
+                return None
+        except REQUEST_ERRORS as e:
+            print(f"Erreur API Dolibarr: {e}")
+            return None
+
+    # ========== Factures et tiers ==========
+
+    async def get_invoice(self, invoice_id: int) -> Optional[Dict]:
+        """Récupère une facture spécifique par son ID"""
+        return await self._make_request('GET', f'invoices/{invoice_id}')
+
+    async def get_supplier_invoice(self, invoice_id: int) -> Optional[Dict]:
+        """Récupère une facture fournisseur spécifique par son ID"""
+        result = None
+        async for endpoint in self._routes('supplier_invoices'):
+            result = await self._make_request('GET', f'{endpoint}/{invoice_id}')
+            if result:
+                break
+        return result
+
+    async def get_thirdparty(self, thirdparty_id: int) -> Optional[Dict]:
+        """Récupère les informations d'un tiers par son ID"""
+        async for endpoint in self._routes('thirdparties'):
+            result = await self._make_request('GET', f'{endpoint}/{thirdparty_id}')
+            if result and isinstance(result, dict):
+                return result
+        return None
+
+    # ========== Banque et paiements ==========
+
+    async def get_bank_accounts(self) -> List[Dict]:
+        """Récupère la liste des comptes bancaires"""
+        params = {'sortfield': 't.rowid', 'sortorder': 'ASC', 'limit': 100}
+        return bank_accounts_from_response(await self._make_request('GET', 'bankaccounts', params=params))
+
+    async def get_bank_lines(self, account_id: int, sqlfilters: str = '') -> List[Dict]:
+        """Récupère les lignes bancaires d'un compte"""
+        params = {'sqlfilters': sqlfilters} if sqlfilters else {}
+        result = await self._make_request('GET', f'bankaccounts/{account_id}/lines', params=params)
+        return result if result else []
+
+    async def add_payment(self, invoice_id: int, datepaye: str, paymentid: int,
+                          accountid: int, closepaidinvoices: str = 'yes',
+                          num_payment: str = '', comment: str = '', invoice_type: str = 'customer') -> Optional[int]:
+        """Ajoute un paiement à une facture client ou fournisseur (ID du paiement ou None)"""
+        data = payment_payload(datepaye, paymentid, accountid, closepaidinvoices, num_payment, comment)
+
+        if invoice_type == 'supplier':
+            result = None
+            async for endpoint in self._routes('supplier_invoices'):
+                result = await self._make_request('POST', f'{endpoint}/{invoice_id}/payments', json=data)
+                if result:
+                    break
+        else:
+            result = await self._make_request('POST', f'invoices/{invoice_id}/payments', json=data)
+
+        return result if result else None
+
+    async def add_bank_line(self, account_id: int, date: str, type: str, label: str,
+                            amount: float, category: int = 0, cheque_number: str = '',
+                            accountancycode: str = '', datev: str = None,
+                            num_releve: str = '') -> Optional[int]:
+        """Ajoute une ligne bancaire (ID de la ligne ou None)"""
+        data = bank_line_payload(date, type, label, amount, category, cheque_number,
+                                 accountancycode, datev, num_releve)
+        result = await self._make_request('POST', f'bankaccounts/{account_id}/lines', json=data)
+        return result if result else None
+
+    async def attach_document(self, module_part: str, ref: str, filepath: str,
+                              filename: str = None, overwriteifexists: int = 0) -> Optional[str]:
+        """Attache un fichier à un objet Dolibarr (chemin du document ou None)"""
+        # Lecture et encodage du fichier hors de la boucle
+        data = await asyncio.to_thread(document_payload, module_part, ref, filepath, filename, overwriteifexists)
+        if data is None:
+            return None
+        result = await self._make_request('POST', 'documents/upload', json=data)
+        return result if result else None
+
+
+class DolibarrSyncFacade:
+    """
+    Façade synchrone d'un AsyncDolibarrClient pour les routes Flask
+
+    Les coroutines s'exécutent sur une boucle asyncio dédiée (thread d'arrière-plan)
+    partagée par tous les threads de requêtes, donc avec un seul pool de connexions.
+    Les méthodes du client sont appelables directement (facade.get_invoice(12)) ;
+    gather() lance plusieurs appels indépendants en même temps.
+    """
+
+    def __init__(self, client: Optional[AsyncDolibarrClient] = None):
+        self.client = client or AsyncDolibarrClient()
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='dolibarr-async', daemon=True).start()
+                self._loop = loop
+        return self._loop
+
+    def run(self, coroutine):
+        """Exécute une coroutine sur la boucle du client et retourne son résultat"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._get_loop()).result()
+
+    def gather(self, *coroutines) -> List:
+        """
+        Exécute plusieurs appels en parallèle
+
+        Ex: invoice, accounts = facade.gather(facade.client.get_invoice(12), facade.client.get_bank_accounts())
+
+        Returns:
+            Résultats dans l'ordre des appels
+        """
+        async def run_all():
+            return await asyncio.gather(*coroutines)
+        return self.run(run_all())
+
+    def close(self):
+        """Ferme les connexions et arrête la boucle"""
+        if self._loop is not None:
+            self.run(self.client.close())
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self.client, name)
+        if not asyncio.iscoroutinefunction(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            return self.run(attribute(*args, **kwargs))
+        call.__name__ = name
+        call.__doc__ = attribute.__doc__
+        return call
@@ -0,0 +1,88 @@
+"""
+Index des lignes bancaires Dolibarr d'un compte (triées par date et par montant)
+Une ligne ne peut dépasser le seuil de score que si sa date est dans la tolérance
+ou si son montant est identique : seules ces lignes sont scorées, au lieu de
+comparer chaque transaction à tout l'historique du compte.
+"""
+from typing import List, Dict, Tuple, Optional
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from date_utils import local_seconds
+import math
+
+
+class BankLineIndex:
+    """
+    Lignes bancaires pré-analysées pour TransactionMatcher._match_with_bank_lines
+
+    Les montants, libellés et dates sont convertis une fois par ligne ; les candidates
+    d'une transaction sont trouvées par dichotomie sur les dates et les montants triés.
+    """
+
+    # Marge relative sur les montants (math.isclose utilise rel_tol=1e-09)
+    AMOUNT_REL_MARGIN = 1e-8
+
+    def __init__(self, bank_lines: List[Dict], matcher):
+        """
+        Args:
+            bank_lines: Lignes bancaires depuis Dolibarr
+            matcher: TransactionMatcher (tolérances)
+        """
+        self.bank_lines = bank_lines
+        self.matcher = matcher
+        self.amounts: List[float] = []
+        self.labels_upper: List[str] = []
+        self.dates: List[Optional[datetime]] = []
+
+        by_date = []
+        by_amount = []
+        for position, bank_line in enumerate(bank_lines):
+            bank_amount = abs(float(bank_line.get('amount', 0)))
+            self.amounts.append(bank_amount)
+            self.labels_upper.append(bank_line.get('label', '').upper())
+            bank_date = datetime.fromtimestamp(int(bank_line['date'])) if bank_line.get('date') else None
+            self.dates.append(bank_date)
+
+            by_amount.append((bank_amount, position))
+            if bank_date is not None:
+                by_date.append((local_seconds(bank_date), position))
+
+        by_date.sort()
+        self._date_values = [d for d, _ in by_date]
+        self._date_positions = [p for _, p in by_date]
+        by_amount.sort()
+        self._amount_values = [a for a, _ in by_amount]
+        self._amount_positions = [p for _, p in by_amount]
+
+    def __len__(self) -> int:
+        return len(self.bank_lines)
+
+    @staticmethod
+    def snapshot_key(bank_lines: List[Dict]) -> Tuple:
+        """Empreinte des champs utilisés par le scoring (même contenu, même ordre)"""
+        return tuple((line.get('id'), line.get('amount'), line.get('label'), line.get('date'))
+                     for line in bank_lines)
+
+    def candidates(self, amount: float, date: datetime) -> List[int]:
+        """
+        Positions (dans l'ordre d'origine) des lignes qui peuvent dépasser le seuil :
+        date à moins de DATE_TOLERANCE_DAYS jours, ou montant identique
+        """
+        found = set()
+
+        # Écart en jours (arrondi à l'inférieur) <= tolérance : moins de tolérance + 1 jours
+        seconds = local_seconds(date)
+        margin = (self.matcher.date_tolerance_days + 1) * 86400
+        start = bisect_left(self._date_values, seconds - margin)
+        end = bisect_right(self._date_values, seconds + margin)
+        found.update(self._date_positions[start:end])
+
+        # Montant identique (vérifié ensuite avec math.isclose)
+        tolerance = self.matcher.amount_tolerance + amount * self.AMOUNT_REL_MARGIN
+        start = bisect_left(self._amount_values, amount - tolerance)
+        end = bisect_right(self._amount_values, amount + tolerance)
+        for position in self._amount_positions[start:end]:
+            if math.isclose(amount, self.amounts[position], abs_tol=self.matcher.amount_tolerance):
+                found.add(position)
+
+        return sorted(found)
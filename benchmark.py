@@ -0,0 +1,232 @@
+"""
+Benchmarks du matcher sur données synthétiques (benchmark_data.py)
+
+Chaque cas est mesuré à plusieurs échelles (1k, 10k, 100k transactions, autant de
+factures et de lignes bancaires) puis comparé à une référence JSON : un cas plus lent
+que la référence au-delà du seuil est une régression (code de sortie 1).
+
+Le matching est mesuré sur un échantillon de transactions (les premières du relevé)
+contre toutes les factures et lignes bancaires de l'échelle : la durée suit la taille
+des données sans que le cas 100k prenne des heures. Les extracteurs de libellés
+parcourent tous les libellés.
+
+Usage:
+    python benchmark.py                          # compare à benchmark_baseline.json
+    python benchmark.py --sizes 1000 10000       # échelles choisies
+    python benchmark.py --save-baseline          # enregistre les mesures comme référence
+    python benchmark.py --threshold 0.5          # régression au-delà de +50%
+
+Les durées dépendent de la machine : la référence doit être enregistrée sur la
+machine (ou le runner CI) qui exécute la comparaison.
+"""
+from typing import List, Dict, Optional, Tuple
+from datetime import datetime
+from benchmark_data import generate_dataset
+from matcher import TransactionMatcher
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+# Transactions matchées par mesure (les extracteurs traitent tous les libellés)
+DEFAULT_SAMPLE = 1000
+# Mesures par cas (la plus rapide est retenue)
+DEFAULT_REPEAT = 3
+# Régression : plus lent que la référence de plus de 25%...
+DEFAULT_THRESHOLD = 0.25
+# ... et d'au moins 10 ms (en dessous, l'écart est du bruit de mesure)
+NOISE_FLOOR_SECONDS = 0.01
+
+
+def bench_match_transactions(data: Dict, sample: List[Dict]):
+    """Matching complet (factures et lignes bancaires), index compris"""
+    matcher = TransactionMatcher()
+    matcher.match_transactions(sample, data['customer_invoices'], data['supplier_invoices'], data['bank_lines'])
+
+
+def bench_match_with_bank_lines(data: Dict, sample: List[Dict]):
+    """Lignes bancaires seules, index des lignes compris"""
+    matcher = TransactionMatcher()
+    index = matcher._bank_line_index(data['bank_lines'])
+    for transaction in sample:
+        matcher._match_with_bank_lines(transaction, data['bank_lines'], index=index)
+
+
+def bench_extract_invoice_ref(data: Dict, sample: List[Dict]):
+    matcher = TransactionMatcher()
+    for transaction in data['transactions']:
+        matcher.extract_invoice_ref_from_label(transaction['label'])
+
+
+def bench_extract_thirdparty(data: Dict, sample: List[Dict]):
+    matcher = TransactionMatcher()
+    for transaction in data['transactions']:
+        matcher.extract_thirdparty_from_label(transaction['label'])
+
+
+def bench_extract_period(data: Dict, sample: List[Dict]):
+    matcher = TransactionMatcher()
+    for transaction in data['transactions']:
+        matcher.extract_period_from_label(transaction['label'])
+
+
+# Cas mesurés, dans l'ordre d'affichage
+CASES = [
+    ('match_transactions', bench_match_transactions),
+    ('match_with_bank_lines', bench_match_with_bank_lines),
+    ('extract_invoice_ref', bench_extract_invoice_ref),
+    ('extract_thirdparty', bench_extract_thirdparty),
+    ('extract_period', bench_extract_period),
+]
+
+
+def measure(function, data: Dict, sample: List[Dict], repeat: int) -> float:
+    """Durée la plus courte (secondes) sur plusieurs exécutions"""
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        function(data, sample)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def run_benchmarks(sizes: List[int], sample_size: int = DEFAULT_SAMPLE, repeat: int = DEFAULT_REPEAT,
+                   seed: int = 42, cases: Optional[List[str]] = None) -> Dict[str, Dict[str, float]]:
+    """
+    Mesure tous les cas à chaque échelle
+
+    Returns:
+        {taille: {cas: secondes}} (tailles en chaînes, comme dans le fichier JSON)
+    """
+    results = {}
+    for size in sizes:
+        start = time.perf_counter()
+        data = generate_dataset(size, seed=seed)
+        sample = data['transactions'][:sample_size]
+        print(f"[BENCH] {size} transactions générées en {time.perf_counter() - start:.1f}s")
+
+        results[str(size)] = {}
+        for name, function in CASES:
+            if cases and name not in cases:
+                continue
+            seconds = measure(function, data, sample, repeat)
+            results[str(size)][name] = round(seconds, 6)
+            print(f"[BENCH] {size:>7} {name:<24} {seconds * 1000:10.1f} ms")
+    return results
+
+
+def load_baseline(path: str) -> Optional[Dict]:
+    """Référence enregistrée (None si le fichier n'existe pas)"""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(path: str, results: Dict, sample_size: int, repeat: int, seed: int):
+    """Enregistre les mesures comme nouvelle référence"""
+    baseline = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'sample': sample_size,
+        'repeat': repeat,
+        'seed': seed,
+        'results': results
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, indent=2)
+        f.write('\n')
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Compare les mesures à la référence
+
+    Returns:
+        (lignes du rapport, régressions)
+    """
+    rows = []
+    regressions = []
+    for size, cases in results.items():
+        for name, seconds in cases.items():
+            reference = baseline.get('results', {}).get(size, {}).get(name)
+            row = {'size': size, 'case': name, 'seconds': seconds, 'baseline': reference,
+                   'ratio': None, 'status': 'nouveau'}
+            if reference:
+                row['ratio'] = seconds / reference
+                row['status'] = 'ok'
+                if row['ratio'] > 1 + threshold and seconds - reference > NOISE_FLOOR_SECONDS:
+                    row['status'] = 'REGRESSION'
+                    regressions.append(row)
+                elif row['ratio'] < 1 / (1 + threshold):
+                    row['status'] = 'plus rapide'
+            rows.append(row)
+    return rows, regressions
+
+
+def print_report(rows: List[Dict]):
+    """Tableau des mesures comparées à la référence"""
+    print()
+    print(f"{'taille':>7}  {'cas':<24} {'actuel (ms)':>12} {'référence (ms)':>15} {'ratio':>7}  statut")
+    for row in rows:
+        reference = f"{row['baseline'] * 1000:.1f}" if row['baseline'] else '-'
+        ratio = f"{row['ratio']:.2f}" if row['ratio'] is not None else '-'
+        print(f"{row['size']:>7}  {row['case']:<24} {row['seconds'] * 1000:12.1f} {reference:>15} "
+              f"{ratio:>7}  {row['status']}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmarks du matcher sur données synthétiques')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='Échelles (nombre de transactions, de factures et de lignes bancaires)')
+    parser.add_argument('--sample', type=int, default=DEFAULT_SAMPLE,
+                        help='Transactions matchées par mesure')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='Mesures par cas')
+    parser.add_argument('--seed', type=int, default=42, help='Graine du générateur')
+    parser.add_argument('--cases', nargs='+', choices=[name for name, _ in CASES], help='Cas à mesurer')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='Fichier JSON de référence')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Ralentissement toléré (0.25 = +25%%)')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Enregistre les mesures comme référence au lieu de comparer')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.sample, args.repeat, args.seed, args.cases)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results, args.sample, args.repeat, args.seed)
+        print(f"[BENCH] Référence enregistrée dans {args.baseline}")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print(f"[BENCH] Pas de référence ({args.baseline}) : lancer avec --save-baseline")
+        return 0
+    if baseline.get('sample') != args.sample or baseline.get('seed') != args.seed:
+        print(f"[BENCH] Référence mesurée avec un autre échantillon ou une autre graine "
+              f"(sample={baseline.get('sample')}, seed={baseline.get('seed')}) : pas de comparaison")
+        return 0
+
+    rows, regressions = compare(results, baseline, args.threshold)
+    print_report(rows)
+    if regressions:
+        print(f"\n[BENCH] {len(regressions)} régression(s) au-delà de +{args.threshold:.0%}")
+        return 1
+    print(f"\n[BENCH] Aucune régression (seuil +{args.threshold:.0%})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,192 @@
+"""
+Générateur de données synthétiques pour les benchmarks du matcher
+Produit, à partir d'une graine, des relevés bancaires aux libellés réalistes
+(VIRT RECU, PREL C/C, CION TRANSF FAV...), des factures au format de l'API
+Dolibarr (références IN2501-0235) et des lignes bancaires du compte.
+Deux appels avec la même taille et la même graine donnent les mêmes données.
+"""
+from typing import List, Dict
+from datetime import datetime, timedelta
+import random
+
+
+FIRST_NAMES = ['Jean', 'Pierre', 'Marie', 'Julien', 'Sophie', 'Gilbert', 'Benjamin', 'Claire', 'Hinano',
+               'Teva', 'Moana', 'Vaimiti', 'Nicolas', 'Isabelle', 'Thomas', 'Camille', 'Heiarii', 'Paul']
+LAST_NAMES = ['MARTIN', 'BERNARD', 'DUBOIS', 'LEFEBVRE', 'EHUEINA', 'TEMAURI', 'ORIO', 'ILTUD', 'TAPUTU',
+              'FAURE', 'GIRAUD', 'MOREL', 'ROUSSEL', 'TERIITEHAU', 'CHEVALIER', 'BONNET', 'LAMBERT', 'SALMON']
+COMPANY_WORDS = ['GESCO', 'VITI', 'SPEH', 'ONATI', 'TAHITI', 'NAUTIC', 'PACIFIC', 'MARINE', 'BATIMENT',
+                 'ELEC', 'PLOMBERIE', 'TRANSPORTS', 'SERVICES', 'CONSEIL', 'MOTU', 'LAGON', 'RESTAURATION',
+                 'AUTO', 'INFORMATIQUE', 'FROID', 'PEINTURE', 'JARDIN', 'TOURISME', 'DISTRIBUTION']
+LEGAL_FORMS = ['SARL', 'SAS', 'EURL', 'SCI', 'SASU', '']
+MONTHS = ['janvier', 'fevrier', 'mars', 'avril', 'mai', 'juin', 'juillet', 'aout', 'septembre',
+          'octobre', 'novembre', 'decembre']
+
+# Libellés de crédits (règlements de clients) et de débits (fournisseurs, frais)
+CREDIT_LABELS = [
+    'VIRT RECU {name} EUR {amount} de {name}',
+    'VIRT RECU M. {name} EUR',
+    'VIRT RECU {name} {ref_compact}',
+    'VIR SEPA RECU DE: {name}',
+    'VIR ETR RECU O/ {upper} EUR',
+    'FRS TRANSF FAV {name} EUR',
+    'REMISE CHEQUE {month_num}/{year_short}',
+    'Loyer {month} {year}',
+    'Amarrage {name} {month} {year_short}',
+    'PAIEMENT {ref} N°{number}',
+]
+DEBIT_LABELS = [
+    'PREL C/C {upper} PRELEVEMENT',
+    'VIRT FAV {upper} Facture {ref}',
+    'CION TRANSF FAV {name} {number}',
+    'Facture {month_num}/{year} {name}',
+    'PREL C/C SAS {upper} - ABONNEMENT',
+    'CARTE {number} {upper}',
+]
+
+# Date de référence des données (les écarts de dates sont tirés autour)
+BASE_DATE = datetime(2025, 1, 1)
+
+
+def _thirdparty_name(rnd: random.Random) -> str:
+    """Nom de personne ou de société"""
+    if rnd.random() < 0.4:
+        return f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}"
+    words = rnd.sample(COMPANY_WORDS, rnd.randint(1, 2))
+    legal_form = rnd.choice(LEGAL_FORMS)
+    return ' '.join(words + ([legal_form] if legal_form else []))
+
+
+def generate_thirdparties(count: int, rnd: random.Random) -> List[Dict]:
+    """Tiers Dolibarr (identifiant, nom), quelques homonymes compris"""
+    return [{'id': str(i + 1), 'name': _thirdparty_name(rnd)} for i in range(count)]
+
+
+def generate_invoices(count: int, thirdparties: List[Dict], rnd: random.Random) -> List[Dict]:
+    """Factures au format de l'API Dolibarr (montants en chaînes, dates en timestamps)"""
+    invoices = []
+    for i in range(count):
+        date = BASE_DATE + timedelta(days=rnd.randint(-180, 365))
+        total_ttc = round(rnd.choice([rnd.uniform(20, 500), rnd.uniform(500, 5000), 950, 1200, 49.9]), 2)
+        thirdparty = rnd.choice(thirdparties)
+        invoice = {
+            'id': str(i + 1),
+            'ref': f"IN{date.year % 100:02d}{date.month:02d}-{rnd.randint(1, 9999):04d}",
+            'socid': thirdparty['id'],
+            'total_ttc': f"{total_ttc:.8f}",
+            'total_ht': f"{total_ttc / 1.16:.8f}",
+            'date': int(date.timestamp()),
+            'date_lim_reglement': int((date + timedelta(days=30)).timestamp()) if rnd.random() < 0.7 else None,
+            'status': '1',
+            'paye': '0',
+        }
+        # Reste à payer : souvent absent de la liste, parfois un acompte déjà versé
+        if rnd.random() < 0.3:
+            invoice['remaintopay'] = f"{total_ttc / rnd.choice([1, 2, 4]):.2f}"
+        # Le nom du tiers arrive sous différentes formes selon les appels
+        shape = rnd.random()
+        if shape < 0.5:
+            invoice['thirdparty'] = {'id': thirdparty['id'], 'name': thirdparty['name']}
+        elif shape < 0.8:
+            invoice['socname'] = thirdparty['name']
+        elif shape < 0.9:
+            invoice['thirdparty_name'] = thirdparty['name']
+        if rnd.random() < 0.2:
+            invoice['ref_supplier'] = f"FA{rnd.randint(1000, 99999)}"
+        invoices.append(invoice)
+    return invoices
+
+
+def generate_transactions(count: int, customer_invoices: List[Dict], supplier_invoices: List[Dict],
+                          thirdparties: List[Dict], rnd: random.Random) -> List[Dict]:
+    """
+    Transactions d'un relevé (format du parser CSV)
+    La plupart règlent une facture (crédit pour une facture client, débit pour une facture
+    fournisseur ; montant exact ou arrondi, tiers et parfois référence dans le libellé),
+    les autres sont des frais ou virements sans facture.
+    """
+    thirdparties_by_id = {thirdparty['id']: thirdparty for thirdparty in thirdparties}
+    transactions = []
+    for _ in range(count):
+        credit = rnd.random() < 0.6
+        invoice = rnd.choice(customer_invoices if credit else supplier_invoices)
+        paying = rnd.random() < 0.8
+        if paying:
+            name = thirdparties_by_id[invoice['socid']]['name']
+            amount = float(invoice.get('remaintopay') or invoice['total_ttc'])
+            if rnd.random() < 0.2:
+                amount *= rnd.uniform(0.97, 1.03)
+            date = datetime.fromtimestamp(invoice['date_lim_reglement'] or invoice['date']) \
+                + timedelta(days=rnd.randint(-10, 10))
+        else:
+            name = rnd.choice(thirdparties)['name']
+            amount = rnd.uniform(5, 3000)
+            date = BASE_DATE + timedelta(days=rnd.randint(-180, 365))
+        amount = round(amount, 2)
+
+        template = rnd.choice(CREDIT_LABELS if credit else DEBIT_LABELS)
+        ref = invoice['ref'] if paying else f"IN{rnd.randint(2401, 2512)}-{rnd.randint(1, 9999):04d}"
+        label = template.format(
+            name=name, upper=name.upper(), amount=f"{amount:.2f}".replace('.', ','), ref=ref,
+            ref_compact=ref.replace('-', ''), month=rnd.choice(MONTHS), month_num=f"{date.month:02d}",
+            year=str(date.year), year_short=f"{date.year % 100:02d}", number=rnd.randint(100, 99999))
+
+        transactions.append({
+            'date': str(int(date.timestamp())),
+            'date_str': date.strftime('%Y-%m-%d'),
+            'amount': amount if credit else -amount,
+            'label': label,
+            'invoice_ref': None,
+            'raw_data': {},
+        })
+    return transactions
+
+
+def generate_bank_lines(count: int, transactions: List[Dict], rnd: random.Random) -> List[Dict]:
+    """Lignes bancaires Dolibarr du compte : écritures déjà saisies et historique sans rapport"""
+    bank_lines = []
+    for i in range(count):
+        if transactions and rnd.random() < 0.5:
+            transaction = rnd.choice(transactions)
+            date = datetime.fromtimestamp(int(transaction['date'])) + timedelta(days=rnd.randint(-3, 3))
+            amount = transaction['amount']
+            label = transaction['label'] if rnd.random() < 0.5 else f"Paiement {transaction['label'][:20]}"
+        else:
+            date = BASE_DATE + timedelta(days=rnd.randint(-365, 365))
+            amount = round(rnd.uniform(-3000, 3000), 2)
+            label = rnd.choice(['(CustomerInvoicePayment)', '(SupplierInvoicePayment)', 'Frais bancaires',
+                                f"Virement {rnd.choice(LAST_NAMES)}"])
+        bank_lines.append({
+            'id': str(i + 1),
+            'date': str(int(date.timestamp())),
+            'amount': f"{amount:.8f}",
+            'label': label,
+            'num_releve': f"{date.year}{date.month:02d}",
+        })
+    return bank_lines
+
+
+def generate_dataset(size: int, seed: int = 42) -> Dict[str, List[Dict]]:
+    """
+    Jeu de données complet pour une taille donnée
+
+    Args:
+        size: Nombre de transactions (autant de factures et de lignes bancaires)
+        seed: Graine du générateur
+
+    Returns:
+        Dict avec 'transactions', 'customer_invoices', 'supplier_invoices' et 'bank_lines'
+    """
+    rnd = random.Random(seed)
+    thirdparties = generate_thirdparties(max(50, size // 10), rnd)
+    invoices = generate_invoices(size, thirdparties, rnd)
+    # 60% de factures clients, le reste fournisseurs
+    split = int(len(invoices) * 0.6)
+    customer_invoices, supplier_invoices = invoices[:split], invoices[split:]
+    transactions = generate_transactions(size, customer_invoices, supplier_invoices, thirdparties, rnd)
+
+    return {
+        'transactions': transactions,
+        'customer_invoices': customer_invoices,
+        'supplier_invoices': supplier_invoices,
+        'bank_lines': generate_bank_lines(size, transactions, rnd),
+    }
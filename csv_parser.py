@@ -5,7 +5,7 @@ import csv
 import pandas as pd
 from datetime import datetime
 from typing import List, Dict, Optional
-import re
+import label_patterns
 
 
 class BankStatementParser:
@@ -269,27 +269,11 @@ class BankStatementParser:
     
     def _extract_invoice_ref(self, label: str) -> Optional[str]:
         """Extrait une référence de facture depuis le libellé"""
-        # Patterns courants pour les références de factures
-        # Priorité aux formats IN (les plus courants)
-        patterns = [
-            # IN2601-0520 ou IN2601-0520/... -> IN2601-0520
-            r'(IN\d{4}-\d{3,4})',
-            # IN25120498 (sans tiret) -> on le garde tel quel, sera normalisé après
-            r'(IN\d{7,8})',
-            # FAC2601-0520 ou similaire
-            r'(FAC\d{4}-\d{3,4})',
-            r'FAC[.\s-]?(\d+)',  # FAC123 ou FAC-123
-            r'FAC[.\s-]?([A-Z]{2}\d+)',  # FACA0123
-            r'(\d{4}[.\s-]\d{3,})',  # 2024-001 ou 2511-0465
-            r'FACTURE[.\s-]?(?:N[°o]?)?[.\s-]?(\d+)',  # FACTURE N°123 ou Facture N251117
-            r'N[°o\s]?(\d+)',  # N251117 ou N°123
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, label, re.IGNORECASE)
-            if match:
-                ref = match.group(1) if len(match.groups()) > 0 else match.group(0)
-                return ref.upper()
+        # Patterns compilés (voir label_patterns), le premier qui matche gagne
+        match = label_patterns.first_match(label_patterns.CSV_INVOICE_REF_PATTERNS, label)
+        if match:
+            ref = match.group(1) if len(match.groups()) > 0 else match.group(0)
+            return ref.upper()
         
         return None
 
@@ -109,6 +109,24 @@ class Database:
             CREATE INDEX IF NOT EXISTS idx_transactions_status ON imported_transactions(status)
         ''')
         
+        # ID Dolibarr du tiers réconcilié (colonne ajoutée aux bases existantes)
+        cursor.execute('PRAGMA table_info(imported_transactions)')
+        if 'matched_thirdparty_id' not in [row[1] for row in cursor.fetchall()]:
+            cursor.execute('ALTER TABLE imported_transactions ADD COLUMN matched_thirdparty_id INTEGER')
+        
+        # Mémoire des tiers: signature du libellé -> tiers Dolibarr, apprise des réconciliations
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS thirdparty_aliases (
+                signature TEXT NOT NULL,
+                socid INTEGER NOT NULL,
+                thirdparty_name TEXT,
+                hits INTEGER NOT NULL DEFAULT 1,
+                created_at TEXT NOT NULL,
+                last_used_at TEXT NOT NULL,
+                PRIMARY KEY (signature, socid)
+            )
+        ''')
+        
         conn.commit()
         conn.close()
     
@@ -563,13 +581,15 @@ class Database:
             'matched_invoice_type': row['matched_invoice_type'],
             'matched_invoice_ref': row['matched_invoice_ref'],
             'matched_thirdparty': row['matched_thirdparty'],
+            'matched_thirdparty_id': row['matched_thirdparty_id'],
             'payment_id': row['payment_id'],
             'reconciled_at': row['reconciled_at']
         }
     
     def reconcile_transaction(self, transaction_id: int, invoice_id: int,
                              invoice_type: str, invoice_ref: str,
-                             thirdparty_name: str, payment_id: int = None) -> bool:
+                             thirdparty_name: str, payment_id: int = None,
+                             thirdparty_id: int = None, alias_signature: str = None) -> bool:
         """
         Marque une transaction comme réconciliée
         
@@ -580,6 +600,8 @@ class Database:
             invoice_ref: Référence de la facture
             thirdparty_name: Nom du tiers
             payment_id: ID du paiement créé (optionnel)
+            thirdparty_id: ID Dolibarr du tiers (optionnel)
+            alias_signature: Signature du libellé, mémorisée pour ce tiers (optionnel)
         
         Returns:
             True si succès
@@ -596,13 +618,26 @@ class Database:
                 matched_invoice_type = ?,
                 matched_invoice_ref = ?,
                 matched_thirdparty = ?,
+                matched_thirdparty_id = ?,
                 payment_id = ?,
                 reconciled_at = ?
             WHERE id = ?
-        ''', (invoice_id, invoice_type, invoice_ref, thirdparty_name,
+        ''', (invoice_id, invoice_type, invoice_ref, thirdparty_name, thirdparty_id,
               payment_id, reconciled_at, transaction_id))
         
         success = cursor.rowcount > 0
+        
+        # Apprendre l'alias dans la même transaction SQL
+        if success and thirdparty_id and alias_signature:
+            cursor.execute('''
+                INSERT INTO thirdparty_aliases (signature, socid, thirdparty_name, hits, created_at, last_used_at)
+                VALUES (?, ?, ?, 1, ?, ?)
+                ON CONFLICT(signature, socid) DO UPDATE SET
+                    hits = hits + 1,
+                    thirdparty_name = excluded.thirdparty_name,
+                    last_used_at = excluded.last_used_at
+            ''', (alias_signature, int(thirdparty_id), thirdparty_name, reconciled_at, reconciled_at))
+        
         conn.commit()
         conn.close()
         
@@ -646,12 +681,13 @@ class Database:
         
         return success
     
-    def reset_transaction(self, transaction_id: int) -> bool:
+    def reset_transaction(self, transaction_id: int, alias_signature: str = None) -> bool:
         """
         Remet une transaction en statut pending
         
         Args:
             transaction_id: ID de la transaction
+            alias_signature: Signature du libellé, oubliée pour le tiers réconcilié (optionnel)
         
         Returns:
             True si succès
@@ -659,6 +695,20 @@ class Database:
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
+        # Une réconciliation annulée ne doit plus compter dans la mémoire des tiers
+        if alias_signature:
+            cursor.execute('''
+                SELECT matched_thirdparty_id FROM imported_transactions
+                WHERE id = ? AND status = 'reconciled'
+            ''', (transaction_id,))
+            row = cursor.fetchone()
+            if row and row[0]:
+                cursor.execute('''
+                    UPDATE thirdparty_aliases SET hits = hits - 1
+                    WHERE signature = ? AND socid = ?
+                ''', (alias_signature, row[0]))
+                cursor.execute('DELETE FROM thirdparty_aliases WHERE hits <= 0')
+        
         cursor.execute('''
             UPDATE imported_transactions 
             SET status = 'pending',
@@ -666,6 +716,7 @@ class Database:
                 matched_invoice_type = NULL,
                 matched_invoice_ref = NULL,
                 matched_thirdparty = NULL,
+                matched_thirdparty_id = NULL,
                 payment_id = NULL,
                 reconciled_at = NULL
             WHERE id = ?
@@ -677,6 +728,60 @@ class Database:
         
         return success
     
+    def get_thirdparty_alias(self, signature: str, min_hits: int = 1) -> Optional[Dict]:
+        """
+        Tiers mémorisé pour une signature de libellé
+        
+        Args:
+            signature: Signature du libellé (voir TransactionMatcher.label_signature)
+            min_hits: Réconciliations minimum du tiers (voir TransactionMatcher.alias_min_hits)
+        
+        Returns:
+            Dict avec: id, name, hits ; None si la signature est inconnue, ambiguë (le tiers
+            le plus fréquent doit représenter plus de la moitié des réconciliations) ou
+            pas assez confirmée
+        """
+        if not signature:
+            return None
+        
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT socid, thirdparty_name, hits FROM thirdparty_aliases
+            WHERE signature = ?
+            ORDER BY hits DESC, last_used_at DESC
+        ''', (signature,))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        if not rows:
+            return None
+        
+        socid, name, hits = rows[0]
+        if hits < min_hits or hits * 2 <= sum(row[2] for row in rows):
+            return None
+        
+        return {'id': socid, 'name': name, 'hits': hits}
+    
+    def get_thirdparty_alias_stats(self) -> Dict:
+        """Taille de la mémoire des tiers (signatures, tiers, réconciliations apprises)"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT COUNT(DISTINCT signature), COUNT(DISTINCT socid), COALESCE(SUM(hits), 0)
+            FROM thirdparty_aliases
+        ''')
+        row = cursor.fetchone()
+        conn.close()
+        
+        return {
+            'signatures': row[0],
+            'thirdparties': row[1],
+            'reconciliations': row[2]
+        }
+    
     def get_transaction_stats(self) -> Dict:
         """
         Récupère les statistiques sur les transactions importées
@@ -0,0 +1,13 @@
+"""
+Dates des factures, transactions et lignes bancaires sous forme numérique
+Partagé par le scoring vectorisé et l'index des lignes bancaires.
+"""
+from datetime import datetime
+
+
+def local_seconds(date: datetime) -> int:
+    """
+    Secondes depuis l'an 1 d'une date locale naïve
+    Les écarts en jours sont ainsi identiques à (date1 - date2).days, changements d'heure compris
+    """
+    return date.toordinal() * 86400 + date.hour * 3600 + date.minute * 60 + date.second
@@ -3,13 +3,333 @@ Client pour interagir avec l'API Dolibarr
 """
 import requests
 from config import DOLIBARR_URL, DOLIBARR_API_KEY, DOLIBARR_API_LOGIN
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple, Iterator, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from itertools import islice
+from datetime import datetime
+from ref_index import RefIndex
+from endpoint_capabilities import EndpointCapabilities, ENDPOINT_CANDIDATES
 import json
+import time
+
+
+class DolibarrListError(Exception):
+    """Page d'une liste de l'API que Dolibarr n'a pas renvoyée"""
+    
+    def __init__(self, endpoint: str, page: int):
+        super().__init__(f"Page {page} de '{endpoint}' non récupérée")
+        self.endpoint = endpoint
+        self.page = page
+
+
+# Fonctions partagées par le client synchrone et le client asyncio (async_dolibarr_client.py)
+
+def build_api_url(base_url: str, endpoint: str) -> str:
+    """Construit l'URL complète d'un endpoint de l'API"""
+    # Nettoyer l'URL de base
+    base_url = base_url.rstrip('/')
+    
+    # Si l'URL ne se termine pas par /api/index.php, l'ajouter
+    if not base_url.endswith('/api/index.php'):
+        if base_url.endswith('/api'):
+            base_url = f"{base_url}/index.php"
+        elif not base_url.endswith('/index.php'):
+            # Si l'URL contient déjà /dolibarr/, on la garde telle quelle
+            # Sinon, on ajoute /api/index.php
+            if '/dolibarr/' in base_url:
+                if not base_url.endswith('/api/index.php'):
+                    base_url = f"{base_url.rstrip('/')}/api/index.php"
+            else:
+                # Cas où l'URL est juste le domaine, on ajoute /api/index.php
+                base_url = f"{base_url}/api/index.php"
+    
+    # Construire l'URL complète
+    return f"{base_url}/{endpoint.lstrip('/')}"
+
+
+def parse_response_text(text: str, url: str, status_code: int):
+    """
+    Interprète le corps d'une réponse de l'API (JSON, ou ID en texte pour les créations)
+    
+    Returns:
+        Résultat décodé, ou None si la réponse est une erreur
+    """
+    try:
+        # Pour les créations (POST), le résultat est souvent juste l'ID
+        return json.loads(text)
+    except ValueError:
+        # Si ce n'est pas du JSON, c'est peut-être juste un ID en texte
+        text = text.strip()
+        # Essayer de parser comme un entier (ID)
+        try:
+            return int(text)
+        except ValueError:
+            # Si ce n'est pas un nombre, c'est une erreur
+            if text.startswith('<!'):
+                print(f"❌ Page HTML d'erreur reçue de Dolibarr")
+                print(f"URL: {url}")
+                print(f"Status: {status_code}")
+            elif text:
+                # C'est un message d'erreur texte, pas un ID valide
+                print(f"❌ Réponse texte non-numérique de Dolibarr: {text[:200]}")
+            return None
+
+
+def is_empty_list_response(text: str) -> bool:
+    """
+    Indique si un 404 de l'API est la réponse de Dolibarr pour une liste vide
+    ("Not Found: No ... found"), et non un endpoint inexistant ("Not Found" seul,
+    ou page d'erreur du serveur web)
+    """
+    try:
+        message = json.loads(text)['error']['message']
+    except (ValueError, KeyError, TypeError):
+        return False
+    return str(message).strip().lower() != 'not found'
+
+
+def build_ref_index(invoices: List[Dict], invoice_type: str) -> RefIndex:
+    """Index des références d'une liste de factures (référence fournisseur à défaut pour les fournisseurs)"""
+    index = RefIndex()
+    for position, inv in enumerate(invoices):
+        if invoice_type == 'customer':
+            index.add(inv.get('ref') or '', position)
+        else:
+            index.add(inv.get('ref') or inv.get('ref_supplier') or '', position)
+    return index
+
+
+def modified_timestamp(record: Dict) -> Optional[int]:
+    """Date de dernière modification d'un objet Dolibarr (timestamp), si l'API la fournit"""
+    for field in ('tms', 'date_modification'):
+        value = record.get(field)
+        if value not in (None, ''):
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                continue
+    return None
+
+
+def modified_since_filter(since: float) -> str:
+    """Filtre sqlfilters des objets modifiés depuis un timestamp (heure du serveur Dolibarr)"""
+    return f"(t.tms:>=:'{datetime.fromtimestamp(since).strftime('%Y-%m-%d %H:%M:%S')}')"
+
+
+def filter_supplier_invoices(invoices: Iterable[Dict], status: str) -> Iterable[Dict]:
+    """Filtre des factures fournisseurs par statut (l'API ne filtre pas de façon fiable)"""
+    if status == 'unpaid':
+        # Statut 1 = validée/impayée, paye = 0
+        return (inv for inv in invoices
+                if str(inv.get('status')) == '1' or str(inv.get('paye')) == '0')
+    if status == 'paid':
+        # Statut 2 = payée ou paye = 1
+        return (inv for inv in invoices
+                if str(inv.get('status')) == '2' or str(inv.get('paye')) == '1')
+    return invoices
+
+
+def select_thirdparties(name: str, thirdparties: Iterable[Dict]) -> List[Dict]:
+    """
+    Tiers correspondant à un nom : les matchs exacts en priorité, sinon ceux dont
+    le nom contient tous les mots recherchés
+    """
+    name_lower = name.lower().strip()
+    name_parts = [p for p in name_lower.split() if len(p) >= 2]
+    
+    exact_matches = []
+    all_words_matches = []
+    
+    for tp in thirdparties:
+        tp_name = (tp.get('name', '') or tp.get('nom', '')).lower().strip()
+        
+        # Match exact (priorité maximale)
+        if tp_name == name_lower:
+            exact_matches.append(tp)
+            continue
+        
+        # Match si le nom contient TOUS les mots recherchés
+        if name_parts and all(part in tp_name for part in name_parts):
+            all_words_matches.append(tp)
+    
+    # Retourner les matchs exacts en priorité
+    if exact_matches:
+        print(f"   [SEARCH] Match exact trouvé pour '{name}'")
+        return exact_matches
+    
+    # Sinon retourner les matchs avec tous les mots
+    if all_words_matches:
+        print(f"   [SEARCH] {len(all_words_matches)} tiers contenant tous les mots de '{name}'")
+        return all_words_matches
+    
+    # Pas de correspondance suffisante
+    print(f"   [SEARCH] Aucun tiers correspondant à '{name}' dans Dolibarr")
+    return []
+
+
+def thirdparty_payload(name: str, supplier: bool = True, customer: bool = False,
+                       address: str = '', zip_code: str = '', town: str = '',
+                       country_code: str = 'FR', phone: str = '', email: str = '',
+                       code_fournisseur: str = '') -> Dict:
+    """Données de création d'un tiers"""
+    return {
+        'name': name,
+        'name_alias': '',
+        'address': address,
+        'zip': zip_code,
+        'town': town,
+        'country_code': country_code,
+        'phone': phone,
+        'email': email,
+        'client': '0' if not customer else '1',
+        'fournisseur': '1' if supplier else '0',
+        'code_fournisseur': code_fournisseur or 'auto'
+    }
+
+
+def supplier_invoice_payload(socid: int, ref_supplier: str, date_invoice: str,
+                             total_ht: float, total_tva: float = 0, total_ttc: float = None,
+                             lines: List[Dict] = None, note: str = '') -> Dict:
+    """Données de création d'une facture fournisseur (voir DolibarrClient.create_supplier_invoice)"""
+    # Convertir en timestamp string comme dans l'exemple
+    if isinstance(date_invoice, int):
+        date_str = str(date_invoice)  # Garder le timestamp tel quel
+    elif isinstance(date_invoice, str):
+        # Si c'est une date YYYY-MM-DD, convertir en timestamp
+        if '-' in date_invoice:
+            dt = datetime.strptime(date_invoice, '%Y-%m-%d')
+            date_str = str(int(dt.timestamp()))
+        else:
+            date_str = date_invoice
+    else:
+        date_str = str(int(datetime.now().timestamp()))
+    
+    if total_ttc is None:
+        total_ttc = total_ht + total_tva
+    
+    # Lignes par défaut si non fournies (format exact selon l'exemple)
+    if not lines:
+        tva_rate = (total_tva / total_ht * 100) if total_ht > 0 else 0
+        lines = [{
+            'ref_product': 'SERVICE',  # Référence produit par défaut
+            'product_type': '1',  # 1 = Service
+            'desc': note or 'Ligne facture importée depuis PDF',
+            'pu_ht': str(total_ht),
+            'subprice': str(total_ht),
+            'qty': '1',
+            'tva_tx': f"{tva_rate:.2f}",
+            'total_ht': str(total_ht),
+            'total_tva': str(total_tva),
+            'total_ttc': str(total_ttc)
+        }]
+    
+    # Format selon l'API Dolibarr
+    return {
+        'ref': 'Auto',
+        'ref_supplier': ref_supplier,
+        'socid': str(socid),
+        'date': date_str,  # Date de la facture (timestamp)
+        'total_ht': str(total_ht),
+        'total_tva': str(total_tva),
+        'total_ttc': str(total_ttc),
+        'note': note or 'Facture importée depuis PDF',
+        'lines': lines
+    }
+
+
+def payment_payload(datepaye: str, paymentid: int, accountid: int, closepaidinvoices: str = 'yes',
+                    num_payment: str = '', comment: str = '') -> Dict:
+    """Données d'un paiement de facture (voir DolibarrClient.add_payment)"""
+    return {
+        'datepaye': datepaye,
+        'paymentid': paymentid,
+        'closepaidinvoices': closepaidinvoices,
+        'accountid': accountid,
+        'num_payment': num_payment,
+        'comment': comment
+    }
+
+
+def bank_line_payload(date: str, type: str, label: str, amount: float, category: int = 0,
+                      cheque_number: str = '', accountancycode: str = '', datev: str = None,
+                      num_releve: str = '') -> Dict:
+    """Données d'une ligne bancaire (voir DolibarrClient.add_bank_line)"""
+    return {
+        'date': date,
+        'type': type,
+        'label': label,
+        'amount': amount,
+        'category': category,
+        'cheque_number': cheque_number,
+        'accountancycode': accountancycode,
+        'datev': datev or date,
+        'num_releve': num_releve
+    }
+
+
+def bank_accounts_from_response(result) -> List[Dict]:
+    """Comptes bancaires d'une réponse de bankaccounts (liste, ou dict selon la version)"""
+    if result:
+        # Si le résultat est une liste, la retourner directement
+        if isinstance(result, list):
+            return result
+        # Si c'est un dict avec une clé 'accounts' ou similaire
+        if isinstance(result, dict):
+            if 'accounts' in result:
+                return result['accounts']
+            if 'data' in result:
+                return result['data']
+            # Si c'est directement le résultat
+            return [result]
+    
+    return []
+
+
+def document_payload(module_part: str, ref: str, filepath: str, filename: str = None,
+                     overwriteifexists: int = 0) -> Optional[Dict]:
+    """
+    Données d'envoi d'un document (fichier encodé en base64)
+    
+    Returns:
+        Données pour documents/upload, ou None si le fichier n'existe pas
+    """
+    import base64
+    import os
+    
+    if not os.path.exists(filepath):
+        print(f"Erreur: Fichier non trouvé: {filepath}")
+        return None
+    
+    # Lire le fichier et encoder en base64
+    with open(filepath, 'rb') as f:
+        file_content = base64.b64encode(f.read()).decode('utf-8')
+    
+    # Nom du fichier
+    if not filename:
+        filename = os.path.basename(filepath)
+    
+    # Données pour l'API
+    return {
+        'filename': filename,
+        'modulepart': module_part,
+        'ref': ref,
+        'subdir': '',
+        'filecontent': file_content,
+        'fileencoding': 'base64',
+        'overwriteifexists': overwriteifexists
+    }
 
 
 class DolibarrClient:
     """Client pour interagir avec l'API REST Dolibarr"""
     
+    # Durée de validité de l'index des références (secondes)
+    REF_INDEX_TTL = 300
+    # Taille des pages des listes et pages téléchargées en parallèle
+    PAGE_SIZE = 100
+    PAGE_WORKERS = 4
+    
     def __init__(self):
         self.base_url = DOLIBARR_URL
         self.api_key = DOLIBARR_API_KEY
@@ -19,28 +339,117 @@ class DolibarrClient:
             'DOLAPIKEY': self.api_key,
             'Content-Type': 'application/json'
         })
+        # Index des références par type de facture: (date de construction, factures, index)
+        self._ref_indexes: Dict[str, Tuple[float, List[Dict], RefIndex]] = {}
+        # Source locale de toutes les factures pour l'index des références (InvoiceMirror),
+        # à défaut la liste complète est téléchargée page par page
+        self.invoice_source = None
+        # Endpoints supportés par cette instance (détectés au premier usage, mémorisés)
+        self.capabilities = EndpointCapabilities(self.base_url)
+    
+    def _api_url(self, endpoint: str) -> str:
+        """Construit l'URL complète d'un endpoint de l'API"""
+        return build_api_url(self.base_url, endpoint)
+    
+    # ========== Détection des endpoints ==========
+    
+    def _probe_endpoint(self, endpoint: str) -> Optional[bool]:
+        """
+        Teste si un endpoint de liste existe sur cette instance
+        
+        Returns:
+            True/False, ou None si Dolibarr n'a pas répondu (rien ne peut être conclu)
+        """
+        try:
+            response = self.session.get(self._api_url(endpoint), params={'limit': 1})
+        except requests.exceptions.RequestException as e:
+            print(f"Erreur API Dolibarr: {e}")
+            return None
+        
+        if response.status_code == 200:
+            return True
+        if response.status_code == 404:
+            # Liste vide : "Not Found: No ... found" ; route inconnue : "Not Found" seul
+            return is_empty_list_response(response.text)
+        if response.status_code in (401, 403) or response.status_code >= 500:
+            return None
+        return False
+    
+    def _detect_version(self):
+        """Lit la version de Dolibarr (endpoint status)"""
+        status = self._make_request('GET', 'status')
+        if isinstance(status, dict):
+            self.capabilities.set_version((status.get('success') or {}).get('dolibarr_version'))
+    
+    def _probe_resource(self, resource: str) -> Optional[str]:
+        """Détecte et mémorise l'endpoint supporté d'une ressource (None si indéterminé)"""
+        if self.capabilities.version is None:
+            self._detect_version()
+        for endpoint in ENDPOINT_CANDIDATES[resource]:
+            supported = self._probe_endpoint(endpoint)
+            if supported is None:
+                return None
+            if supported:
+                if self.capabilities.get(resource) != endpoint:
+                    print(f"[DOLIBARR] Endpoint '{endpoint}' détecté pour {resource}")
+                self.capabilities.set(resource, endpoint)
+                return endpoint
+        return None
+    
+    def probe_capabilities(self, force: bool = False) -> Dict:
+        """
+        Détecte la version de Dolibarr et les endpoints supportés de chaque ressource
+        
+        Args:
+            force: Refaire la détection même si elle est récente
+        
+        Returns:
+            Carte mémorisée (version, ressource -> endpoint)
+        """
+        self._detect_version()
+        for resource in ENDPOINT_CANDIDATES:
+            if force or self.capabilities.get(resource) is None:
+                if self.capabilities.claim_probe(resource, force=force):
+                    self._probe_resource(resource)
+        return self.capabilities.to_dict()
+    
+    def _routes(self, resource: str) -> Iterator[str]:
+        """
+        Endpoints à essayer pour une ressource, dans l'ordre : l'endpoint détecté (détection
+        au premier usage), puis, si l'appel a échoué, celui d'une nouvelle détection ; tous
+        les noms possibles si la détection n'aboutit pas. L'appelant s'arrête au premier
+        endpoint qui répond.
+        
+        Si Dolibarr a répondu que la route n'existe pas (endpoint mémorisé oublié, voir
+        EndpointCapabilities.route_missing), la nouvelle détection est immédiate ; pour les
+        autres échecs (ex: objet introuvable), elle a lieu au plus une fois par REPROBE_INTERVAL.
+        """
+        if resource not in ENDPOINT_CANDIDATES:
+            yield resource
+            return
+        
+        endpoint = self.capabilities.get(resource)
+        if endpoint is None and self.capabilities.claim_probe(resource):
+            endpoint = self._probe_resource(resource)
+        if endpoint is None:
+            yield from ENDPOINT_CANDIDATES[resource]
+            return
+        
+        yield endpoint
+        # La route détectée a échoué : nouvelle détection
+        missing = self.capabilities.get(resource) is None
+        if not self.capabilities.claim_probe(resource, force=missing):
+            return
+        detected = self._probe_resource(resource)
+        if detected is None and missing:
+            # Détection impossible : les autres noms possibles
+            yield from (candidate for candidate in ENDPOINT_CANDIDATES[resource] if candidate != endpoint)
+        elif detected and detected != endpoint:
+            yield detected
     
     def _make_request(self, method: str, endpoint: str, **kwargs) -> Optional[Dict]:
         """Effectue une requête HTTP vers l'API Dolibarr"""
-        # Nettoyer l'URL de base
-        base_url = self.base_url.rstrip('/')
-        
-        # Si l'URL ne se termine pas par /api/index.php, l'ajouter
-        if not base_url.endswith('/api/index.php'):
-            if base_url.endswith('/api'):
-                base_url = f"{base_url}/index.php"
-            elif not base_url.endswith('/index.php'):
-                # Si l'URL contient déjà /dolibarr/, on la garde telle quelle
-                # Sinon, on ajoute /api/index.php
-                if '/dolibarr/' in base_url:
-                    if not base_url.endswith('/api/index.php'):
-                        base_url = f"{base_url.rstrip('/')}/api/index.php"
-                else:
-                    # Cas où l'URL est juste le domaine, on ajoute /api/index.php
-                    base_url = f"{base_url}/api/index.php"
-        
-        # Construire l'URL complète
-        url = f"{base_url}/{endpoint.lstrip('/')}"
+        url = self._api_url(endpoint)
         
         try:
             response = self.session.request(method, url, **kwargs)
@@ -49,6 +458,8 @@ class DolibarrClient:
             if response.status_code == 404:
                 print(f"Erreur 404: Endpoint non trouvé - {url}")
                 print(f"Vérifiez que l'endpoint '{endpoint}' existe dans votre version de Dolibarr")
+                if not is_empty_list_response(response.text):
+                    self.capabilities.route_missing(endpoint)
                 return None
             elif response.status_code == 401:
                 print(f"Erreur 401: Authentification échouée")
@@ -61,28 +472,7 @@ class DolibarrClient:
                 response.raise_for_status()
             
             if response.content:
-                try:
-                    result = response.json()
-                    # Pour les créations (POST), le résultat est souvent juste l'ID
-                    if isinstance(result, (int, str)):
-                        return result
-                    return result
-                except ValueError as e:
-                    # Si ce n'est pas du JSON, c'est peut-être juste un ID en texte
-                    text = response.text.strip()
-                    # Essayer de parser comme un entier (ID)
-                    try:
-                        return int(text)
-                    except ValueError:
-                        # Si ce n'est pas un nombre, c'est une erreur
-                        if text.startswith('<!'):
-                            print(f"❌ Page HTML d'erreur reçue de Dolibarr")
-                            print(f"URL: {url}")
-                            print(f"Status: {response.status_code}")
-                        elif text:
-                            # C'est un message d'erreur texte, pas un ID valide
-                            print(f"❌ Réponse texte non-numérique de Dolibarr: {text[:200]}")
-                        return None
+                return parse_response_text(response.text, url, response.status_code)
             return None
         except requests.exceptions.RequestException as e:
             print(f"Erreur API Dolibarr: {e}")
@@ -91,25 +481,28 @@ class DolibarrClient:
                 print(f"Response: {e.response.text[:500]}")
             return None
     
-    def get_invoices(self, status: str = 'unpaid', limit: int = 100) -> List[Dict]:
+    def get_invoices(self, status: str = 'unpaid', limit: Optional[int] = None) -> List[Dict]:
         """
         Récupère les factures impayées depuis Dolibarr
         
         Args:
             status: Statut des factures ('unpaid', 'paid', 'draft', 'cancelled')
-            limit: Nombre maximum de factures à récupérer
+            limit: Nombre maximum de factures à récupérer (None = toutes, page par page)
         
         Returns:
             Liste des factures
         """
         params = {
             'status': status,
-            'limit': limit,
             'sortfield': 't.rowid',  # Utiliser rowid au lieu de date pour compatibilité
             'sortorder': 'DESC'
         }
-        result = self._make_request('GET', 'invoices', params=params)
-        return result if isinstance(result, list) else []
+        page_size = min(limit, self.PAGE_SIZE) if limit else None
+        try:
+            return list(islice(self.iter_list('invoices', params, page_size), limit))
+        except DolibarrListError as e:
+            print(f"Erreur API Dolibarr: {e}")
+            return []
     
     def get_invoice(self, invoice_id: int) -> Optional[Dict]:
         """Récupère une facture spécifique par son ID"""
@@ -146,101 +539,222 @@ class DolibarrClient:
         except:
             pass
         
-        # Chercher sans sqlfilters (fallback)
-        try:
-            result = self._make_request('GET', 'invoices', params={'limit': 500})
-            if result and isinstance(result, list):
-                for inv in result:
-                    inv_ref = (inv.get('ref') or '').upper()
-                    if inv_ref == ref_clean or ref_clean in inv_ref or inv_ref.replace('-', '') == ref_clean.replace('-', ''):
-                        inv['_invoice_type'] = 'customer'
-                        return inv
-        except:
-            pass
-        
-        # Chercher dans les factures fournisseurs
-        endpoints = ['supplierinvoices', 'supplier_invoices']
-        for endpoint in endpoints:
+        # Chercher dans l'index local des références (clients puis fournisseurs)
+        for invoice_type in ('customer', 'supplier'):
             try:
-                result = self._make_request('GET', endpoint, params={'limit': 500})
-                if result and isinstance(result, list):
-                    for inv in result:
-                        inv_ref = (inv.get('ref') or inv.get('ref_supplier') or '').upper()
-                        if inv_ref == ref_clean or ref_clean in inv_ref or inv_ref.replace('-', '') == ref_clean.replace('-', ''):
-                            inv['_invoice_type'] = 'supplier'
-                            return inv
-                    break
-            except:
-                continue
+                invoices, index = self._get_ref_index(invoice_type)
+                # Référence de la facture égale ou contenant la référence recherchée
+                position = index.first_match(ref_clean, both_directions=False)
+                if position is not None:
+                    return self._refresh_indexed_invoice(invoices[position], invoice_type)
+            except Exception as e:
+                print(f"Erreur recherche par référence ({invoice_type}): {e}")
         
         return None
     
-    def get_supplier_invoices(self, status: str = 'unpaid', limit: int = 100) -> List[Dict]:
+    def _get_ref_index(self, invoice_type: str) -> Tuple[List[Dict], RefIndex]:
+        """
+        Retourne toutes les factures d'un type et l'index de leurs références,
+        lues une fois (miroir local ou liste paginée) puis réutilisées pendant REF_INDEX_TTL secondes
+        """
+        cached = self._ref_indexes.get(invoice_type)
+        if cached and time.time() - cached[0] < self.REF_INDEX_TTL:
+            return cached[1], cached[2]
+        
+        if self.invoice_source is not None:
+            invoices = self.invoice_source.get_invoices(invoice_type, status=None)
+        else:
+            invoices = self.list_invoices(invoice_type)
+        if invoices is None:
+            # Liste incomplète : rien n'est mis en cache, nouvel essai au prochain appel
+            return [], RefIndex()
+        
+        index = build_ref_index(invoices, invoice_type)
+        self._ref_indexes[invoice_type] = (time.time(), invoices, index)
+        return invoices, index
+    
+    def _refresh_indexed_invoice(self, invoice: Dict, invoice_type: str) -> Dict:
+        """Recharge une facture trouvée dans l'index (son statut a pu changer depuis)"""
+        fresh = None
+        if invoice.get('id'):
+            if invoice_type == 'customer':
+                fresh = self.get_invoice(invoice['id'])
+            else:
+                fresh = self.get_supplier_invoice(invoice['id'])
+        
+        invoice = dict(fresh) if isinstance(fresh, dict) else dict(invoice)
+        invoice['_invoice_type'] = invoice_type
+        return invoice
+    
+    def get_supplier_invoices(self, status: str = 'unpaid', limit: Optional[int] = None) -> List[Dict]:
         """
         Récupère les factures fournisseurs depuis Dolibarr
         
         Args:
             status: Statut des factures ('unpaid', 'paid', 'draft', 'cancelled')
-            limit: Nombre maximum de factures à récupérer
+            limit: Nombre maximum de factures à récupérer (None = toutes, page par page)
         
         Returns:
             Liste des factures fournisseurs
         """
-        # Paramètres simplifiés pour éviter les erreurs SQL
-        params = {
-            'limit': limit
-        }
+        # Paramètres simplifiés pour éviter les erreurs SQL (le statut est filtré ici)
+        invoices = self._iter_endpoints('supplier_invoices')
         
-        result = None
+        # Filtrer par statut si demandé
+        invoices = filter_supplier_invoices(invoices, status)
         
-        # Essayer différents endpoints
-        endpoints = ['supplierinvoices', 'supplier_invoices', 'fournisseur/factures']
+        try:
+            return list(islice(invoices, limit))
+        except DolibarrListError as e:
+            print(f"Erreur API Dolibarr: {e}")
+            return []
+    
+    def _get_list_page(self, endpoint: str, params: Dict) -> Optional[List[Dict]]:
+        """
+        Récupère une page d'une liste de l'API
         
-        for endpoint in endpoints:
-            try:
-                result = self._make_request('GET', endpoint, params=params)
-                if result and isinstance(result, list):
-                    break
-            except:
-                continue
+        Returns:
+            La page (vide si Dolibarr répond 404 "No ... found", sa réponse pour une liste vide),
+            None si la requête a échoué ou si l'endpoint n'existe pas dans cette version
+        """
+        try:
+            response = self.session.get(self._api_url(endpoint), params=params)
+        except requests.exceptions.RequestException as e:
+            print(f"Erreur API Dolibarr: {e}")
+            return None
         
-        if not result:
-            return []
+        if response.status_code == 404:
+            if is_empty_list_response(response.text):
+                return []
+            print(f"Erreur 404: Endpoint non trouvé - {endpoint}")
+            self.capabilities.route_missing(endpoint)
+            return None
+        if response.status_code >= 400:
+            print(f"Erreur API Dolibarr {response.status_code} sur {endpoint}: {response.text[:200]}")
+            return None
+        try:
+            result = response.json()
+        except ValueError:
+            return None
+        return result if isinstance(result, list) else None
+    
+    def iter_list(self, endpoint: str, params: Optional[Dict] = None, page_size: Optional[int] = None,
+                  max_workers: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Parcourt tous les éléments d'une liste de l'API, page par page
         
-        # S'assurer que c'est une liste
-        if not isinstance(result, list):
-            return []
+        La première page est demandée seule (la plupart des listes tiennent dans une page),
+        puis jusqu'à max_workers pages sont téléchargées en parallèle sur la session partagée.
+        Les éléments sont produits dans l'ordre des pages dès que chaque page arrive ; le
+        parcours s'arrête à la première page incomplète.
         
-        # Filtrer par statut si demandé
-        if status:
-            if status == 'unpaid':
-                # Statut 1 = validée/impayée, paye = 0
-                filtered = [inv for inv in result 
-                           if str(inv.get('status')) == '1' or str(inv.get('paye')) == '0']
-                return filtered
-            elif status == 'paid':
-                # Statut 2 = payée ou paye = 1
-                filtered = [inv for inv in result 
-                           if str(inv.get('status')) == '2' or str(inv.get('paye')) == '1']
-                return filtered
+        Args:
+            endpoint: Endpoint de la liste (ex: 'invoices', 'thirdparties')
+            params: Paramètres de la requête (filtres, tri), sans limit ni page
+            page_size: Nombre d'éléments par page (PAGE_SIZE par défaut)
+            max_workers: Pages téléchargées en parallèle (PAGE_WORKERS par défaut)
         
-        return result
+        Raises:
+            DolibarrListError: Une page n'a pas pu être récupérée (la liste serait incomplète)
+        """
+        page_size = page_size or self.PAGE_SIZE
+        max_workers = max_workers or self.PAGE_WORKERS
+        params = dict(params or {}, limit=page_size)
+        
+        result = self._get_list_page(endpoint, dict(params, page=0))
+        if result is None:
+            raise DolibarrListError(endpoint, 0)
+        yield from result
+        if len(result) < page_size or max_workers < 1:
+            return
+        
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        pending = deque()
+        next_page = 1
+        try:
+            while True:
+                # Garder max_workers pages en cours de téléchargement
+                while len(pending) < max_workers:
+                    pending.append((next_page, executor.submit(
+                        self._get_list_page, endpoint, dict(params, page=next_page))))
+                    next_page += 1
+                
+                page, future = pending.popleft()
+                result = future.result()
+                if result is None:
+                    raise DolibarrListError(endpoint, page)
+                yield from result
+                # Dernière page : les pages suivantes déjà demandées sont vides
+                if len(result) < page_size:
+                    return
+        finally:
+            for _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+    
+    def _iter_endpoints(self, resource: str, params: Optional[Dict] = None,
+                        page_size: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Parcourt la liste d'une ressource sur l'endpoint supporté par cette version de Dolibarr
+        
+        Args:
+            resource: Ressource (clé de ENDPOINT_CANDIDATES) ou endpoint
+        
+        Raises:
+            DolibarrListError: Aucun endpoint n'a répondu, ou une page suivante a échoué
+        """
+        error = None
+        for endpoint in self._routes(resource):
+            try:
+                yield from self.iter_list(endpoint, params, page_size)
+                return
+            except DolibarrListError as e:
+                # Échec dès la première page : essayer l'endpoint suivant
+                if e.page > 0:
+                    raise
+                error = e
+        raise error or DolibarrListError(resource, 0)
+    
+    def list_invoices(self, invoice_type: str = 'customer', sqlfilters: str = '',
+                      page_size: Optional[int] = None) -> Optional[List[Dict]]:
+        """
+        Récupère toutes les factures (tous statuts), page par page, sans limite de nombre
+        
+        Args:
+            invoice_type: 'customer' ou 'supplier'
+            sqlfilters: Filtre Dolibarr optionnel (ex: "(t.tms:>=:'2025-01-01 00:00:00')")
+            page_size: Nombre de factures par page
+        
+        Returns:
+            Factures triées par rowid, ou None si une page n'a pas pu être récupérée
+            (une liste incomplète ne doit pas passer pour la liste complète)
+        """
+        resource = 'invoices' if invoice_type == 'customer' else 'supplier_invoices'
+        params = {'sortfield': 't.rowid', 'sortorder': 'ASC'}
+        if sqlfilters:
+            params['sqlfilters'] = sqlfilters
+        
+        try:
+            return list(self._iter_endpoints(resource, params, page_size))
+        except DolibarrListError as e:
+            print(f"Erreur API Dolibarr: {e}")
+            return None
     
     def get_supplier_invoice(self, invoice_id: int) -> Optional[Dict]:
         """Récupère une facture fournisseur spécifique par son ID"""
-        result = self._make_request('GET', f'supplier_invoices/{invoice_id}')
-        if not result:
-            result = self._make_request('GET', f'supplierinvoices/{invoice_id}')
+        result = None
+        for endpoint in self._routes('supplier_invoices'):
+            result = self._make_request('GET', f'{endpoint}/{invoice_id}')
+            if result:
+                break
         return result
     
     def get_thirdparty(self, thirdparty_id: int) -> Optional[Dict]:
         """Récupère les informations d'un tiers par son ID"""
-        # Essayer différents endpoints selon la version de Dolibarr (societes en premier)
-        endpoints = [f'societes/{thirdparty_id}', f'thirdparties/{thirdparty_id}']
-        
-        for endpoint in endpoints:
+        # Endpoint des tiers selon la version de Dolibarr
+        for endpoint in self._routes('thirdparties'):
             try:
-                result = self._make_request('GET', endpoint)
+                result = self._make_request('GET', f'{endpoint}/{thirdparty_id}')
                 if result and isinstance(result, dict):
                     return result
             except:
@@ -248,50 +762,41 @@ class DolibarrClient:
         
         return None
     
-    def search_thirdparty(self, name: str) -> List[Dict]:
-        """Recherche un tiers par nom avec correspondance précise"""
-        endpoints = ['thirdparties', 'societes']
+    def list_thirdparties(self, sqlfilters: str = '') -> Optional[List[Dict]]:
+        """
+        Récupère tous les tiers, triés par rowid, page par page
         
-        for endpoint in endpoints:
-            try:
-                result = self._make_request('GET', endpoint, params={'limit': 500})
-                if result and isinstance(result, list):
-                    name_lower = name.lower().strip()
-                    name_parts = [p for p in name_lower.split() if len(p) >= 2]
-                    
-                    exact_matches = []
-                    all_words_matches = []
-                    
-                    for tp in result:
-                        tp_name = (tp.get('name', '') or tp.get('nom', '')).lower().strip()
-                        
-                        # Match exact (priorité maximale)
-                        if tp_name == name_lower:
-                            exact_matches.append(tp)
-                            continue
-                        
-                        # Match si le nom contient TOUS les mots recherchés
-                        if name_parts and all(part in tp_name for part in name_parts):
-                            all_words_matches.append(tp)
-                    
-                    # Retourner les matchs exacts en priorité
-                    if exact_matches:
-                        print(f"   [SEARCH] Match exact trouvé pour '{name}'")
-                        return exact_matches
-                    
-                    # Sinon retourner les matchs avec tous les mots
-                    if all_words_matches:
-                        print(f"   [SEARCH] {len(all_words_matches)} tiers contenant tous les mots de '{name}'")
-                        return all_words_matches
-                    
-                    # Pas de correspondance suffisante
-                    print(f"   [SEARCH] Aucun tiers correspondant à '{name}' dans Dolibarr")
-                    return []
-            except Exception as e:
-                print(f"   [SEARCH] Erreur endpoint {endpoint}: {e}")
-                continue
+        Args:
+            sqlfilters: Filtre Dolibarr optionnel (ex: tiers modifiés depuis une date)
         
-        return []
+        Returns:
+            Liste des tiers, ou None si une page n'a pas pu être récupérée
+        """
+        params = {'sortfield': 't.rowid', 'sortorder': 'ASC'}
+        if sqlfilters:
+            params['sqlfilters'] = sqlfilters
+        try:
+            return list(self._iter_endpoints('thirdparties', params))
+        except DolibarrListError as e:
+            print(f"   [SEARCH] Erreur liste des tiers: {e}")
+            return None
+    
+    def get_thirdparties(self, limit: Optional[int] = None) -> List[Dict]:
+        """Récupère la liste des tiers (pour construire un index de recherche local)"""
+        try:
+            return list(islice(self._iter_endpoints('thirdparties'), limit))
+        except DolibarrListError as e:
+            print(f"   [SEARCH] Erreur liste des tiers: {e}")
+            return []
+    
+    def search_thirdparty(self, name: str) -> List[Dict]:
+        """Recherche un tiers par nom avec correspondance précise"""
+        try:
+            # Tous les tiers, filtrés au fil des pages
+            return select_thirdparties(name, self._iter_endpoints('thirdparties'))
+        except DolibarrListError as e:
+            print(f"   [SEARCH] Erreur liste des tiers: {e}")
+            return []
     
     def get_thirdparty_invoices(self, thirdparty_id: int, invoice_type: str = 'customer', 
                                 include_paid: bool = True) -> List[Dict]:
@@ -310,26 +815,17 @@ class DolibarrClient:
         
         if invoice_type == 'supplier':
             # Factures fournisseurs
-            endpoints = ['supplierinvoices', 'supplier_invoices', 'fournisseur/factures']
-            for endpoint in endpoints:
-                try:
-                    # Factures impayées
-                    result = self._make_request('GET', endpoint, params={
-                        'thirdparty_ids': thirdparty_id,
-                        'limit': 100
-                    })
-                    if result and isinstance(result, list):
-                        # Filtrer par tiers
-                        for inv in result:
-                            socid = inv.get('socid') or inv.get('fk_soc')
-                            if str(socid) == str(thirdparty_id):
-                                # Déterminer si payée
-                                remain = float(inv.get('remaintopay') or inv.get('total_ht') or 0)
-                                inv['_already_paid'] = remain == 0
-                                all_invoices.append(inv)
-                        break
-                except:
-                    continue
+            try:
+                for inv in self._iter_endpoints('supplier_invoices', {'thirdparty_ids': thirdparty_id}):
+                    # Filtrer par tiers
+                    socid = inv.get('socid') or inv.get('fk_soc')
+                    if str(socid) == str(thirdparty_id):
+                        # Déterminer si payée
+                        remain = float(inv.get('remaintopay') or inv.get('total_ht') or 0)
+                        inv['_already_paid'] = remain == 0
+                        all_invoices.append(inv)
+            except DolibarrListError as e:
+                print(f"Erreur récupération factures tiers: {e}")
         else:
             # Factures clients
             try:
@@ -339,17 +835,11 @@ class DolibarrClient:
                     statuses.append('paid')
                 
                 for status in statuses:
-                    result = self._make_request('GET', 'invoices', params={
-                        'thirdparty_ids': thirdparty_id,
-                        'status': status,
-                        'limit': 100
-                    })
-                    if result and isinstance(result, list):
-                        for inv in result:
-                            socid = inv.get('socid') or inv.get('fk_soc')
-                            if str(socid) == str(thirdparty_id):
-                                inv['_already_paid'] = (status == 'paid')
-                                all_invoices.append(inv)
+                    for inv in self.iter_list('invoices', {'thirdparty_ids': thirdparty_id, 'status': status}):
+                        socid = inv.get('socid') or inv.get('fk_soc')
+                        if str(socid) == str(thirdparty_id):
+                            inv['_already_paid'] = (status == 'paid')
+                            all_invoices.append(inv)
             except Exception as e:
                 print(f"Erreur récupération factures tiers: {e}")
         
@@ -365,26 +855,13 @@ class DolibarrClient:
         Returns:
             ID du tiers créé ou None
         """
-        data = {
-            'name': name,
-            'name_alias': '',
-            'address': address,
-            'zip': zip_code,
-            'town': town,
-            'country_code': country_code,
-            'phone': phone,
-            'email': email,
-            'client': '0' if not customer else '1',
-            'fournisseur': '1' if supplier else '0',
-            'code_fournisseur': code_fournisseur or 'auto'
-        }
+        data = thirdparty_payload(name, supplier, customer, address, zip_code, town,
+                                  country_code, phone, email, code_fournisseur)
         
         print(f"DEBUG: Création tiers avec données: {data}")
         
-        # Essayer différents endpoints selon la version de Dolibarr (societes en premier)
-        endpoints = ['societes', 'thirdparties']
-        
-        for endpoint in endpoints:
+        # Endpoint des tiers selon la version de Dolibarr
+        for endpoint in self._routes('thirdparties'):
             try:
                 result = self._make_request('POST', endpoint, json=data)
                 if result:
@@ -421,56 +898,14 @@ class DolibarrClient:
         Returns:
             ID de la facture créée ou None
         """
-        # Convertir en timestamp string comme dans l'exemple
-        if isinstance(date_invoice, int):
-            date_str = str(date_invoice)  # Garder le timestamp tel quel
-        elif isinstance(date_invoice, str):
-            # Si c'est une date YYYY-MM-DD, convertir en timestamp
-            if '-' in date_invoice:
-                from datetime import datetime
-                dt = datetime.strptime(date_invoice, '%Y-%m-%d')
-                date_str = str(int(dt.timestamp()))
-            else:
-                date_str = date_invoice
-        else:
-            date_str = str(int(datetime.now().timestamp()))
-        
-        if total_ttc is None:
-            total_ttc = total_ht + total_tva
-        
-        # Lignes par défaut si non fournies (format exact selon l'exemple)
-        if not lines:
-            tva_rate = (total_tva / total_ht * 100) if total_ht > 0 else 0
-            lines = [{
-                'ref_product': 'SERVICE',  # Référence produit par défaut
-                'product_type': '1',  # 1 = Service
-                'desc': note or 'Ligne facture importée depuis PDF',
-                'pu_ht': str(total_ht),
-                'subprice': str(total_ht),
-                'qty': '1',
-                'tva_tx': f"{tva_rate:.2f}",
-                'total_ht': str(total_ht),
-                'total_tva': str(total_tva),
-                'total_ttc': str(total_ttc)
-            }]
-        
-        # Format selon l'API Dolibarr
-        data = {
-            'ref': 'Auto',
-            'ref_supplier': ref_supplier,
-            'socid': str(socid),
-            'date': date_str,  # Date de la facture (timestamp)
-            'total_ht': str(total_ht),
-            'total_tva': str(total_tva),
-            'total_ttc': str(total_ttc),
-            'note': note or 'Facture importée depuis PDF',
-            'lines': lines
-        }
+        data = supplier_invoice_payload(socid, ref_supplier, date_invoice, total_ht, total_tva,
+                                        total_ttc, lines, note)
         
         print(f"DEBUG: Création facture fournisseur avec données: {data}")
         
-        # Utiliser l'endpoint correct selon la doc
-        result = self._make_request('POST', 'supplierinvoices', json=data)
+        # Endpoint des factures fournisseurs de cette version (pas de second essai pour une création)
+        endpoint = next(self._routes('supplier_invoices'))
+        result = self._make_request('POST', endpoint, json=data)
         
         if result:
             print(f"DEBUG: Facture créée avec succès, résultat: {result}")
@@ -487,22 +922,7 @@ class DolibarrClient:
             'sortorder': 'ASC',
             'limit': 100
         }
-        result = self._make_request('GET', 'bankaccounts', params=params)
-        
-        if result:
-            # Si le résultat est une liste, la retourner directement
-            if isinstance(result, list):
-                return result
-            # Si c'est un dict avec une clé 'accounts' ou similaire
-            if isinstance(result, dict):
-                if 'accounts' in result:
-                    return result['accounts']
-                if 'data' in result:
-                    return result['data']
-                # Si c'est directement le résultat
-                return [result]
-        
-        return []
+        return bank_accounts_from_response(self._make_request('GET', 'bankaccounts', params=params))
     
     def get_bank_lines(self, account_id: int, sqlfilters: str = '') -> List[Dict]:
         """
@@ -540,23 +960,16 @@ class DolibarrClient:
         Returns:
             ID du paiement créé ou None en cas d'erreur
         """
-        data = {
-            'datepaye': datepaye,
-            'paymentid': paymentid,
-            'closepaidinvoices': closepaidinvoices,
-            'accountid': accountid,
-            'num_payment': num_payment,
-            'comment': comment
-        }
+        data = payment_payload(datepaye, paymentid, accountid, closepaidinvoices, num_payment, comment)
         
         # Endpoint différent selon le type de facture
         if invoice_type == 'supplier':
-            endpoint = f'supplier_invoices/{invoice_id}/payments'
-            # Essayer aussi l'ancien endpoint si le premier échoue
-            result = self._make_request('POST', endpoint, json=data)
-            if not result:
-                endpoint = f'supplierinvoices/{invoice_id}/payments'
-                result = self._make_request('POST', endpoint, json=data)
+            # Endpoint des factures fournisseurs de cette version de Dolibarr
+            result = None
+            for endpoint in self._routes('supplier_invoices'):
+                result = self._make_request('POST', f'{endpoint}/{invoice_id}/payments', json=data)
+                if result:
+                    break
         else:
             endpoint = f'invoices/{invoice_id}/payments'
             result = self._make_request('POST', endpoint, json=data)
@@ -585,17 +998,8 @@ class DolibarrClient:
         Returns:
             ID de la ligne créée ou None en cas d'erreur
         """
-        data = {
-            'date': date,
-            'type': type,
-            'label': label,
-            'amount': amount,
-            'category': category,
-            'cheque_number': cheque_number,
-            'accountancycode': accountancycode,
-            'datev': datev or date,
-            'num_releve': num_releve
-        }
+        data = bank_line_payload(date, type, label, amount, category, cheque_number,
+                                 accountancycode, datev, num_releve)
         result = self._make_request('POST', f'bankaccounts/{account_id}/lines', json=data)
         return result if result else None
     
@@ -614,33 +1018,11 @@ class DolibarrClient:
         Returns:
             Chemin du document créé dans Dolibarr ou None
         """
-        import base64
-        import os
-        
-        if not os.path.exists(filepath):
-            print(f"Erreur: Fichier non trouvé: {filepath}")
+        data = document_payload(module_part, ref, filepath, filename, overwriteifexists)
+        if data is None:
             return None
         
-        # Lire le fichier et encoder en base64
-        with open(filepath, 'rb') as f:
-            file_content = base64.b64encode(f.read()).decode('utf-8')
-        
-        # Nom du fichier
-        if not filename:
-            filename = os.path.basename(filepath)
-        
-        # Données pour l'API
-        data = {
-            'filename': filename,
-            'modulepart': module_part,
-            'ref': ref,
-            'subdir': '',
-            'filecontent': file_content,
-            'fileencoding': 'base64',
-            'overwriteifexists': overwriteifexists
-        }
-        
-        print(f"DEBUG: Attachement document - module={module_part}, ref={ref}, file={filename}")
+        print(f"DEBUG: Attachement document - module={module_part}, ref={ref}, file={data['filename']}")
         
         result = self._make_request('POST', 'documents/upload', json=data)
         
@@ -663,7 +1045,7 @@ class DolibarrClient:
         """
         # Rechercher par ref_supplier
         params = {'sqlfilters': f"t.ref_supplier:=:'{ref_supplier}'"}
-        result = self._make_request('GET', 'supplierinvoices', params=params)
+        result = self._make_request('GET', next(self._routes('supplier_invoices')), params=params)
         
         if result and isinstance(result, list) and len(result) > 0:
             return result[0]
@@ -0,0 +1,132 @@
+"""
+Endpoints de l'API supportés par l'instance Dolibarr
+Selon la version de Dolibarr, une même ressource est exposée sous des noms différents
+(supplierinvoices, supplier_invoices ou fournisseur/factures ; thirdparties ou societes).
+Le nom supporté est détecté une fois, puis mémorisé avec la version de Dolibarr dans un
+fichier JSON : les appels vont directement au bon endpoint au lieu d'essayer chaque nom
+(un 404 par nom non supporté). La détection est refaite si la route échoue, sans délai si
+Dolibarr répond que la route n'existe pas (endpoint mémorisé oublié).
+"""
+from typing import List, Dict, Optional
+from datetime import datetime
+import json
+import os
+import threading
+import time
+
+
+# Ressource -> noms possibles selon la version de Dolibarr, dans l'ordre d'essai
+ENDPOINT_CANDIDATES = {
+    'supplier_invoices': ['supplierinvoices', 'supplier_invoices', 'fournisseur/factures'],
+    'thirdparties': ['thirdparties', 'societes'],
+}
+
+
+class EndpointCapabilities:
+    """Carte ressource -> endpoint détecté, et version de Dolibarr, persistées entre les démarrages"""
+
+    # Délai minimum entre deux détections d'une même ressource : une facture introuvable
+    # fait aussi échouer la route, la détection ne doit pas être refaite à chaque appel
+    REPROBE_INTERVAL = 300
+
+    def __init__(self, base_url: str, path: str = 'dolibarr_endpoints.json'):
+        """
+        Args:
+            base_url: URL de l'API (la carte mémorisée n'est reprise que pour la même instance)
+            path: Fichier JSON de la carte
+        """
+        self.base_url = base_url
+        self.path = path
+        self.version: Optional[str] = None
+        self.endpoints: Dict[str, str] = {}
+        self._probed_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        """Reprend la carte enregistrée pour cette instance"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[DOLIBARR] Carte des endpoints illisible ({self.path}): {e}")
+            return
+        if data.get('base_url') != self.base_url:
+            return
+
+        self.version = data.get('version')
+        self.endpoints = {resource: endpoint for resource, endpoint in (data.get('endpoints') or {}).items()
+                          if endpoint in ENDPOINT_CANDIDATES.get(resource, ())}
+
+    def save(self):
+        """Enregistre la carte (une erreur d'écriture n'empêche pas les appels)"""
+        try:
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(self.to_dict(), f, indent=2)
+        except OSError as e:
+            print(f"[DOLIBARR] Enregistrement de la carte des endpoints impossible: {e}")
+
+    def to_dict(self) -> Dict:
+        return {
+            'base_url': self.base_url,
+            'version': self.version,
+            'endpoints': dict(self.endpoints),
+            'updated_at': datetime.now().isoformat(timespec='seconds')
+        }
+
+    def get(self, resource: str) -> Optional[str]:
+        """Endpoint détecté pour une ressource (None si pas encore détecté)"""
+        return self.endpoints.get(resource)
+
+    def ordered(self, resource: str) -> List[str]:
+        """Noms à essayer : l'endpoint détecté d'abord, puis les autres"""
+        candidates = ENDPOINT_CANDIDATES.get(resource, [resource])
+        detected = self.endpoints.get(resource)
+        if detected is None:
+            return list(candidates)
+        return [detected] + [endpoint for endpoint in candidates if endpoint != detected]
+
+    def set(self, resource: str, endpoint: str):
+        """Mémorise l'endpoint détecté pour une ressource"""
+        if self.endpoints.get(resource) != endpoint:
+            self.endpoints[resource] = endpoint
+            self.save()
+
+    def route_missing(self, endpoint: str) -> Optional[str]:
+        """
+        Oublie l'endpoint mémorisé auquel Dolibarr a répondu "Not Found" (route inexistante)
+
+        Args:
+            endpoint: Endpoint appelé (ex: 'thirdparties/12')
+
+        Returns:
+            Ressource dont l'endpoint a été oublié, ou None
+        """
+        for resource, detected in list(self.endpoints.items()):
+            if endpoint == detected or endpoint.startswith(detected + '/'):
+                print(f"[DOLIBARR] Endpoint '{detected}' introuvable pour {resource} : à détecter de nouveau")
+                del self.endpoints[resource]
+                self.save()
+                return resource
+        return None
+
+    def set_version(self, version: Optional[str]):
+        """Mémorise la version de Dolibarr ; une autre version invalide les endpoints détectés"""
+        if not version or version == self.version:
+            return
+        if self.version is not None:
+            print(f"[DOLIBARR] Version {self.version} -> {version} : endpoints à détecter de nouveau")
+            self.endpoints = {}
+        self.version = version
+        self.save()
+
+    def claim_probe(self, resource: str, force: bool = False) -> bool:
+        """Réserve une détection de la ressource (False si une détection récente a déjà eu lieu)"""
+        with self._lock:
+            now = time.time()
+            if not force and now - self._probed_at.get(resource, 0) < self.REPROBE_INTERVAL:
+                return False
+            self._probed_at[resource] = now
+            return True
@@ -0,0 +1,215 @@
+"""
+Similarité approximative des noms de tiers (fautes de frappe, noms tronqués ou collés)
+"GESCOAD" et "GESCO AD", "EHUEINA" et "EHUIENA" n'ont aucun mot en commun : on compare
+leurs formes compactes (sans espaces) par distance d'édition bornée. Quand les noms ont des
+mots en commun, seuls les mots qui diffèrent sont comparés, un à un ("JEAN MARTIN" n'est pas
+"JEAN MARTINEZ"). Les formes juridiques (SARL, SAS...) sont ignorées : elles ne doivent pas
+rapprocher deux noms. Les chiffres doivent être identiques ("SOCIETE 044" n'est pas
+"SOCIETE 048"). Un index de trigrammes de caractères limite la comparaison aux noms qui
+partagent assez de trigrammes.
+"""
+from typing import List, Dict, Tuple
+from functools import lru_cache
+from collections import Counter
+from itertools import chain
+
+
+# Ressemblance minimum (1 - distance / longueur) pour considérer deux noms comme proches
+FUZZY_MIN_RATIO = 0.8
+# Longueur minimum des formes compactes (les noms courts sont trop ambigus)
+FUZZY_MIN_LENGTH = 5
+# Une transposition ou une substitution modifie au plus 4 trigrammes
+TRIGRAMS_PER_EDIT = 4
+
+# Formes juridiques (noms normalisés), ignorées par la similarité approximative
+LEGAL_FORMS = frozenset(['sarl', 'sas', 'sasu', 'eurl', 'sci', 'sa', 'snc'])
+
+# Suppression des lettres (les noms normalisés ne contiennent que [a-z0-9 ])
+_LETTERS = str.maketrans('', '', 'abcdefghijklmnopqrstuvwxyz')
+
+
+def fuzzy_key(normalized: str) -> str:
+    """Forme compacte d'un nom normalisé, sans ses formes juridiques"""
+    return ''.join(word for word in normalized.split() if word not in LEGAL_FORMS)
+
+
+def digits(text: str) -> str:
+    """Chiffres d'un nom normalisé, dans l'ordre"""
+    return text.translate(_LETTERS)
+
+
+@lru_cache(maxsize=50000)
+def trigrams(text: str) -> frozenset:
+    """Trigrammes de caractères d'une forme compacte"""
+    return frozenset(text[i:i + 3] for i in range(len(text) - 2))
+
+
+def max_distance(length1: int, length2: int) -> int:
+    """Distance d'édition maximum tolérée entre deux formes compactes"""
+    return int(max(length1, length2) * (1 - FUZZY_MIN_RATIO) + 1e-9)
+
+
+def bounded_distance(a: str, b: str, limit: int) -> int:
+    """
+    Distance d'édition avec transpositions (Damerau restreinte), bornée :
+    retourne limit + 1 dès que la distance dépasse limit
+    Seule la bande |i - j| <= limit de la matrice est calculée.
+    """
+    length_a = len(a)
+    length_b = len(b)
+    if abs(length_a - length_b) > limit:
+        return limit + 1
+    over = limit + 1
+    previous2 = None
+    previous = [j if j <= limit else over for j in range(length_b + 1)]
+    for i in range(1, length_a + 1):
+        current = [over] * (length_b + 1)
+        if i <= limit:
+            current[0] = i
+        char_a = a[i - 1]
+        row_min = current[0]
+        for j in range(max(1, i - limit), min(length_b, i + limit) + 1):
+            value = previous[j - 1] if char_a == b[j - 1] else previous[j - 1] + 1
+            if previous[j] + 1 < value:
+                value = previous[j] + 1
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            if previous2 is not None and j > 1 and char_a == b[j - 2] and a[i - 2] == b[j - 1] \
+                    and previous2[j - 2] + 1 < value:
+                value = previous2[j - 2] + 1
+            current[j] = value if value < over else over
+            if value < row_min:
+                row_min = value
+        if row_min > limit:
+            return over
+        previous2, previous = previous, current
+    return previous[length_b]
+
+
+@lru_cache(maxsize=50000)
+def letters(text: str) -> Counter:
+    """Nombre d'occurrences de chaque caractère d'une forme compacte"""
+    return Counter(text)
+
+
+def bag_distance(compact1: str, compact2: str) -> int:
+    """Minorant de la distance d'édition : caractères en trop dans l'un des deux noms"""
+    # Les caractères en trop dans compact2 s'en déduisent par la différence des longueurs
+    extra1 = sum((letters(compact1) - letters(compact2)).values())
+    return max(extra1, extra1 - len(compact1) + len(compact2))
+
+
+def fuzzy_similarity(compact1: str, compact2: str) -> float:
+    """
+    Similarité approximative de deux formes compactes, 0 ou entre 50 et 65
+    (bande "tiers similaire" de calculate_name_similarity)
+    """
+    length1 = len(compact1)
+    length2 = len(compact2)
+    if length1 < FUZZY_MIN_LENGTH or length2 < FUZZY_MIN_LENGTH:
+        return 0.0
+    limit = max_distance(length1, length2)
+    if abs(length1 - length2) > limit or digits(compact1) != digits(compact2):
+        return 0.0
+    # Chaque modification fait perdre au plus TRIGRAMS_PER_EDIT trigrammes à chacun des noms
+    trigrams1 = trigrams(compact1)
+    trigrams2 = trigrams(compact2)
+    shared = len(trigrams1 & trigrams2)
+    if not shared or shared < max(len(trigrams1), len(trigrams2)) - TRIGRAMS_PER_EDIT * limit:
+        return 0.0
+    if bag_distance(compact1, compact2) > limit:
+        return 0.0
+    distance = bounded_distance(compact1, compact2, limit)
+    if distance > limit:
+        return 0.0
+    ratio = 1 - distance / max(length1, length2)
+    return 50.0 + 15.0 * (ratio - FUZZY_MIN_RATIO) / (1 - FUZZY_MIN_RATIO)
+
+
+def word_similarity(normalized1: str, normalized2: str) -> float:
+    """
+    Similarité approximative de deux noms qui ont des mots en commun, 0 ou entre 50 et 65
+
+    Seuls les mots propres à chaque nom (hors formes juridiques) sont comparés : chacun
+    doit être proche d'un mot différent de l'autre nom, et la similarité est celle de la
+    paire la moins proche. Un mot en plus ou en moins n'est pas une faute de frappe.
+    """
+    words1 = set(normalized1.split()) - LEGAL_FORMS
+    words2 = set(normalized2.split()) - LEGAL_FORMS
+    remaining1 = sorted(words1 - words2)
+    remaining2 = sorted(words2 - words1)
+    if not remaining1 or len(remaining1) != len(remaining2):
+        return 0.0
+
+    similarity = 65.0
+    for word in remaining1:
+        best, best_word = 0.0, None
+        for other in remaining2:
+            word_score = fuzzy_similarity(word, other)
+            if word_score > best:
+                best, best_word = word_score, other
+        if not best:
+            return 0.0
+        remaining2.remove(best_word)
+        similarity = min(similarity, best)
+    return similarity
+
+
+class TrigramIndex:
+    """
+    Index de trigrammes des formes compactes (fuzzy_key) de noms normalisés
+
+    Les noms sont répartis par chiffres et par longueur : seuls les noms aux mêmes chiffres
+    et de longueur compatible peuvent être proches. Filtre : un nom à distance d d'un autre
+    garde au moins |trigrammes| - 4d trigrammes communs. Seuls les noms qui passent ce
+    filtre sont comparés par distance d'édition.
+    """
+
+    def __init__(self):
+        self._keys: List[str] = []
+        self._compacts: List[str] = []
+        self._positions: Dict[str, int] = {}
+        # (chiffres, longueur de la forme compacte) -> trigramme -> positions des noms qui le contiennent
+        self._postings: Dict[Tuple[str, int], Dict[str, List[int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, normalized: str):
+        """Ajoute un nom normalisé (les doublons sont ignorés)"""
+        if normalized in self._positions:
+            return
+        key_compact = fuzzy_key(normalized)
+        if len(key_compact) < FUZZY_MIN_LENGTH:
+            return
+        position = len(self._keys)
+        self._positions[normalized] = position
+        self._keys.append(normalized)
+        self._compacts.append(key_compact)
+        postings = self._postings.setdefault((digits(key_compact), len(key_compact)), {})
+        for trigram in trigrams(key_compact):
+            postings.setdefault(trigram, []).append(position)
+
+    def search(self, normalized: str) -> List[str]:
+        """Noms indexés dont la similarité approximative avec normalized est non nulle"""
+        query = fuzzy_key(normalized)
+        if len(query) < FUZZY_MIN_LENGTH:
+            return []
+        query_digits = digits(query)
+        query_trigrams = trigrams(query)
+        length = len(query)
+
+        found = []
+        for candidate_length in range(int(length * FUZZY_MIN_RATIO), int(length / FUZZY_MIN_RATIO) + 1):
+            postings = self._postings.get((query_digits, candidate_length))
+            limit = max_distance(length, candidate_length)
+            if not postings or abs(length - candidate_length) > limit:
+                continue
+
+            # Nombre de trigrammes communs par nom de cette longueur
+            shared = Counter(chain.from_iterable(postings.get(trigram, ()) for trigram in query_trigrams))
+            min_shared = len(query_trigrams) - TRIGRAMS_PER_EDIT * limit
+            for position, count in shared.items():
+                if count >= min_shared and fuzzy_similarity(query, self._compacts[position]) > 0:
+                    found.append(self._keys[position])
+        return found
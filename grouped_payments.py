@@ -0,0 +1,159 @@
+"""
+Paiements groupés : un virement qui règle plusieurs factures d'un même tiers
+Recherche bornée des combinaisons de factures ouvertes dont le total égale
+le montant de la transaction (somme de sous-ensemble en centimes entiers)
+"""
+from typing import List, Dict
+from functools import reduce
+from math import gcd
+import time
+
+
+# Taille maximum de l'ensemble de bits (montant en unités), au-delà la recherche est abandonnée
+MAX_BITS = 4_000_000
+
+
+def to_cents(amount: float) -> int:
+    """Convertit un montant en centimes entiers"""
+    return int(round(abs(amount) * 100))
+
+
+def find_invoice_combinations(amount: float, amounts: List[float], tolerance: float,
+                              max_invoices: int = 8, max_results: int = 3,
+                              time_budget: float = 0.2) -> List[List[int]]:
+    """
+    Cherche les combinaisons (2 factures ou plus) dont le total égale le montant
+
+    Programmation dynamique par ensemble de bits (entier Python) : suffix_reach[i]
+    contient toutes les sommes atteignables avec les factures i..n-1. L'énumération
+    ne descend que dans les branches qui peuvent encore atteindre le montant, donc
+    chaque branche explorée mène à une solution (hors limite du nombre de factures).
+
+    Args:
+        amount: Montant de la transaction
+        amounts: Restes à payer des factures candidates
+        tolerance: Écart maximum toléré (strictement inférieur, comme AMOUNT_TOLERANCE)
+        max_invoices: Nombre maximum de factures par combinaison
+        max_results: Nombre maximum de combinaisons retournées
+        time_budget: Durée maximum de la recherche (secondes)
+
+    Returns:
+        Liste de combinaisons (positions dans amounts), les plus courtes d'abord
+    """
+    deadline = time.perf_counter() + time_budget
+    target = to_cents(amount)
+    # Écart toléré en centimes (0 = montant exact au centime)
+    slack = max(int(round(tolerance * 100)) - 1, 0)
+
+    # Factures utilisables, les plus gros montants d'abord (combinaisons courtes trouvées en premier)
+    items = [(cents, position) for position, cents in enumerate(to_cents(a) for a in amounts)
+             if 0 < cents <= target + slack]
+    items.sort(reverse=True)
+    if len(items) < 2:
+        return []
+
+    # Montants exacts : on travaille au PGCD des montants (ex: 100 centimes pour le XPF)
+    unit = 1
+    if slack == 0:
+        unit = reduce(gcd, (cents for cents, _ in items))
+        if target % unit:
+            return []
+    scaled = [cents // unit for cents, _ in items]
+    target //= unit
+    limit = target + slack
+    if limit > MAX_BITS:
+        return []
+
+    mask = (1 << (limit + 1)) - 1
+    window = (1 << (2 * slack + 1)) - 1
+
+    def reachable(reach: int, remaining: int) -> bool:
+        """Une somme de reach est-elle dans [remaining - slack, remaining + slack] ?"""
+        low = remaining - slack
+        if low < 0:
+            return (reach & ((1 << (remaining + slack + 1)) - 1)) != 0
+        return ((reach >> low) & window) != 0
+
+    suffix_reach = [1] * (len(items) + 1)
+    for i in range(len(items) - 1, -1, -1):
+        reach = suffix_reach[i + 1]
+        suffix_reach[i] = (reach | (reach << scaled[i])) & mask
+        if time.perf_counter() > deadline:
+            return []
+
+    if not reachable(suffix_reach[0], target):
+        return []
+
+    results = []
+    chosen = []
+
+    def explore(start: int, remaining: int) -> bool:
+        """Énumère les combinaisons; retourne False quand la recherche doit s'arrêter"""
+        if len(chosen) >= 2 and abs(remaining) <= slack:
+            results.append([items[i][1] for i in chosen])
+            if len(results) >= max_results:
+                return False
+        if time.perf_counter() > deadline:
+            return False
+        if len(chosen) >= max_invoices:
+            return True
+        for i in range(start, len(items)):
+            if scaled[i] > remaining + slack or not reachable(suffix_reach[i + 1], remaining - scaled[i]):
+                continue
+            chosen.append(i)
+            keep_going = explore(i + 1, remaining - scaled[i])
+            chosen.pop()
+            if not keep_going:
+                return False
+        return True
+
+    explore(0, target)
+    results.sort(key=len)
+    return results
+
+
+def grouped_payment_matches(matcher, amount: float, invoices: List[Dict], invoice_type: str,
+                            max_results: int = 3, time_budget: float = 0.2) -> List[Dict]:
+    """
+    Propose des paiements groupés parmi les factures ouvertes d'un tiers
+
+    Args:
+        matcher: TransactionMatcher (montants des factures, tolérance)
+        amount: Montant de la transaction
+        invoices: Factures du tiers (les factures soldées sont ignorées)
+        invoice_type: Type de facture ('customer' ou 'supplier')
+        max_results: Nombre maximum de propositions
+        time_budget: Durée maximum de la recherche (secondes)
+
+    Returns:
+        Liste de propositions {'invoices', 'invoice_type', 'score', 'reasons', 'amount_diff', 'grouped'}
+    """
+    open_invoices = []
+    amounts = []
+    for inv in invoices:
+        if inv.get('_already_paid'):
+            continue
+        _, remain_to_pay = matcher._invoice_amounts(inv, invoice_type)
+        if remain_to_pay > 0:
+            open_invoices.append(inv)
+            amounts.append(remain_to_pay)
+
+    combinations = find_invoice_combinations(amount, amounts, matcher.amount_tolerance,
+                                             max_results=max_results, time_budget=time_budget)
+
+    matches = []
+    for combination in combinations:
+        total = sum(amounts[position] for position in combination)
+        refs = [open_invoices[position].get('ref') or open_invoices[position].get('ref_supplier') or '-'
+                for position in combination]
+        matches.append({
+            'invoices': [open_invoices[position] for position in combination],
+            'invoice_type': invoice_type,
+            # Moins de factures = proposition plus probable
+            'score': max(100 - 5 * (len(combination) - 2), 60),
+            'reasons': [f"Paiement groupé de {len(combination)} factures ({', '.join(refs)})",
+                        f"Total {total:.2f} = montant de la transaction"],
+            'amount_diff': abs(abs(amount) - total),
+            'grouped': True
+        })
+    return matches
@@ -0,0 +1,450 @@
+"""
+Matching incrémental des transactions en attente
+Les factures candidates (score >= seuil) de chaque transaction en attente sont gardées
+en mémoire. Quand une facture est ajoutée, modifiée ou payée, seules les transactions
+qui peuvent être concernées par cette facture sont re-scorées, et contre cette seule
+facture : montant dans la fenêtre de 5%, même période, échéance proche, référence
+ou tiers correspondant (mêmes conditions que InvoiceIndex, vues depuis la facture).
+"""
+from typing import List, Dict, Optional, Tuple, Set, Any
+from bisect import bisect_left, bisect_right, insort
+from heapq import nsmallest
+from invoice_features import InvoiceFeatureTable
+from ref_index import RefIndex
+from fuzzy_names import TrigramIndex
+from text_index import add_position, build_suffixes, key_lengths, substrings_in, keys_containing
+from matcher import TransactionFeatures
+import scoring_rules
+
+
+class PendingTransactionIndex:
+    """
+    Index inversé des transactions en attente d'un sens (crédits ou débits)
+
+    Pour une facture, retrouve les transactions pour lesquelles elle serait une candidate
+    de InvoiceIndex.candidates. Les transactions retirées restent dans les listes
+    (filtrées par alive) jusqu'à la reconstruction de l'index.
+    """
+
+    # Marge sur les bornes de montant (même marge que InvoiceIndex)
+    AMOUNT_EPSILON = 1e-6
+
+    def __init__(self, matcher):
+        """
+        Args:
+            matcher: TransactionMatcher (tolérances)
+        """
+        self.matcher = matcher
+        self.alive: Set[int] = set()
+        self.dead = 0
+        # Montants et dates triés: (valeur, numéro de transaction)
+        self._amounts: List[Tuple[float, int]] = []
+        self._dates: List[Tuple[int, int]] = []
+        # Période de la transaction et période du libellé (AAMM)
+        self._periods: Dict[int, List[int]] = {}
+        # Références extraites des libellés
+        self.refs = RefIndex()
+        # Noms extraits normalisés, leurs mots, mots de 4+ caractères et trigrammes
+        self._names: Dict[str, List[int]] = {}
+        self._sorted_names: List[str] = []
+        self._tokens: Dict[str, List[int]] = {}
+        self._keywords: Dict[str, List[int]] = {}
+        self._keyword_lengths: List[int] = []
+        self._trigrams = TrigramIndex()
+        # Nom extrait vide une fois normalisé : proche de tous les tiers
+        self._any_name: List[int] = []
+        # Libellés en majuscules (suffixes reconstruits à la demande)
+        self._labels: Dict[str, List[int]] = {}
+        self._label_suffixes = None
+
+    def add(self, seq: int, features: TransactionFeatures):
+        """Ajoute une transaction (numéros croissants)"""
+        self.alive.add(seq)
+        insort(self._amounts, (features.amount, seq))
+        insort(self._dates, (int(features.transaction['date']), seq))
+
+        add_position(self._periods, features.period_code, seq)
+        if features.label_period:
+            add_position(self._periods, features.label_period_code, seq)
+
+        if features.tx_ref:
+            self.refs.add_forms(features.tx_ref_normalized, features.tx_ref_clean, seq)
+
+        if features.extracted_name:
+            normalized = features.extracted_name_normalized
+            if not normalized:
+                self._any_name.append(seq)
+            else:
+                if normalized not in self._names:
+                    insort(self._sorted_names, normalized)
+                add_position(self._names, normalized, seq)
+                self._trigrams.add(normalized)
+                for token in features.extracted_name_parts:
+                    add_position(self._tokens, token, seq)
+                    if len(token) >= 4:
+                        add_position(self._keywords, token, seq)
+                self._keyword_lengths = key_lengths(self._keywords)
+
+        if features.label:
+            add_position(self._labels, features.label_upper, seq)
+            self._label_suffixes = None
+
+    def remove(self, seq: int):
+        """Retire une transaction (elle reste dans les listes jusqu'à la reconstruction)"""
+        if seq in self.alive:
+            self.alive.discard(seq)
+            self.dead += 1
+
+    def affected(self, table: InvoiceFeatureTable) -> Set[int]:
+        """
+        Transactions pour lesquelles la facture (table d'une seule facture) peut atteindre le seuil
+
+        Args:
+            table: InvoiceFeatureTable de la facture
+        """
+        found = set()
+        if table.invoice_amounts[0] == 0:
+            return found
+
+        # Bonus de l'année suffisant pour atteindre le seuil : toutes les transactions
+        if scoring_rules.POINTS['period']['year'] >= scoring_rules.MIN_SCORE:
+            return set(self.alive)
+
+        # Fenêtre de montant de InvoiceIndex, inversée (la relation est symétrique)
+        remain = table.remain_to_pay[0]
+        tolerance = self.matcher.amount_tolerance
+        low = min(remain * 0.95, remain - tolerance) - self.AMOUNT_EPSILON
+        high = max(remain / 0.95, remain + tolerance) + self.AMOUNT_EPSILON
+        start = bisect_left(self._amounts, (low, -1))
+        end = bisect_right(self._amounts, (high, float('inf')))
+        found.update(seq for _, seq in self._amounts[start:end])
+
+        if table.period_codes[0] != table.NO_PERIOD:
+            found.update(self._periods.get(table.period_codes[0], ()))
+
+        if table.due_timestamps[0] is not None:
+            margin = (self.matcher.date_tolerance_days + 1) * 86400
+            start = bisect_left(self._dates, (table.due_timestamps[0] - margin, -1))
+            end = bisect_right(self._dates, (table.due_timestamps[0] + margin, float('inf')))
+            found.update(seq for _, seq in self._dates[start:end])
+
+        for _, inv_ref_normalized, inv_ref_clean in table.refs[0]:
+            self.refs.candidates(inv_ref_normalized, inv_ref_clean, found)
+
+        if table.thirdparty_names[0]:
+            self._name_candidates(table.names_normalized[0], found)
+            self._label_candidates([table.names_upper[0]] + table.name_parts_upper[0], found)
+
+        return found & self.alive
+
+    def _name_candidates(self, n2: str, found: set):
+        """Transactions dont le nom extrait peut obtenir une similarité >= 50 avec le tiers n2"""
+        found.update(self._any_name)
+        if not n2:
+            # Tiers vide une fois normalisé : tout nom extrait commence par lui
+            for positions in self._names.values():
+                found.update(positions)
+            return
+
+        # Nom identique, ou nom extrait préfixe du tiers
+        for end in range(1, len(n2) + 1):
+            found.update(self._names.get(n2[:end], ()))
+
+        # Tiers préfixe du nom extrait
+        i = bisect_left(self._sorted_names, n2)
+        while i < len(self._sorted_names) and self._sorted_names[i].startswith(n2):
+            found.update(self._names[self._sorted_names[i]])
+            i += 1
+
+        # Mot en commun, ou mot de 4+ caractères du nom extrait contenu dans le tiers
+        for token in set(n2.split()):
+            found.update(self._tokens.get(token, ()))
+        substrings_in(n2, self._keywords, self._keyword_lengths, found)
+
+        # Nom proche à quelques fautes près
+        for name in self._trigrams.search(n2):
+            found.update(self._names[name])
+
+    def _label_candidates(self, keys: List[str], found: set):
+        """Transactions dont le libellé contient le nom du tiers ou une de ses parties"""
+        if not self._labels:
+            return
+        if self._label_suffixes is None:
+            self._label_suffixes = build_suffixes(self._labels)
+        for key in keys:
+            for label in keys_containing(self._label_suffixes, key):
+                found.update(self._labels[label])
+
+
+class IncrementalMatcher:
+    """
+    Suggestions de factures des transactions en attente, tenues à jour facture par facture
+
+    Pour chaque transaction, le score de toutes ses factures candidates (score >= seuil)
+    est gardé, ainsi que ses 5 meilleures. Les matches (raisons, écart de montant) ne sont
+    construits que pour ces 5 meilleures, à la demande. Les suggestions sont celles du
+    matching en lot : mêmes règles, même ordre à score égal (ordre des factures Dolibarr).
+    """
+
+    # Nombre de matches proposés par transaction (comme _match_with_invoices)
+    MAX_MATCHES = 5
+
+    # Reconstruction d'un index inversé au-delà de ce nombre de transactions retirées
+    MIN_DEAD_FOR_REBUILD = 1000
+
+    def __init__(self, matcher):
+        """
+        Args:
+            matcher: TransactionMatcher (règles de scoring)
+        """
+        self.matcher = matcher
+        self.loaded = False
+        self._reset()
+
+    def _reset(self):
+        """Vide les transactions, les factures et les suggestions"""
+        self._indexes = {'customer': PendingTransactionIndex(self.matcher),
+                         'supplier': PendingTransactionIndex(self.matcher)}
+        # Numéro interne -> (transaction, caractéristiques, type de facture)
+        self._transactions: Dict[int, Tuple[Dict, TransactionFeatures, str]] = {}
+        self._seq_by_id: Dict[Any, int] = {}
+        self._next_seq = 0
+        # (type, id) -> (rang dans la liste Dolibarr, facture, table de la facture seule)
+        self._invoices: Dict[Tuple[str, str], Tuple[int, Dict, InvoiceFeatureTable]] = {}
+        self._next_rank = 0
+        # Scores des factures candidates de chaque transaction, et transactions de chaque facture
+        self._scores: Dict[int, Dict[Tuple[str, str], int]] = {}
+        self._holders: Dict[Tuple[str, str], Set[int]] = {}
+        # 5 meilleures factures de chaque transaction, et leurs matches une fois construits
+        self._tops: Dict[int, List[Tuple[str, str]]] = {}
+        self._top_matches: Dict[int, List[Dict]] = {}
+
+    @staticmethod
+    def _invoice_key(invoice_id, invoice_type: str) -> Tuple[str, str]:
+        return (invoice_type, str(invoice_id))
+
+    def load(self, transactions: List[Dict], customer_invoices: List[Dict], supplier_invoices: List[Dict]):
+        """
+        Matching complet initial
+
+        Args:
+            transactions: Transactions en attente (avec leur 'id')
+            customer_invoices / supplier_invoices: Factures impayées, dans l'ordre Dolibarr
+        """
+        self._reset()
+        for invoice_type, invoices in (('customer', customer_invoices), ('supplier', supplier_invoices)):
+            for invoice in invoices:
+                self._store_invoice(invoice, invoice_type)
+        self.add_transactions(transactions)
+        self.loaded = True
+
+    def _store_invoice(self, invoice: Dict, invoice_type: str) -> Tuple[str, str]:
+        """Enregistre une facture (garde son rang si elle est déjà connue)"""
+        key = self._invoice_key(invoice.get('id'), invoice_type)
+        previous = self._invoices.get(key)
+        if previous is not None:
+            rank = previous[0]
+        else:
+            rank = self._next_rank
+            self._next_rank += 1
+        self._invoices[key] = (rank, invoice, InvoiceFeatureTable([invoice], invoice_type, self.matcher))
+        return key
+
+    # ========== Transactions ==========
+
+    def add_transactions(self, transactions: List[Dict]) -> int:
+        """Ajoute des transactions en attente et score toutes leurs factures (retourne le nombre ajouté)"""
+        new_transactions = [tx for tx in transactions if tx.get('id') not in self._seq_by_id]
+        if not new_transactions:
+            return 0
+
+        # Index des factures connues de chaque type (l'index du matcher est réutilisé s'il n'a pas changé)
+        snapshots = {}
+        for invoice_type in ('customer', 'supplier'):
+            keys = sorted((key for key in self._invoices if key[0] == invoice_type),
+                          key=lambda key: self._invoices[key][0])
+            invoices = [self._invoices[key][1] for key in keys]
+            snapshots[invoice_type] = (keys, invoices, self.matcher._invoice_index(invoices, invoice_type))
+
+        for transaction in new_transactions:
+            invoice_type = 'customer' if transaction['amount'] > 0 else 'supplier'
+            features = TransactionFeatures(transaction, self.matcher)
+            seq = self._next_seq
+            self._next_seq += 1
+            self._transactions[seq] = (transaction, features, invoice_type)
+            self._seq_by_id[transaction.get('id')] = seq
+            self._indexes[invoice_type].add(seq, features)
+
+            keys, invoices, index = snapshots[invoice_type]
+            scores = {}
+            for position, score in self._scored_positions(features, invoices, index):
+                scores[keys[position]] = score
+                self._holders.setdefault(keys[position], set()).add(seq)
+            self._scores[seq] = scores
+            self._refresh_top(seq)
+
+        return len(new_transactions)
+
+    def _scored_positions(self, features: TransactionFeatures, invoices: List[Dict], index) -> List[Tuple[int, int]]:
+        """(position, score) des factures de l'index qui atteignent le seuil pour une transaction"""
+        table = index.table
+        name_token_ids = table.encode_tokens(features.extracted_name_parts)
+        if self.matcher._use_vector_scorer(index):
+            return index.vector_scorer.scores_above_threshold(features, name_token_ids)
+
+        steps = scoring_rules.compile_rules(self.matcher, features, name_token_ids)
+        scored = []
+        for position in index.candidates(features):
+            match = self.matcher._score_invoice(features, invoices[position], table, position,
+                                                name_token_ids, steps)
+            if match:
+                scored.append((position, match['score']))
+        return scored
+
+    def remove_transaction(self, transaction_id) -> bool:
+        """Retire une transaction (réconciliée ou ignorée)"""
+        seq = self._seq_by_id.pop(transaction_id, None)
+        if seq is None:
+            return False
+        _, _, invoice_type = self._transactions.pop(seq)
+        for key in self._scores.pop(seq):
+            self._holders[key].discard(seq)
+        self._tops.pop(seq, None)
+        self._top_matches.pop(seq, None)
+
+        index = self._indexes[invoice_type]
+        index.remove(seq)
+        if index.dead > max(self.MIN_DEAD_FOR_REBUILD, len(index.alive)):
+            self._rebuild_index(invoice_type)
+        return True
+
+    def _rebuild_index(self, invoice_type: str):
+        """Reconstruit l'index inversé d'un sens sans les transactions retirées"""
+        index = PendingTransactionIndex(self.matcher)
+        for seq in sorted(self._indexes[invoice_type].alive):
+            index.add(seq, self._transactions[seq][1])
+        self._indexes[invoice_type] = index
+
+    def sync_pending(self, pending_transactions: List[Dict]) -> Dict:
+        """
+        Aligne les transactions suivies sur les transactions en attente
+        (retire les réconciliées ou ignorées, ajoute les nouvelles)
+        """
+        pending_ids = set(tx.get('id') for tx in pending_transactions)
+        removed = [tx_id for tx_id in self._seq_by_id if tx_id not in pending_ids]
+        for tx_id in removed:
+            self.remove_transaction(tx_id)
+        added = self.add_transactions(pending_transactions)
+        return {'added': added, 'removed': len(removed)}
+
+    # ========== Factures ==========
+
+    def upsert_invoice(self, invoice: Dict, invoice_type: str) -> List:
+        """
+        Facture ajoutée ou modifiée : re-score les transactions concernées contre cette seule facture
+
+        Returns:
+            Identifiants des transactions dont les suggestions ont (peut-être) changé
+        """
+        key = self._store_invoice(invoice, invoice_type)
+        _, invoice, table = self._invoices[key]
+
+        # Transactions qui l'avaient en candidate, et transactions qu'elle peut maintenant atteindre
+        affected = set(self._holders.get(key, ()))
+        affected |= self._indexes[invoice_type].affected(table)
+
+        changed = []
+        for seq in sorted(affected):
+            _, features, _ = self._transactions[seq]
+            match = self.matcher._score_invoice(features, invoice, table, 0,
+                                                table.encode_tokens(features.extracted_name_parts))
+            if self._set_score(seq, key, match['score'] if match else None):
+                changed.append(self._transactions[seq][0].get('id'))
+        return changed
+
+    def remove_invoice(self, invoice_id, invoice_type: str) -> List:
+        """
+        Facture payée ou supprimée : elle sort des suggestions
+
+        Returns:
+            Identifiants des transactions dont les suggestions ont changé
+        """
+        key = self._invoice_key(invoice_id, invoice_type)
+        changed = []
+        for seq in sorted(self._holders.get(key, ())):
+            if self._set_score(seq, key, None):
+                changed.append(self._transactions[seq][0].get('id'))
+        self._holders.pop(key, None)
+        self._invoices.pop(key, None)
+        return changed
+
+    def _set_score(self, seq: int, key: Tuple[str, str], score: Optional[int]) -> bool:
+        """
+        Enregistre le nouveau score d'une facture pour une transaction (None : sous le seuil)
+
+        Returns:
+            True si la facture est (ou était) dans les 5 meilleures de la transaction
+        """
+        scores = self._scores[seq]
+        if score is None:
+            if scores.pop(key, None) is None:
+                return False
+            self._holders[key].discard(seq)
+        else:
+            scores[key] = score
+            self._holders.setdefault(key, set()).add(seq)
+
+        top = self._tops[seq]
+        if key not in top:
+            if score is None:
+                return False
+            # Hors des 5 meilleures et ne dépasse pas la dernière : rien ne change
+            if len(top) >= self.MAX_MATCHES and self._order(seq, key) > self._order(seq, top[-1]):
+                return False
+        self._refresh_top(seq)
+        return True
+
+    # ========== Suggestions ==========
+
+    def _order(self, seq: int, key: Tuple[str, str]) -> Tuple[int, int]:
+        """Clé de tri : score décroissant, puis ordre des factures dans Dolibarr"""
+        return (-self._scores[seq][key], self._invoices[key][0])
+
+    def _refresh_top(self, seq: int):
+        """Recalcule les 5 meilleures factures d'une transaction"""
+        self._tops[seq] = nsmallest(self.MAX_MATCHES, self._scores[seq], key=lambda key: self._order(seq, key))
+        self._top_matches.pop(seq, None)
+
+    def matches(self, transaction_id) -> Optional[List[Dict]]:
+        """Suggestions d'une transaction (None si elle n'est pas suivie)"""
+        seq = self._seq_by_id.get(transaction_id)
+        if seq is None:
+            return None
+
+        matches = self._top_matches.get(seq)
+        if matches is None:
+            _, features, _ = self._transactions[seq]
+            matches = []
+            for key in self._tops[seq]:
+                _, invoice, table = self._invoices[key]
+                match = self.matcher._score_invoice(features, invoice, table, 0,
+                                                    table.encode_tokens(features.extracted_name_parts))
+                if match:
+                    matches.append(match)
+            self._top_matches[seq] = matches
+        return matches
+
+    def suggestions(self, transaction_ids: Optional[List] = None) -> Dict:
+        """Suggestions par identifiant de transaction (toutes les transactions suivies par défaut)"""
+        if transaction_ids is None:
+            transaction_ids = list(self._seq_by_id)
+        return {tx_id: self.matches(tx_id) for tx_id in transaction_ids if tx_id in self._seq_by_id}
+
+    def stats(self) -> Dict:
+        """Taille de l'état incrémental"""
+        return {
+            'loaded': self.loaded,
+            'transactions': len(self._transactions),
+            'invoices': len(self._invoices),
+            'candidates': sum(len(scores) for scores in self._scores.values())
+        }
@@ -0,0 +1,143 @@
+"""
+Table des caractéristiques des factures Dolibarr pour le matching
+Tout ce que le scoring dérive d'une facture (montants, période de la référence,
+références normalisées, échéance, nom du tiers normalisé et ses mots) est calculé
+une seule fois par instantané de factures, sous forme de colonnes indexées par
+la position de la facture dans la liste
+"""
+from typing import List, Dict, Optional, Tuple
+from datetime import datetime
+
+
+class InvoiceFeatureTable:
+    """
+    Caractéristiques des factures d'un type donné (client ou fournisseur), en colonnes
+
+    La position i de chaque colonne correspond à invoices[i]. La table ne garde
+    pas les factures elles-mêmes : elle peut être réutilisée pour une autre liste
+    de factures identique (même instantané Dolibarr, cf. snapshot_key).
+    """
+
+    # Code de période absent (facture sans période dans sa référence)
+    NO_PERIOD = -1
+
+    def __init__(self, invoices: List[Dict], invoice_type: str, matcher):
+        """
+        Args:
+            invoices: Liste des factures (clients ou fournisseurs)
+            invoice_type: Type de facture ('customer' ou 'supplier')
+            matcher: TransactionMatcher dont on réutilise les normalisations
+        """
+        self.invoice_type = invoice_type
+        self.size = len(invoices)
+
+        # Montants: montant de la facture et reste à payer
+        self.invoice_amounts: List[float] = []
+        self.remain_to_pay: List[float] = []
+        # Période de la référence codée AAMM (ex: 2501), NO_PERIOD si absente
+        self.period_codes: List[int] = []
+        # Références non vides (ref, ref_supplier, ref_ext): (brute, normalisée, nettoyée)
+        self.refs: List[Tuple[Tuple[str, str, str], ...]] = []
+        # Échéance (timestamp et date), None si absente
+        self.due_timestamps: List[Optional[int]] = []
+        self.due_dates: List[Optional[datetime]] = []
+        # Tiers: nom brut, normalisé, identifiants de ses mots, majuscules et ses parties
+        self.thirdparty_names: List[Optional[str]] = []
+        self.names_normalized: List[str] = []
+        self.name_token_ids: List[frozenset] = []
+        self.names_upper: List[str] = []
+        self.name_parts_upper: List[List[str]] = []
+
+        # Groupe de tiers de chaque facture (même nom brut) et première position de chaque groupe
+        self.name_group_ids: List[int] = []
+        self.name_group_positions: List[int] = []
+
+        # Vocabulaire des mots des noms normalisés -> identifiant
+        self.token_ids: Dict[str, int] = {}
+        name_groups: Dict[Optional[str], int] = {}
+
+        for invoice in invoices:
+            invoice_amount, remain_to_pay = matcher._invoice_amounts(invoice, invoice_type)
+            self.invoice_amounts.append(invoice_amount)
+            self.remain_to_pay.append(remain_to_pay)
+
+            invoice_period = matcher.extract_period_from_invoice_ref(invoice.get('ref', ''))
+            if invoice_period:
+                inv_month, inv_year = invoice_period
+                self.period_codes.append(int(inv_year) * 100 + int(inv_month))
+            else:
+                self.period_codes.append(self.NO_PERIOD)
+
+            refs = []
+            for inv_ref in (invoice.get('ref', ''), invoice.get('ref_supplier', ''), invoice.get('ref_ext', '')):
+                if inv_ref:
+                    refs.append((inv_ref, matcher.normalize_invoice_ref(inv_ref), matcher._normalize_ref(inv_ref)))
+            self.refs.append(tuple(refs))
+
+            if invoice.get('date_lim_reglement'):
+                timestamp = int(invoice['date_lim_reglement'])
+                self.due_timestamps.append(timestamp)
+                self.due_dates.append(datetime.fromtimestamp(timestamp))
+            else:
+                self.due_timestamps.append(None)
+                self.due_dates.append(None)
+
+            thirdparty_name = matcher._invoice_thirdparty_name(invoice)
+            self.thirdparty_names.append(thirdparty_name)
+            group_id = name_groups.get(thirdparty_name)
+            if group_id is None:
+                group_id = len(self.name_group_positions)
+                name_groups[thirdparty_name] = group_id
+                self.name_group_positions.append(len(self.name_group_ids))
+            self.name_group_ids.append(group_id)
+            if thirdparty_name:
+                normalized = matcher.normalize_name_for_comparison(thirdparty_name)
+                thirdparty_upper = thirdparty_name.upper()
+                self.names_normalized.append(normalized)
+                self.name_token_ids.append(frozenset(self._token_id(token) for token in normalized.split()))
+                self.names_upper.append(thirdparty_upper)
+                self.name_parts_upper.append([p for p in thirdparty_upper.split() if len(p) > 2])
+            else:
+                self.names_normalized.append('')
+                self.name_token_ids.append(frozenset())
+                self.names_upper.append('')
+                self.name_parts_upper.append([])
+
+    def _token_id(self, token: str) -> int:
+        """Retourne l'identifiant d'un mot, en l'ajoutant au vocabulaire si besoin"""
+        token_id = self.token_ids.get(token)
+        if token_id is None:
+            token_id = len(self.token_ids)
+            self.token_ids[token] = token_id
+        return token_id
+
+    def encode_tokens(self, tokens) -> frozenset:
+        """
+        Convertit les mots d'un nom (côté transaction) en identifiants du vocabulaire
+        Les mots inconnus reçoivent des identifiants négatifs distincts, pour que
+        les comparaisons d'ensembles (intersection, union) restent exactes
+        """
+        encoded = set()
+        unknown = 0
+        for token in tokens:
+            token_id = self.token_ids.get(token)
+            if token_id is None:
+                unknown -= 1
+                token_id = unknown
+            encoded.add(token_id)
+        return frozenset(encoded)
+
+    @staticmethod
+    def snapshot_key(invoices: List[Dict], matcher) -> Tuple:
+        """
+        Empreinte des champs utilisés par le scoring, pour reconnaître un instantané
+        de factures déjà analysé (même contenu, même ordre). '_already_paid' en fait
+        partie (présence et valeur) : il change le reste à payer (_invoice_amounts)
+        """
+        return tuple(
+            (invoice.get('id'), invoice.get('ref'), invoice.get('ref_supplier'), invoice.get('ref_ext'),
+             invoice.get('total_ttc'), invoice.get('total_ht'), invoice.get('remaintopay'),
+             invoice.get('date_lim_reglement'), matcher._invoice_thirdparty_name(invoice),
+             '_already_paid' in invoice, invoice.get('_already_paid'))
+            for invoice in invoices
+        )
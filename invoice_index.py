@@ -0,0 +1,185 @@
+"""
+Index des factures Dolibarr pour le matching en lot
+Construit une seule fois par instantané de factures, il permet de ne scorer
+que les factures susceptibles d'atteindre le seuil de matching
+"""
+from typing import List, Dict
+from bisect import bisect_left, bisect_right
+from ref_index import RefIndex
+from text_index import add_position, build_suffixes, key_lengths, substrings_in, keys_containing
+from fuzzy_names import TrigramIndex
+from scoring_rules import POINTS, MIN_SCORE
+
+
+class InvoiceIndex:
+    """
+    Index des factures d'un type donné (client ou fournisseur)
+
+    Une facture ne peut atteindre le seuil (MIN_SCORE) que si au moins une de ces
+    conditions est vraie (sinon son score est au plus le bonus de l'année, +20) :
+    - montant dans la fenêtre de 5% (ou de la tolérance)
+    - référence correspondante (exacte, contenue ou 4 derniers caractères)
+    - tiers correspondant au nom extrait ou présent dans le libellé
+    - période de la référence égale à celle de la transaction ou du libellé
+    - date d'échéance dans la tolérance de date
+
+    L'index retrouve chacun de ces ensembles sans parcourir toutes les factures,
+    puis les factures candidates sont scorées avec les règles habituelles.
+    """
+
+    # Marge sur les bornes pour ne pas perdre de candidats sur les arrondis
+    AMOUNT_EPSILON = 1e-6
+
+    def __init__(self, table, matcher):
+        """
+        Args:
+            table: InvoiceFeatureTable des factures (client ou fournisseur)
+            matcher: TransactionMatcher dont on réutilise les normalisations
+        """
+        self.table = table
+        self.matcher = matcher
+        # Scoring vectorisé associé, créé par le matcher à la première utilisation
+        self.vector_scorer = None
+
+        # Montants restant à payer triés (pour la fenêtre de montant)
+        amounts = []
+        # Références: forme normalisée, forme nettoyée, 4 derniers caractères
+        self.refs = RefIndex()
+        # Codes de période extraits des références (AAMM)
+        self._periods: Dict[int, List[int]] = {}
+        # Dates d'échéance triées
+        due_dates = []
+        # Noms de tiers: normalisés, tokens normalisés, forme majuscule et ses parties
+        self._names_normalized: Dict[str, List[int]] = {}
+        self._name_tokens: Dict[str, List[int]] = {}
+        self._names_upper: Dict[str, List[int]] = {}
+        self._name_parts_upper: Dict[str, List[int]] = {}
+
+        for position in range(table.size):
+            # Les factures sans montant ne sont jamais scorées
+            if table.invoice_amounts[position] == 0:
+                continue
+
+            amounts.append((table.remain_to_pay[position], position))
+
+            for _, inv_ref_normalized, inv_ref_clean in table.refs[position]:
+                self.refs.add_forms(inv_ref_normalized, inv_ref_clean, position)
+
+            if table.period_codes[position] != table.NO_PERIOD:
+                add_position(self._periods, table.period_codes[position], position)
+
+            if table.due_timestamps[position] is not None:
+                due_dates.append((table.due_timestamps[position], position))
+
+            if table.thirdparty_names[position]:
+                normalized = table.names_normalized[position]
+                add_position(self._names_normalized, normalized, position)
+                for token in set(normalized.split()):
+                    add_position(self._name_tokens, token, position)
+
+                add_position(self._names_upper, table.names_upper[position], position)
+                for part in set(table.name_parts_upper[position]):
+                    add_position(self._name_parts_upper, part, position)
+
+        amounts.sort()
+        self._amount_values = [a for a, _ in amounts]
+        self._amount_positions = [p for _, p in amounts]
+
+        due_dates.sort()
+        self._due_date_values = [d for d, _ in due_dates]
+        self._due_date_positions = [p for _, p in due_dates]
+
+        # Suffixes triés pour les recherches "contient" sur les noms
+        self._sorted_names = sorted(self._names_normalized)
+        self._name_suffixes = build_suffixes(self._names_normalized)
+        # Trigrammes des noms pour les noms mal orthographiés
+        self._name_trigrams = TrigramIndex()
+        for normalized in self._names_normalized:
+            self._name_trigrams.add(normalized)
+
+        # Longueurs existantes des clés pour borner les sous-chaînes à tester
+        self._upper_lengths = key_lengths(self._names_upper)
+        self._part_lengths = key_lengths(self._name_parts_upper)
+
+    def _amount_window(self, amount: float) -> List[int]:
+        """Positions des factures dont le reste à payer peut matcher le montant"""
+        tolerance = self.matcher.amount_tolerance
+        low = min(amount * 0.95, amount - tolerance) - self.AMOUNT_EPSILON
+        high = max(amount / 0.95, amount + tolerance) + self.AMOUNT_EPSILON
+        start = bisect_left(self._amount_values, low)
+        end = bisect_right(self._amount_values, high)
+        return self._amount_positions[start:end]
+
+    def _due_date_window(self, timestamp: int) -> List[int]:
+        """Positions des factures dont l'échéance est dans la tolérance de date"""
+        # Un jour de marge pour les arrondis de jours et les changements d'heure
+        margin = (self.matcher.date_tolerance_days + 1) * 86400
+        start = bisect_left(self._due_date_values, timestamp - margin)
+        end = bisect_right(self._due_date_values, timestamp + margin)
+        return self._due_date_positions[start:end]
+
+    def _ref_candidates(self, features, found: set):
+        """Factures dont une référence peut correspondre (totalement ou partiellement)"""
+        self.refs.candidates(features.tx_ref_normalized, features.tx_ref_clean, found)
+
+    def _name_candidates(self, n1: str, found: set):
+        """Factures dont le tiers peut obtenir une similarité >= 50 avec le nom extrait (normalisé)"""
+
+        # Nom identique, ou nom de la facture préfixe du nom extrait
+        for end in range(len(n1) + 1):
+            found.update(self._names_normalized.get(n1[:end], ()))
+
+        # Nom extrait préfixe du nom de la facture
+        i = bisect_left(self._sorted_names, n1)
+        while i < len(self._sorted_names) and self._sorted_names[i].startswith(n1):
+            found.update(self._names_normalized[self._sorted_names[i]])
+            i += 1
+
+        parts1 = set(n1.split())
+        for part in parts1:
+            # Au moins un mot en commun
+            found.update(self._name_tokens.get(part, ()))
+            # Mot clé de 4+ caractères présent dans le nom de la facture
+            if len(part) >= 4:
+                for name in keys_containing(self._name_suffixes, part):
+                    found.update(self._names_normalized[name])
+
+        # Nom proche à quelques fautes près
+        for name in self._name_trigrams.search(n1):
+            found.update(self._names_normalized[name])
+
+    def _label_name_candidates(self, label_upper: str, found: set):
+        """Factures dont le nom du tiers (ou une partie) apparaît dans le libellé"""
+        substrings_in(label_upper, self._names_upper, self._upper_lengths, found)
+        substrings_in(label_upper, self._name_parts_upper, self._part_lengths, found)
+
+    def candidates(self, features) -> List[int]:
+        """
+        Retourne les positions des factures à scorer pour une transaction, dans l'ordre
+        d'origine (l'ordre est conservé pour que le tri des matches reste identique)
+        
+        Args:
+            features: TransactionFeatures de la transaction
+        """
+        # Bonus de l'année suffisant pour atteindre le seuil : toutes les factures sont candidates
+        if POINTS['period']['year'] >= MIN_SCORE:
+            return list(range(self.table.size))
+
+        found = set(self._amount_window(features.amount))
+
+        found.update(self._periods.get(features.period_code, ()))
+        if features.label_period:
+            found.update(self._periods.get(features.label_period_code, ()))
+
+        found.update(self._due_date_window(int(features.transaction['date'])))
+
+        if features.tx_ref:
+            self._ref_candidates(features, found)
+
+        if features.extracted_name:
+            self._name_candidates(features.extracted_name_normalized, found)
+
+        if features.label:
+            self._label_name_candidates(features.label_upper, found)
+
+        return sorted(found)
@@ -0,0 +1,316 @@
+"""
+Miroir local (SQLite) des factures Dolibarr, clients et fournisseurs
+Le matching et les endpoints lisent les factures ici au lieu de les télécharger à
+chaque appel. La synchronisation est incrémentale : seules les factures modifiées
+depuis la dernière synchronisation (champ tms de Dolibarr, via sqlfilters) sont
+téléchargées. Une synchronisation complète périodique retire les factures supprimées.
+"""
+from typing import List, Dict, Optional, Tuple
+from datetime import datetime
+from dolibarr_client import modified_timestamp, modified_since_filter
+import sqlite3
+import threading
+import json
+import time
+
+
+INVOICE_TYPES = ('customer', 'supplier')
+
+
+class InvoiceMirror:
+    """Copie locale des factures Dolibarr, synchronisée sur leur date de modification"""
+
+    # Âge maximum des données avant une synchronisation incrémentale (secondes)
+    SYNC_INTERVAL = 60
+    # Intervalle des synchronisations complètes (factures supprimées dans Dolibarr)
+    FULL_SYNC_INTERVAL = 24 * 3600
+    # Recouvrement de la fenêtre incrémentale : le filtre tms est interprété dans le fuseau
+    # du serveur Dolibarr, et une facture re-téléchargée est simplement réécrite
+    SYNC_OVERLAP_SECONDS = 24 * 3600
+
+    def __init__(self, dolibarr, db_path: str = 'bankia_invoices.db'):
+        """
+        Args:
+            dolibarr: DolibarrClient utilisé pour la synchronisation
+            db_path: Fichier SQLite du miroir (à côté de bankia.db)
+        """
+        self.dolibarr = dolibarr
+        self.db_path = db_path
+        self._sync_lock = threading.Lock()
+        self._init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_database(self):
+        """Crée les tables du miroir"""
+        conn = self._connect()
+        cursor = conn.cursor()
+
+        # Une ligne par facture : colonnes de filtrage et JSON complet de l'API
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS invoices (
+                invoice_type TEXT NOT NULL,
+                id TEXT NOT NULL,
+                ref TEXT,
+                socid TEXT,
+                status TEXT,
+                paye TEXT,
+                tms INTEGER,
+                data TEXT NOT NULL,
+                synced_at TEXT NOT NULL,
+                PRIMARY KEY (invoice_type, id)
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_invoices_status ON invoices(invoice_type, status, paye)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_invoices_socid ON invoices(invoice_type, socid)')
+
+        # État de la synchronisation par type de facture
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sync_state (
+                invoice_type TEXT PRIMARY KEY,
+                last_tms INTEGER,
+                last_sync REAL,
+                last_full_sync REAL
+            )
+        ''')
+
+        conn.commit()
+        conn.close()
+
+    # ========== Statuts ==========
+
+    @staticmethod
+    def _status_condition(invoice_type: str, status: str) -> Tuple[str, tuple]:
+        """
+        Condition SQL d'un statut, avec la même sémantique que les listes de DolibarrClient
+        (les factures fournisseurs impayées incluent celles dont paye vaut 0)
+        """
+        if status == 'unpaid':
+            if invoice_type == 'supplier':
+                return "(status = '1' OR paye = '0')", ()
+            return "status = '1'", ()
+        if status == 'paid':
+            if invoice_type == 'supplier':
+                return "(status = '2' OR paye = '1')", ()
+            return "status = '2'", ()
+        codes = {'draft': '0', 'cancelled': '3'}
+        return 'status = ?', (codes.get(status, status),)
+
+    @staticmethod
+    def is_unpaid(invoice_type: str, invoice: Dict) -> bool:
+        """La facture fait-elle partie des factures impayées (même règle que get_invoices) ?"""
+        status = str(invoice.get('status', invoice.get('statut', '')))
+        if invoice_type == 'supplier':
+            return status == '1' or str(invoice.get('paye', '')) == '0'
+        return status == '1'
+
+    # ========== Écriture ==========
+
+    def _upsert(self, cursor, invoice_type: str, invoice: Dict, synced_at: str):
+        cursor.execute('''
+            INSERT INTO invoices (invoice_type, id, ref, socid, status, paye, tms, data, synced_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(invoice_type, id) DO UPDATE SET
+                ref = excluded.ref, socid = excluded.socid, status = excluded.status,
+                paye = excluded.paye, tms = excluded.tms, data = excluded.data,
+                synced_at = excluded.synced_at
+        ''', (
+            invoice_type,
+            str(invoice.get('id')),
+            invoice.get('ref'),
+            str(invoice.get('socid') or invoice.get('fk_soc') or ''),
+            str(invoice.get('status', invoice.get('statut', ''))),
+            str(invoice.get('paye', '')),
+            modified_timestamp(invoice),
+            json.dumps(invoice),
+            synced_at
+        ))
+
+    def store_invoice(self, invoice_type: str, invoice: Dict):
+        """Enregistre une facture relue dans Dolibarr (après un paiement, un événement...)"""
+        if not invoice or invoice.get('id') is None:
+            return
+        conn = self._connect()
+        self._upsert(conn.cursor(), invoice_type, invoice, datetime.now().isoformat())
+        conn.commit()
+        conn.close()
+
+    def remove_invoice(self, invoice_type: str, invoice_id):
+        """Retire une facture supprimée dans Dolibarr"""
+        conn = self._connect()
+        conn.execute('DELETE FROM invoices WHERE invoice_type = ? AND id = ?', (invoice_type, str(invoice_id)))
+        conn.commit()
+        conn.close()
+
+    # ========== Synchronisation ==========
+
+    def _sync_state(self, invoice_type: str) -> Dict:
+        conn = self._connect()
+        row = conn.execute('SELECT * FROM sync_state WHERE invoice_type = ?', (invoice_type,)).fetchone()
+        conn.close()
+        if not row:
+            return {'last_tms': None, 'last_sync': None, 'last_full_sync': None}
+        return dict(row)
+
+    def sync(self, invoice_type: str, full: bool = False) -> Optional[List[Tuple[str, str, Optional[Dict]]]]:
+        """
+        Synchronise un type de facture avec Dolibarr
+
+        Args:
+            invoice_type: 'customer' ou 'supplier'
+            full: Synchronisation complète (sinon seules les factures modifiées sont lues)
+
+        Returns:
+            Changements (type, id, facture ; None si supprimée), ou None si Dolibarr
+            n'a pas répondu (le miroir est alors laissé tel quel)
+        """
+        state = self._sync_state(invoice_type)
+        full = full or state['last_sync'] is None
+        started_at = time.time()
+
+        sqlfilters = ''
+        if not full:
+            since = (state['last_tms'] or int(state['last_sync'])) - self.SYNC_OVERLAP_SECONDS
+            sqlfilters = modified_since_filter(since)
+
+        invoices = self.dolibarr.list_invoices(invoice_type, sqlfilters=sqlfilters)
+        if invoices is None:
+            print(f"[MIRROR] Synchronisation des factures {invoice_type} impossible, miroir inchangé")
+            return None
+
+        conn = self._connect()
+        cursor = conn.cursor()
+        stored = {row['id']: row['data'] for row in
+                  cursor.execute('SELECT id, data FROM invoices WHERE invoice_type = ?', (invoice_type,))}
+
+        changes = []
+        synced_at = datetime.now().isoformat()
+        last_tms = state['last_tms']
+        for invoice in invoices:
+            invoice_id = str(invoice.get('id'))
+            modified_at = modified_timestamp(invoice)
+            if modified_at is not None and (last_tms is None or modified_at > last_tms):
+                last_tms = modified_at
+            # Factures du recouvrement déjà à jour : pas de changement
+            if stored.get(invoice_id) == json.dumps(invoice):
+                continue
+            self._upsert(cursor, invoice_type, invoice, synced_at)
+            changes.append((invoice_type, invoice_id, invoice))
+
+        if full:
+            # Factures absentes de la liste complète : supprimées dans Dolibarr
+            seen = set(str(invoice.get('id')) for invoice in invoices)
+            for invoice_id in set(stored) - seen:
+                cursor.execute('DELETE FROM invoices WHERE invoice_type = ? AND id = ?', (invoice_type, invoice_id))
+                changes.append((invoice_type, invoice_id, None))
+
+        cursor.execute('''
+            INSERT INTO sync_state (invoice_type, last_tms, last_sync, last_full_sync)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(invoice_type) DO UPDATE SET
+                last_tms = excluded.last_tms, last_sync = excluded.last_sync,
+                last_full_sync = COALESCE(excluded.last_full_sync, sync_state.last_full_sync)
+        ''', (invoice_type, last_tms, started_at, started_at if full else None))
+        conn.commit()
+        conn.close()
+
+        print(f"[MIRROR] Factures {invoice_type} : {len(invoices)} lue(s), {len(changes)} changement(s) "
+              f"({'complète' if full else 'incrémentale'}, {time.time() - started_at:.2f}s)")
+        return changes
+
+    def sync_if_stale(self, max_age: Optional[float] = None,
+                      full: bool = False) -> List[Tuple[str, str, Optional[Dict]]]:
+        """
+        Synchronise les types dont la dernière synchronisation date de plus de max_age secondes
+        (complète si demandé ou si la dernière complète date de plus de FULL_SYNC_INTERVAL)
+
+        Returns:
+            Changements (type, id, facture ; None si supprimée)
+        """
+        max_age = self.SYNC_INTERVAL if max_age is None else max_age
+        changes = []
+        with self._sync_lock:
+            for invoice_type in INVOICE_TYPES:
+                state = self._sync_state(invoice_type)
+                now = time.time()
+                if state['last_sync'] is not None and now - state['last_sync'] < max_age:
+                    continue
+                full_sync = full or state['last_full_sync'] is None \
+                    or now - state['last_full_sync'] > self.FULL_SYNC_INTERVAL
+                try:
+                    changes.extend(self.sync(invoice_type, full=full_sync) or [])
+                except Exception as e:
+                    print(f"[MIRROR] Erreur synchronisation {invoice_type}: {e}")
+        return changes
+
+    # ========== Lecture ==========
+
+    def _query(self, where: str, params: tuple) -> List[Dict]:
+        conn = self._connect()
+        rows = conn.execute(f'SELECT data FROM invoices WHERE {where} ORDER BY CAST(id AS INTEGER) DESC',
+                            params).fetchall()
+        conn.close()
+        return [json.loads(row['data']) for row in rows]
+
+    def get_invoices(self, invoice_type: str = 'customer', status: Optional[str] = 'unpaid') -> List[Dict]:
+        """
+        Factures d'un type, sans limite de nombre (les plus récentes d'abord)
+
+        Args:
+            invoice_type: 'customer' ou 'supplier'
+            status: 'unpaid', 'paid', 'draft', 'cancelled' ou None (toutes)
+        """
+        if not status:
+            return self._query('invoice_type = ?', (invoice_type,))
+        condition, params = self._status_condition(invoice_type, status)
+        return self._query(f'invoice_type = ? AND {condition}', (invoice_type,) + params)
+
+    def get_thirdparty_invoices(self, thirdparty_id, invoice_type: str = 'customer',
+                                include_paid: bool = True) -> List[Dict]:
+        """
+        Factures d'un tiers, marquées '_already_paid' comme DolibarrClient.get_thirdparty_invoices
+
+        Args:
+            thirdparty_id: ID du tiers
+            invoice_type: 'customer' ou 'supplier'
+            include_paid: Inclure les factures payées
+        """
+        if invoice_type == 'supplier':
+            where = 'invoice_type = ? AND socid = ?'
+            if not include_paid:
+                where += " AND NOT (status = '2' OR paye = '1')"
+            invoices = self._query(where, ('supplier', str(thirdparty_id)))
+            for invoice in invoices:
+                remain = float(invoice.get('remaintopay') or invoice.get('total_ht') or 0)
+                invoice['_already_paid'] = remain == 0
+            return invoices
+
+        statuses = "('1', '2')" if include_paid else "('1')"
+        invoices = self._query(f'invoice_type = ? AND socid = ? AND status IN {statuses}',
+                               ('customer', str(thirdparty_id)))
+        for invoice in invoices:
+            invoice['_already_paid'] = str(invoice.get('status')) == '2'
+        return invoices
+
+    def synced_at(self) -> Optional[str]:
+        """
+        Date de la plus ancienne des dernières synchronisations (clients, fournisseurs)
+        Les factures lues dans le miroir sont au moins aussi récentes ; None si un type
+        n'a jamais été synchronisé.
+        """
+        last_syncs = [self._sync_state(invoice_type)['last_sync'] for invoice_type in INVOICE_TYPES]
+        if any(last_sync is None for last_sync in last_syncs):
+            return None
+        return datetime.fromtimestamp(min(last_syncs)).isoformat(timespec='seconds')
+
+    def stats(self) -> Dict:
+        """Nombre de factures et état de la synchronisation par type"""
+        conn = self._connect()
+        counts = {row['invoice_type']: row['count'] for row in conn.execute(
+            'SELECT invoice_type, COUNT(*) AS count FROM invoices GROUP BY invoice_type')}
+        conn.close()
+        return {invoice_type: dict(self._sync_state(invoice_type), invoices=counts.get(invoice_type, 0))
+                for invoice_type in INVOICE_TYPES}
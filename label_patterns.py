@@ -0,0 +1,151 @@
+"""
+Registre des expressions régulières utilisées pour analyser les libellés bancaires
+et les références de factures (matcher et parser CSV)
+
+Toutes les expressions sont compilées une seule fois au chargement du module.
+Pour les listes de patterns, l'ordre est important : le premier qui matche gagne.
+"""
+import re
+from typing import List, Optional, Pattern, Match, Tuple
+
+
+# ========== Extraction du tiers depuis le libellé ==========
+
+# Patterns pour extraire le nom du tiers depuis le libellé bancaire
+# Ordre important : les plus spécifiques en premier
+THIRDPARTY_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in [
+    # VIRT RECU M. JULIEN-PIERRE OFF EUR -> JULIEN-PIERRE OFF (ignore M. Mme etc)
+    r'VIRT\s+RECU\s+(?:M\.|MME|MR|MRS|MLLE)?\s*([A-Z][A-Za-z\-]+(?:\s+[A-Z][A-Za-z\-]+){0,2})\s+EUR',
+    # VIRT RECU ORIO ILTUD EUR 950,00 de ORIO ILTUD -> ORIO ILTUD
+    r'VIRT\s+RECU\s+([A-Z][A-Za-z]+(?:\s+[A-Z][A-Za-z]+)?)\s+EUR',
+    # VIRT RECU SARL SPEH IN... -> SARL SPEH ou SPEH
+    r'VIRT\s+RECU\s+((?:SARL|SAS|EURL|SA|SCI|SNC|SASU)?\s*[A-Z][A-Za-z\-]+(?:\s+[A-Z][A-Za-z\-]+)?)\s+IN',
+    # VIRT RECU NOM PRENOM ... -> NOM PRENOM (avant EUR/XPF/IN//)
+    r'VIRT\s+RECU\s+(?:M\.|MME|MR|MRS|MLLE)?\s*([A-Z][A-Za-z\-]+(?:\s+[A-Z][A-Za-z\-]+){0,2})(?:\s+EUR|\s+XPF|\s+IN|\s+/)',
+    # VIRT FAV GESCOAD Facture -> GESCOAD
+    r'VIRT\s+(?:FAV|EUR)\s+([A-Z][A-Z0-9\s\-\.]+?)(?:\s+Facture|\s+FAC|\s+N\d|\s+EUR|\s*$)',
+    # PREL C/C VITI SAS VITI PRELEVEMENT -> VITI SAS ou VITI
+    r'PREL\s+C/C\s+([A-Z][A-Z0-9\s\-\.]+?)(?:\s+PREL|\s+PRELEVEMENT|\s*$)',
+    # FRS TRANSF FAV Gilbert EHUEINA -> Gilbert EHUEINA
+    r'(?:FRS\s+)?TRANSF\s+FAV\s+([A-Z][A-Za-z0-9\s\-\.]+?)(?:\s+EUR|\s+XPF|\s+\d|\s*$)',
+    # CION TRANSF FAV Gilbert -> Gilbert
+    r'CION\s+(?:S/\s+)?(?:TRANSF\s+)?(?:FAV\s+)?([A-Z][A-Za-z0-9\s\-\.]+?)(?:\s+EUR|\s+XPF|\s+\d|\s*$)',
+    # VIR ETR RECU O/ BENJAMIN -> BENJAMIN
+    r'VIR\s+ETR\s+RECU\s+O/\s*([A-Z][A-Za-z0-9\s\-\.]+?)(?:\s+EUR|\s+XPF|\s+\d|\s*$)',
+    # VIR SEPA RECU DE: NOM PRENOM -> NOM PRENOM
+    r'VIR\s+(?:SEPA\s+)?RECU\s+(?:DE:?\s+)?([A-Z][A-Za-z]+(?:\s+[A-Z][A-Za-z]+){0,2})',
+    # PREL C/C SAS ONATI -> SAS ONATI ou ONATI
+    r'PREL\s+C/C\s+(?:SAS\s+)?([A-Z][A-Z0-9\s\-\.]+?)(?:\s+-|\s+ABONNE|\s+FAC|\s*$)',
+]]
+
+# Nettoyage du nom extrait (retirer les mots inutiles à la fin), appliqué dans l'ordre
+THIRDPARTY_CLEANUP = [
+    re.compile(r'\s+(EUR|XPF|USD|CHF|\d+[,\.]\d+).*$'),
+    re.compile(r'\s+de\s+.*$', re.IGNORECASE),
+    re.compile(r'\s+/\s*$'),
+    re.compile(r'\s+IN\d+.*$'),  # Retirer les références IN
+]
+
+# Formes juridiques en début de nom
+LEGAL_FORM_PREFIX = re.compile(r'^(SARL|SAS|EURL|SA|SCI|SNC|SASU|ETS|CIE)\s+')
+
+
+# ========== Extraction de la période (mois, année) ==========
+
+# Mapping des mois français vers numéros
+MONTH_NAMES = {
+    'janvier': '01', 'jan': '01', 'janv': '01',
+    'fevrier': '02', 'février': '02', 'fev': '02', 'févr': '02',
+    'mars': '03', 'mar': '03',
+    'avril': '04', 'avr': '04',
+    'mai': '05',
+    'juin': '06', 'jun': '06',
+    'juillet': '07', 'juil': '07', 'jul': '07',
+    'aout': '08', 'août': '08', 'aou': '08',
+    'septembre': '09', 'sept': '09', 'sep': '09',
+    'octobre': '10', 'oct': '10',
+    'novembre': '11', 'nov': '11',
+    'decembre': '12', 'décembre': '12', 'dec': '12', 'déc': '12'
+}
+
+# Priorité de chaque nom de mois (ordre du mapping)
+MONTH_PRIORITY = {name: priority for priority, name in enumerate(MONTH_NAMES)}
+
+# "mois année" (janvier 25, mars 2025, sept'25...) en une seule alternative nommée
+MONTH_YEAR_PATTERN = re.compile(
+    r'\b(?P<month>' + '|'.join(re.escape(name) for name in MONTH_NAMES) + r')'
+    r'\s*[\'"]?\s*(?P<year>\d{2}(?:\d{2})?)\b'
+)
+
+# "MM/YYYY", "MM-YYYY" ou "MM.YYYY"
+NUMERIC_PERIOD_LONG = re.compile(r'\b(\d{2})[/\-\.](\d{4})\b')
+
+# "MM/YY", "MM-YY" ou "MM.YY"
+NUMERIC_PERIOD_SHORT = re.compile(r'\b(\d{2})[/\-\.](\d{2})\b')
+
+# Références Dolibarr: IN + année(2) + mois(2) + numéro, puis FA/FAC
+INVOICE_REF_PERIOD_PATTERNS = [
+    re.compile(r'IN(\d{2})(\d{2})[-\s]?\d+', re.IGNORECASE),
+    re.compile(r'FA[C]?(\d{2})(\d{2})[-\s]?\d+', re.IGNORECASE),
+]
+
+
+# ========== Références de factures ==========
+
+# Références dans un libellé (en majuscules)
+LABEL_REF_IN_DASHED = re.compile(r'(IN\d{4}-\d{3,4})')
+LABEL_REF_IN_COMPACT = re.compile(r'IN(\d{4})(\d{3,4})')
+LABEL_REF_FAC_DASHED = re.compile(r'(FAC\d{4}-\d{3,4})')
+LABEL_REF_FAC_COMPACT = re.compile(r'FAC(\d{4})(\d{3,4})')
+
+# Références complètes (normalisation)
+REF_IN_DASHED = re.compile(r'^IN\d{4}-\d{3,4}$')
+REF_IN_COMPACT = re.compile(r'^IN(\d{4})(\d{3,4})$')
+REF_FAC_DASHED = re.compile(r'^FAC\d{4}-\d{3,4}$')
+REF_FAC_COMPACT = re.compile(r'^FAC(\d{4})(\d{3,4})$')
+
+# Patterns courants pour les références de factures du parser CSV
+# Priorité aux formats IN (les plus courants)
+CSV_INVOICE_REF_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in [
+    # IN2601-0520 ou IN2601-0520/... -> IN2601-0520
+    r'(IN\d{4}-\d{3,4})',
+    # IN25120498 (sans tiret) -> on le garde tel quel, sera normalisé après
+    r'(IN\d{7,8})',
+    # FAC2601-0520 ou similaire
+    r'(FAC\d{4}-\d{3,4})',
+    r'FAC[.\s-]?(\d+)',  # FAC123 ou FAC-123
+    r'FAC[.\s-]?([A-Z]{2}\d+)',  # FACA0123
+    r'(\d{4}[.\s-]\d{3,})',  # 2024-001 ou 2511-0465
+    r'FACTURE[.\s-]?(?:N[°o]?)?[.\s-]?(\d+)',  # FACTURE N°123 ou Facture N251117
+    r'N[°o\s]?(\d+)',  # N251117 ou N°123
+]]
+
+
+def first_match(patterns: List[Pattern], text: str) -> Optional[Match]:
+    """Retourne le match du premier pattern (dans l'ordre de la liste) qui matche"""
+    for pattern in patterns:
+        match = pattern.search(text)
+        if match:
+            return match
+    return None
+
+
+def search_month_year(label_lower: str) -> Optional[Tuple[str, str]]:
+    """
+    Cherche "mois année" dans un libellé en minuscules
+    Si plusieurs mois sont présents, celui qui vient en premier dans MONTH_NAMES gagne
+    (même résultat qu'un test de chaque mois dans l'ordre du mapping)
+
+    Returns:
+        (nom du mois, année telle qu'écrite) ou None
+    """
+    best = None
+    best_priority = None
+    for match in MONTH_YEAR_PATTERN.finditer(label_lower):
+        priority = MONTH_PRIORITY[match.group('month')]
+        if best is None or priority < best_priority:
+            best = match
+            best_priority = priority
+    if best is None:
+        return None
+    return (best.group('month'), best.group('year'))
@@ -1,46 +1,109 @@
 """
 Algorithme de matching entre transactions CSV et données Dolibarr
 """
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Tuple, Iterable, Iterator
 from datetime import datetime, timedelta
 from config import AMOUNT_TOLERANCE, DATE_TOLERANCE_DAYS
+from invoice_features import InvoiceFeatureTable
+from invoice_index import InvoiceIndex
+from bank_line_index import BankLineIndex
+from name_normalizer import NameNormalizer
+from matcher_profiler import MatcherProfiler
+import ref_index
+from assignment import max_weight_assignment
+import vector_scoring
+import parallel_matching
+import label_patterns
+import scoring_rules
+from scoring_rules import POINTS
+import fuzzy_names
 import math
-import re
+
+
+class TransactionFeatures:
+    """
+    Caractéristiques d'une transaction qui ne dépendent pas de la facture
+    Calculées une seule fois par transaction puis passées au scoring de chaque facture
+    """
+    
+    __slots__ = ('transaction', 'amount', 'date', 'year', 'month', 'period_code', 'label', 'label_upper',
+                 'label_period', 'label_period_code', 'extracted_ref', 'tx_ref', 'tx_ref_normalized',
+                 'tx_ref_clean', 'extracted_name', 'extracted_name_normalized', 'extracted_name_parts')
+    
+    def __init__(self, transaction: Dict, matcher: 'TransactionMatcher'):
+        self.transaction = transaction
+        self.amount = abs(transaction['amount'])
+        self.date = datetime.fromtimestamp(int(transaction['date']))
+        
+        # Année et mois de la transaction (format court: "25" pour 2025, "01" pour janvier)
+        self.year = str(self.date.year)[2:]
+        self.month = f"{self.date.month:02d}"
+        # Même codage AAMM que les périodes de l'InvoiceFeatureTable
+        self.period_code = int(self.year) * 100 + self.date.month
+        
+        self.label = transaction.get('label', '')
+        self.label_upper = self.label.upper()
+        self.label_period = matcher.extract_period_from_label(self.label)
+        self.label_period_code = None
+        if self.label_period:
+            label_month, label_year = self.label_period
+            self.label_period_code = int(label_year) * 100 + int(label_month)
+        
+        # Référence fournie par le parser CSV, sinon extraite du libellé
+        self.extracted_ref = matcher.extract_invoice_ref_from_label(self.label)
+        self.tx_ref = transaction.get('invoice_ref') or self.extracted_ref
+        self.tx_ref_normalized = matcher.normalize_invoice_ref(self.tx_ref) if self.tx_ref else ''
+        self.tx_ref_clean = matcher._normalize_ref(self.tx_ref) if self.tx_ref else ''
+        
+        self.extracted_name = matcher.extract_thirdparty_from_label(self.label)
+        self.extracted_name_normalized = matcher.normalize_name_for_comparison(self.extracted_name)
+        self.extracted_name_parts = set(self.extracted_name_normalized.split())
 
 
 class TransactionMatcher:
     """Gère le matching entre transactions CSV et factures/lignes bancaires Dolibarr"""
     
-    # Patterns pour extraire le nom du tiers depuis le libellé bancaire
-    # Ordre important : les plus spécifiques en premier
-    LABEL_PATTERNS = [
-        # VIRT RECU M. JULIEN-PIERRE OFF EUR -> JULIEN-PIERRE OFF (ignore M. Mme etc)
-        r'VIRT\s+RECU\s+(?:M\.|MME|MR|MRS|MLLE)?\s*([A-Z][A-Za-z\-]+(?:\s+[A-Z][A-Za-z\-]+){0,2})\s+EUR',
-        # VIRT RECU ORIO ILTUD EUR 950,00 de ORIO ILTUD -> ORIO ILTUD
-        r'VIRT\s+RECU\s+([A-Z][A-Za-z]+(?:\s+[A-Z][A-Za-z]+)?)\s+EUR',
-        # VIRT RECU SARL SPEH IN... -> SARL SPEH ou SPEH
-        r'VIRT\s+RECU\s+((?:SARL|SAS|EURL|SA|SCI|SNC|SASU)?\s*[A-Z][A-Za-z\-]+(?:\s+[A-Z][A-Za-z\-]+)?)\s+IN',
-        # VIRT RECU NOM PRENOM ... -> NOM PRENOM (avant EUR/XPF/IN//)
-        r'VIRT\s+RECU\s+(?:M\.|MME|MR|MRS|MLLE)?\s*([A-Z][A-Za-z\-]+(?:\s+[A-Z][A-Za-z\-]+){0,2})(?:\s+EUR|\s+XPF|\s+IN|\s+/)',
-        # VIRT FAV GESCOAD Facture -> GESCOAD
-        r'VIRT\s+(?:FAV|EUR)\s+([A-Z][A-Z0-9\s\-\.]+?)(?:\s+Facture|\s+FAC|\s+N\d|\s+EUR|\s*$)',
-        # PREL C/C VITI SAS VITI PRELEVEMENT -> VITI SAS ou VITI
-        r'PREL\s+C/C\s+([A-Z][A-Z0-9\s\-\.]+?)(?:\s+PREL|\s+PRELEVEMENT|\s*$)',
-        # FRS TRANSF FAV Gilbert EHUEINA -> Gilbert EHUEINA  
-        r'(?:FRS\s+)?TRANSF\s+FAV\s+([A-Z][A-Za-z0-9\s\-\.]+?)(?:\s+EUR|\s+XPF|\s+\d|\s*$)',
-        # CION TRANSF FAV Gilbert -> Gilbert
-        r'CION\s+(?:S/\s+)?(?:TRANSF\s+)?(?:FAV\s+)?([A-Z][A-Za-z0-9\s\-\.]+?)(?:\s+EUR|\s+XPF|\s+\d|\s*$)',
-        # VIR ETR RECU O/ BENJAMIN -> BENJAMIN
-        r'VIR\s+ETR\s+RECU\s+O/\s*([A-Z][A-Za-z0-9\s\-\.]+?)(?:\s+EUR|\s+XPF|\s+\d|\s*$)',
-        # VIR SEPA RECU DE: NOM PRENOM -> NOM PRENOM
-        r'VIR\s+(?:SEPA\s+)?RECU\s+(?:DE:?\s+)?([A-Z][A-Za-z]+(?:\s+[A-Z][A-Za-z]+){0,2})',
-        # PREL C/C SAS ONATI -> SAS ONATI ou ONATI
-        r'PREL\s+C/C\s+(?:SAS\s+)?([A-Z][A-Z0-9\s\-\.]+?)(?:\s+-|\s+ABONNE|\s+FAC|\s*$)',
-    ]
-    
-    def __init__(self):
+    # Patterns compilés pour extraire le nom du tiers depuis le libellé bancaire
+    # Ordre important : les plus spécifiques en premier (voir label_patterns)
+    LABEL_PATTERNS = label_patterns.THIRDPARTY_PATTERNS
+    
+    # Score minimum d'un best_match
+    BEST_MATCH_MIN_SCORE = 50
+    
+    # Nombre de factures à partir duquel le scoring vectorisé (NumPy) est utilisé
+    VECTORIZED_MIN_INVOICES = 200
+    # Réconciliations nécessaires pour mémoriser un payeur sans nom extrait du libellé :
+    # sa signature n'est que les mots du libellé ("remise cheque", "loyer"), souvent génériques
+    LABEL_WORDS_ALIAS_MIN_HITS = 2
+    
+    def __init__(self, vectorized: bool = True):
+        """
+        Args:
+            vectorized: Utiliser le scoring vectorisé (si NumPy est disponible) pour les gros lots de factures
+        """
         self.amount_tolerance = AMOUNT_TOLERANCE
         self.date_tolerance_days = DATE_TOLERANCE_DAYS
+        self.vectorized = vectorized and vector_scoring.AVAILABLE
+        # Dernier instantané analysé par type de facture: (empreinte, index)
+        self._snapshots: Dict[str, Tuple[Tuple, InvoiceIndex]] = {}
+        # Noms normalisés en cache (annuaire des tiers, noms extraits des libellés)
+        self.name_normalizer = NameNormalizer()
+        # Instrumentation des règles de scoring (None = désactivée)
+        self.profiler: Optional[MatcherProfiler] = None
+    
+    def enable_profiling(self, history: int = 20) -> MatcherProfiler:
+        """Active l'instrumentation des règles de scoring (temps, déclenchements, points par lot)"""
+        if self.profiler is None:
+            self.profiler = MatcherProfiler(history)
+            self.profiler.instrument(self)
+        return self.profiler
+    
+    def disable_profiling(self):
+        """Désactive l'instrumentation (les règles d'origine sont rétablies)"""
+        if self.profiler is not None:
+            self.profiler.end_batch()
+            self.profiler.uninstrument(self)
+            self.profiler = None
     
     def extract_thirdparty_from_label(self, label: str) -> Optional[str]:
         """Extrait le nom potentiel du tiers depuis un libellé bancaire"""
@@ -50,18 +113,16 @@ class TransactionMatcher:
         label_upper = label.upper().strip()
         
         for pattern in self.LABEL_PATTERNS:
-            match = re.search(pattern, label_upper, re.IGNORECASE)
+            match = pattern.search(label_upper)
             if match:
                 name = match.group(1).strip()
                 # Nettoyer le nom (retirer les mots inutiles à la fin)
-                name = re.sub(r'\s+(EUR|XPF|USD|CHF|\d+[,\.]\d+).*$', '', name)
-                name = re.sub(r'\s+de\s+.*$', '', name, flags=re.IGNORECASE)
-                name = re.sub(r'\s+/\s*$', '', name)
-                name = re.sub(r'\s+IN\d+.*$', '', name)  # Retirer les références IN
+                for cleanup in label_patterns.THIRDPARTY_CLEANUP:
+                    name = cleanup.sub('', name)
                 name = name.strip()
                 
                 # Nettoyer les formes juridiques au début si le reste est assez long
-                name_without_legal = re.sub(r'^(SARL|SAS|EURL|SA|SCI|SNC|SASU|ETS|CIE)\s+', '', name)
+                name_without_legal = label_patterns.LEGAL_FORM_PREFIX.sub('', name)
                 if len(name_without_legal) >= 3:
                     # Garder le nom avec la forme juridique mais aussi proposer sans
                     name = name_without_legal
@@ -114,20 +175,7 @@ class TransactionMatcher:
         return unique_variants
     
     # Mapping des mois français vers numéros
-    MONTH_NAMES = {
-        'janvier': '01', 'jan': '01', 'janv': '01',
-        'fevrier': '02', 'février': '02', 'fev': '02', 'févr': '02',
-        'mars': '03', 'mar': '03',
-        'avril': '04', 'avr': '04',
-        'mai': '05',
-        'juin': '06', 'jun': '06',
-        'juillet': '07', 'juil': '07', 'jul': '07',
-        'aout': '08', 'août': '08', 'aou': '08',
-        'septembre': '09', 'sept': '09', 'sep': '09',
-        'octobre': '10', 'oct': '10',
-        'novembre': '11', 'nov': '11',
-        'decembre': '12', 'décembre': '12', 'dec': '12', 'déc': '12'
-    }
+    MONTH_NAMES = label_patterns.MONTH_NAMES
     
     def extract_period_from_label(self, label: str) -> Optional[Tuple[str, str]]:
         """
@@ -142,18 +190,16 @@ class TransactionMatcher:
         
         label_lower = label.lower()
         
-        # Pattern 1: "mois année" (janvier 25, mars 2025, etc.)
-        for month_name, month_num in self.MONTH_NAMES.items():
-            pattern = rf'\b{month_name}\s*[\'"]?\s*(\d{{2}}(?:\d{{2}})?)\b'
-            match = re.search(pattern, label_lower)
-            if match:
-                year = match.group(1)
-                if len(year) == 4:
-                    year = year[2:]  # 2025 -> 25
-                return (month_num, year)
+        # Pattern 1: "mois année" (janvier 25, mars 2025, etc.) - une seule passe pour tous les mois
+        month_year = label_patterns.search_month_year(label_lower)
+        if month_year:
+            month_name, year = month_year
+            if len(year) == 4:
+                year = year[2:]  # 2025 -> 25
+            return (self.MONTH_NAMES[month_name], year)
         
         # Pattern 2: "MM/YYYY" ou "MM-YYYY" ou "MM.YYYY"
-        match = re.search(r'\b(\d{2})[/\-\.](\d{4})\b', label)
+        match = label_patterns.NUMERIC_PERIOD_LONG.search(label)
         if match:
             month = match.group(1)
             year = match.group(2)[2:]  # 2025 -> 25
@@ -161,7 +207,7 @@ class TransactionMatcher:
                 return (month, year)
         
         # Pattern 3: "MM/YY" ou "MM-YY"
-        match = re.search(r'\b(\d{2})[/\-\.](\d{2})\b', label)
+        match = label_patterns.NUMERIC_PERIOD_SHORT.search(label)
         if match:
             month = match.group(1)
             year = match.group(2)
@@ -181,22 +227,15 @@ class TransactionMatcher:
         if not ref:
             return None
         
-        # Pattern IN + année(2) + mois(2) + numéro
-        # Ex: IN2501-0235 = année 25, mois 01
-        match = re.search(r'IN(\d{2})(\d{2})[-\s]?\d+', ref, re.IGNORECASE)
-        if match:
-            year = match.group(1)  # 25
-            month = match.group(2)  # 01
-            if 1 <= int(month) <= 12:
-                return (month, year)
-        
-        # Pattern FA ou FAC + année + mois
-        match = re.search(r'FA[C]?(\d{2})(\d{2})[-\s]?\d+', ref, re.IGNORECASE)
-        if match:
-            year = match.group(1)
-            month = match.group(2)
-            if 1 <= int(month) <= 12:
-                return (month, year)
+        # Pattern IN + année(2) + mois(2) + numéro (ex: IN2501-0235 = année 25, mois 01)
+        # puis pattern FA ou FAC + année + mois
+        for pattern in label_patterns.INVOICE_REF_PERIOD_PATTERNS:
+            match = pattern.search(ref)
+            if match:
+                year = match.group(1)  # 25
+                month = match.group(2)  # 01
+                if 1 <= int(month) <= 12:
+                    return (month, year)
         
         return None
     
@@ -226,26 +265,33 @@ class TransactionMatcher:
     
     def normalize_name_for_comparison(self, name: str) -> str:
         """Normalise un nom pour la comparaison (minuscule, sans accents, sans espaces multiples)"""
-        if not name:
+        return self.name_normalizer.normalize(name)
+    
+    def label_signature(self, label: str) -> str:
+        """
+        Signature d'un libellé bancaire, stable d'un paiement à l'autre du même payeur
+        (mémoire des tiers) : nom du tiers extrait et normalisé, sinon les mots du libellé
+        sans chiffres (dates, références, montants) ni noms de mois
+        Ex: "VIRT RECU EHUEINA SARL EUR" -> "ehueina sarl", "Amarrage Edo janvier 25" -> "amarrage edo"
+        Une signature de mots du libellé ne désigne un payeur qu'après
+        LABEL_WORDS_ALIAS_MIN_HITS réconciliations (voir alias_min_hits)
+        """
+        if not label:
             return ''
-        # Minuscule
-        name = name.lower().strip()
-        # Remplacer les caractères accentués courants
-        replacements = {
-            'é': 'e', 'è': 'e', 'ê': 'e', 'ë': 'e',
-            'à': 'a', 'â': 'a', 'ä': 'a',
-            'î': 'i', 'ï': 'i',
-            'ô': 'o', 'ö': 'o',
-            'ù': 'u', 'û': 'u', 'ü': 'u',
-            'ç': 'c', 'ñ': 'n'
-        }
-        for old, new in replacements.items():
-            name = name.replace(old, new)
-        # Retirer les caractères spéciaux
-        name = re.sub(r'[^a-z0-9\s]', '', name)
-        # Normaliser les espaces
-        name = ' '.join(name.split())
-        return name
+        
+        name = self.extract_thirdparty_from_label(label)
+        if name:
+            return self.normalize_name_for_comparison(name)
+        
+        words = [word for word in self.normalize_name_for_comparison(label).split()
+                 if word not in self.MONTH_NAMES and not any(char.isdigit() for char in word)]
+        return ' '.join(words)
+    
+    def alias_min_hits(self, label: str) -> int:
+        """Réconciliations nécessaires pour que la signature du libellé désigne un payeur"""
+        if self.extract_thirdparty_from_label(label):
+            return 1
+        return self.LABEL_WORDS_ALIAS_MIN_HITS
     
     def names_match(self, name1: str, name2: str) -> bool:
         """
@@ -281,21 +327,26 @@ class TransactionMatcher:
     def calculate_name_similarity(self, name1: str, name2: str) -> float:
         """
         Calcule un score de similarité entre deux noms (0-100)
-        Gère l'inversion des prénoms/noms
+        Gère l'inversion des prénoms/noms et les fautes de frappe (50 à 65, voir fuzzy_names)
         """
         if not name1 or not name2:
             return 0.0
         
         n1 = self.normalize_name_for_comparison(name1)
         n2 = self.normalize_name_for_comparison(name2)
+        parts1 = set(n1.split())
         
+        return self._name_similarity_normalized(n1, n2, parts1, set(n2.split()), parts1)
+    
+    def _name_similarity_normalized(self, n1: str, n2: str, parts1: set, parts2: set, words1) -> float:
+        """
+        Variante de calculate_name_similarity sur des noms déjà normalisés
+        parts1/parts2 sont les ensembles de mots (ou de leurs identifiants), words1 les mots de n1
+        """
         # Correspondance exacte
         if n1 == n2:
             return 100.0
         
-        parts1 = set(n1.split())
-        parts2 = set(n2.split())
-        
         # Correspondance exacte des parties (ordre différent)
         if parts1 == parts2:
             return 95.0
@@ -311,23 +362,27 @@ class TransactionMatcher:
                 return max(70.0, jaccard * 100)
             
             if jaccard > 0:
-                return jaccard * 80
+                # Mots communs et autres mots mal orthographiés (comparés mot à mot)
+                return max(jaccard * 80, fuzzy_names.word_similarity(n1, n2))
         
         # Vérifier si un nom commence par l'autre ou l'inverse
         if n1.startswith(n2) or n2.startswith(n1):
             return 60.0
         
         # Vérifier si un mot clé est présent
-        for part in parts1:
+        for part in words1:
             if len(part) >= 4 and part in n2:
                 return 50.0
         
-        return 0.0
+        # Nom mal orthographié ou collé (distance d'édition bornée des formes compactes)
+        return fuzzy_names.fuzzy_similarity(fuzzy_names.fuzzy_key(n1), fuzzy_names.fuzzy_key(n2))
     
     def match_transactions(self, csv_transactions: List[Dict], 
                          customer_invoices: List[Dict],
                          supplier_invoices: List[Dict], 
-                         bank_lines: List[Dict]) -> List[Dict]:
+                         bank_lines: List[Dict],
+                         one_to_one: bool = False,
+                         workers: int = 1) -> List[Dict]:
         """
         Match les transactions CSV avec les factures et lignes bancaires
         
@@ -336,49 +391,150 @@ class TransactionMatcher:
             customer_invoices: Liste des factures clients depuis Dolibarr
             supplier_invoices: Liste des factures fournisseurs depuis Dolibarr
             bank_lines: Liste des lignes bancaires depuis Dolibarr
+            one_to_one: Affecter les best_match du lot en un-pour-un (une facture ou
+                        ligne bancaire ne peut être le meilleur match que d'une transaction)
+            workers: Nombre de processus pour les gros relevés (1 = matching dans le processus courant)
         
         Returns:
             Liste des transactions avec leurs matches potentiels
         """
-        matched_transactions = []
+        # Les mesures de l'instrumentation ne remontent pas des processus : matching en série
+        if workers > 1 and len(csv_transactions) >= parallel_matching.PARALLEL_MIN_TRANSACTIONS \
+                and parallel_matching.available() and self.profiler is None:
+            # Gros relevé : transactions réparties entre plusieurs processus
+            customer_index = self._invoice_index(customer_invoices, 'customer')
+            supplier_index = self._invoice_index(supplier_invoices, 'supplier')
+            bank_line_index = self._bank_line_index(bank_lines)
+            results = parallel_matching.match_in_parallel(
+                self, csv_transactions, customer_invoices, supplier_invoices, bank_lines,
+                customer_index, supplier_index, bank_line_index, workers)
+            matched_transactions = [self._transaction_result(transaction, invoice_matches, bank_line_matches)
+                                    for transaction, (invoice_matches, bank_line_matches)
+                                    in zip(csv_transactions, results)]
+        else:
+            matched_transactions = list(self.match_transactions_iter(
+                csv_transactions, customer_invoices, supplier_invoices, bank_lines))
+        
+        if one_to_one:
+            self._assign_one_to_one(matched_transactions)
+        
+        return matched_transactions
+    
+    def match_transactions_iter(self, csv_transactions: Iterable[Dict],
+                                customer_invoices: List[Dict],
+                                supplier_invoices: List[Dict],
+                                bank_lines: List[Dict]) -> Iterator[Dict]:
+        """
+        Version générateur de match_transactions : chaque transaction est produite dès
+        qu'elle est matchée (mêmes résultats, dans le même ordre), sans garder le lot en mémoire
+        
+        L'affectation un-pour-un, qui a besoin de tout le relevé, n'est pas disponible ici.
+        """
+        # Index construits une seule fois pour tout le lot (réutilisés si les factures n'ont pas changé)
+        customer_index = self._invoice_index(customer_invoices, 'customer')
+        supplier_index = self._invoice_index(supplier_invoices, 'supplier')
+        bank_line_index = self._bank_line_index(bank_lines)
+        
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.start_batch(len(csv_transactions) if isinstance(csv_transactions, list) else None,
+                                 'vectorized' if self.vectorized else 'python')
         
         for transaction in csv_transactions:
-            matches = {
-                'transaction': transaction,
-                'invoice_matches': [],
-                'bank_line_matches': [],
-                'best_match': None,
-                'match_score': 0
-            }
-            
-            # Déterminer quel type de facture chercher selon le montant
-            transaction_amount = transaction['amount']
-            
-            if transaction_amount > 0:
-                # Crédit (entrée d'argent) -> Facture client
-                invoice_matches = self._match_with_invoices(transaction, customer_invoices, invoice_type='customer')
-            else:
-                # Débit (sortie d'argent) -> Facture fournisseur
-                invoice_matches = self._match_with_invoices(transaction, supplier_invoices, invoice_type='supplier')
-            
-            matches['invoice_matches'] = invoice_matches
-            
-            # Chercher des matches avec les lignes bancaires existantes
-            bank_line_matches = self._match_with_bank_lines(transaction, bank_lines)
-            matches['bank_line_matches'] = bank_line_matches
-            
-            # Déterminer le meilleur match
-            best_match = self._determine_best_match(invoice_matches, bank_line_matches)
-            matches['best_match'] = best_match
-            
-            if best_match:
-                matches['match_score'] = best_match.get('score', 0)
-            
-            matched_transactions.append(matches)
+            invoice_matches, bank_line_matches = self._match_transaction(
+                transaction, customer_invoices, supplier_invoices, bank_lines,
+                customer_index, supplier_index, bank_line_index)
+            yield self._transaction_result(transaction, invoice_matches, bank_line_matches)
         
-        return matched_transactions
+        if profiler is not None:
+            profiler.end_batch()
     
-    def _match_with_invoices(self, transaction: Dict, invoices: List[Dict], invoice_type: str = 'customer') -> List[Dict]:
+    def _transaction_result(self, transaction: Dict, invoice_matches: List[Dict],
+                            bank_line_matches: List[Dict]) -> Dict:
+        """Résultat du matching d'une transaction, avec son meilleur match"""
+        matches = {
+            'transaction': transaction,
+            'invoice_matches': invoice_matches,
+            'bank_line_matches': bank_line_matches,
+            'best_match': None,
+            'match_score': 0
+        }
+        
+        # Déterminer le meilleur match
+        best_match = self._determine_best_match(invoice_matches, bank_line_matches)
+        matches['best_match'] = best_match
+        
+        if best_match:
+            matches['match_score'] = best_match.get('score', 0)
+        
+        return matches
+    
+    def _match_transaction(self, transaction: Dict, customer_invoices: List[Dict], supplier_invoices: List[Dict],
+                           bank_lines: List[Dict], customer_index: InvoiceIndex,
+                           supplier_index: InvoiceIndex,
+                           bank_line_index: BankLineIndex) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Matches d'une transaction du lot
+        
+        Returns:
+            (matches factures, matches lignes bancaires)
+        """
+        # Déterminer quel type de facture chercher selon le montant
+        transaction_amount = transaction['amount']
+        features = TransactionFeatures(transaction, self)
+        
+        if transaction_amount > 0:
+            # Crédit (entrée d'argent) -> Facture client
+            invoice_matches = self._match_with_invoices(transaction, customer_invoices, invoice_type='customer',
+                                                        index=customer_index, features=features)
+        else:
+            # Débit (sortie d'argent) -> Facture fournisseur
+            invoice_matches = self._match_with_invoices(transaction, supplier_invoices, invoice_type='supplier',
+                                                        index=supplier_index, features=features)
+        
+        # Chercher des matches avec les lignes bancaires existantes
+        bank_line_matches = self._match_with_bank_lines(transaction, bank_lines, index=bank_line_index)
+        
+        return invoice_matches, bank_line_matches
+    
+    def _invoice_index(self, invoices: List[Dict], invoice_type: str) -> InvoiceIndex:
+        """
+        Retourne l'index (et sa table de caractéristiques) d'une liste de factures
+        Si la liste est identique au dernier instantané analysé pour ce type,
+        l'index précédent est réutilisé sans recalculer les caractéristiques
+        """
+        key = InvoiceFeatureTable.snapshot_key(invoices, self)
+        cached = self._snapshots.get(invoice_type)
+        if cached and cached[0] == key:
+            return cached[1]
+        
+        table = InvoiceFeatureTable(invoices, invoice_type, self)
+        index = InvoiceIndex(table, self)
+        self._snapshots[invoice_type] = (key, index)
+        return index
+    
+    def _bank_line_index(self, bank_lines: List[Dict]) -> BankLineIndex:
+        """Retourne l'index des lignes bancaires (réutilisé si les lignes n'ont pas changé)"""
+        key = BankLineIndex.snapshot_key(bank_lines)
+        cached = self._snapshots.get('bank_line')
+        if cached and cached[0] == key:
+            return cached[1]
+        
+        index = BankLineIndex(bank_lines, self)
+        self._snapshots['bank_line'] = (key, index)
+        return index
+    
+    def _use_vector_scorer(self, index: InvoiceIndex) -> bool:
+        """Le scoring vectorisé s'applique-t-il à cet index ? (le construit au premier usage)"""
+        if not (self.vectorized and index.table.size >= self.VECTORIZED_MIN_INVOICES):
+            return False
+        if index.vector_scorer is None:
+            index.vector_scorer = vector_scoring.VectorizedScorer(index, self)
+        return True
+    
+    def _match_with_invoices(self, transaction: Dict, invoices: List[Dict], invoice_type: str = 'customer',
+                             index: Optional[InvoiceIndex] = None,
+                             features: Optional[TransactionFeatures] = None) -> List[Dict]:
         """
         Trouve les factures correspondant à une transaction
         
@@ -386,204 +542,323 @@ class TransactionMatcher:
             transaction: Transaction du CSV
             invoices: Liste des factures
             invoice_type: Type de facture ('customer' ou 'supplier')
+            index: Index des factures (construit si non fourni), limite le scoring aux candidates
+            features: Caractéristiques de la transaction (calculées si non fournies)
         """
         matches = []
-        transaction_amount = abs(transaction['amount'])
-        transaction_date = datetime.fromtimestamp(int(transaction['date']))
-        
-        # Extraire l'année de la transaction (format court: 25 pour 2025)
-        transaction_year = str(transaction_date.year)[2:]  # 2025 -> "25"
-        transaction_month = f"{transaction_date.month:02d}"  # 1 -> "01"
-        
-        for invoice in invoices:
-            # Pour les factures fournisseurs, le champ peut être différent
-            if invoice_type == 'supplier':
-                total_ht = invoice.get('total_ht') or invoice.get('total_ttc') or 0
-                invoice_amount = abs(float(total_ht)) if total_ht else 0
-                remaintopay_raw = invoice.get('remaintopay')
-                remain_to_pay = abs(float(remaintopay_raw)) if remaintopay_raw is not None else invoice_amount
-            else:
-                total_ttc = invoice.get('total_ttc') or 0
-                invoice_amount = abs(float(total_ttc)) if total_ttc else 0
-                remaintopay_raw = invoice.get('remaintopay')
-                remain_to_pay = abs(float(remaintopay_raw)) if remaintopay_raw is not None else invoice_amount
-            
-            # Ignorer les factures sans montant
-            if invoice_amount == 0:
-                continue
-            
-            # Score de matching
-            score = 0
-            reasons = []
-            
-            # Matching par montant
-            amount_match = self._match_amount(transaction_amount, remain_to_pay)
-            if amount_match['matched']:
-                score += amount_match['score']
-                reasons.append(f"Montant correspond ({amount_match['reason']})")
-            
-            # Matching par période - PRIORITÉ: utiliser la date de transaction
-            invoice_ref = invoice.get('ref', '')
-            invoice_period = self.extract_period_from_invoice_ref(invoice_ref)
-            
-            # D'abord vérifier si l'année de la facture correspond à l'année de la transaction
-            if invoice_period:
-                inv_month, inv_year = invoice_period
-                
-                # Si l'année de la facture ne correspond pas à la transaction = GROS malus
-                if inv_year != transaction_year:
-                    score -= 80  # Pénalité très importante pour mauvaise année
-                    reasons.append(f"⚠️ Année incorrecte: transaction={transaction_year}, facture={inv_year}")
-                else:
-                    # Même année = bonus
-                    score += 20
-                    reasons.append(f"Année correspond (20{inv_year})")
-                    
-                    # Bonus supplémentaire si même mois
-                    if inv_month == transaction_month:
-                        score += 15
-                        reasons.append(f"Mois correspond ({inv_month})")
-            
-            # Ensuite vérifier si le libellé mentionne une période spécifique
-            label_period = self.extract_period_from_label(transaction.get('label', ''))
-            if label_period and invoice_period:
-                label_month, label_year = label_period
-                inv_month, inv_year = invoice_period
-                
-                if label_year == inv_year and label_month == inv_month:
-                    score += 25
-                    reasons.append(f"Période libellé correspond ({label_month}/{label_year})")
-                elif label_year != inv_year:
-                    score -= 30  # Malus supplémentaire si le libellé mentionne une autre année
-                    reasons.append(f"⚠️ Libellé mentionne {label_month}/{label_year}")
-            
-            # Matching par référence dans le libellé
-            # Extraire la référence depuis le libellé de la transaction
-            extracted_ref = self.extract_invoice_ref_from_label(transaction.get('label', ''))
-            tx_ref = transaction.get('invoice_ref') or extracted_ref
-            
-            if tx_ref:
-                invoice_ref = invoice.get('ref', '')
-                invoice_ref_supplier = invoice.get('ref_supplier', '')
-                invoice_ref_ext = invoice.get('ref_ext', '')
-                
-                # Normaliser toutes les références
-                tx_ref_normalized = self.normalize_invoice_ref(tx_ref)
-                
-                # Vérifier correspondance avec ref, ref_supplier ou ref_ext
-                refs_to_check = [invoice_ref, invoice_ref_supplier, invoice_ref_ext]
-                
-                for inv_ref in refs_to_check:
-                    if inv_ref and self.refs_match(tx_ref, inv_ref):
-                        score += 80  # Score très élevé pour une correspondance de référence
-                        reasons.append(f"Référence {tx_ref_normalized} correspond à {inv_ref}")
-                        break
-                else:
-                    # Vérifier correspondance partielle
-                    tx_ref_clean = self._normalize_ref(tx_ref)
-                    for inv_ref in refs_to_check:
-                        if inv_ref:
-                            inv_ref_clean = self._normalize_ref(inv_ref)
-                            # Les 4 derniers chiffres correspondent
-                            if len(tx_ref_clean) >= 4 and len(inv_ref_clean) >= 4:
-                                if tx_ref_clean[-4:] == inv_ref_clean[-4:]:
-                                    score += 40
-                                    reasons.append(f"Référence partielle: ...{tx_ref_clean[-4:]}")
-                                    break
-            
-            # Matching par date (si la facture a une date d'échéance)
-            if invoice.get('date_lim_reglement'):
-                due_date = datetime.fromtimestamp(int(invoice['date_lim_reglement']))
-                date_match = self._match_date(transaction_date, due_date)
-                if date_match['matched']:
-                    score += date_match['score']
-                    reasons.append(f"Date proche ({date_match['reason']})")
-            
-            # Matching par tiers - CRITIQUE: une facture doit correspondre au bon tiers
-            thirdparty_name = None
-            if invoice.get('thirdparty'):
-                thirdparty_name = invoice['thirdparty'].get('name', '')
-            elif invoice.get('thirdparty_name'):
-                thirdparty_name = invoice.get('thirdparty_name', '')
-            elif invoice.get('socname'):
-                thirdparty_name = invoice.get('socname', '')
-            
-            transaction_label = transaction.get('label', '')
-            
-            # Extraire le nom potentiel du libellé
-            extracted_name = self.extract_thirdparty_from_label(transaction_label)
-            
-            # Variable pour tracker si le tiers correspond
-            thirdparty_matches = False
-            
-            if thirdparty_name and extracted_name:
-                # Utiliser le nouveau système de comparaison intelligent
-                name_similarity = self.calculate_name_similarity(extracted_name, thirdparty_name)
-                
-                if name_similarity >= 70:
-                    thirdparty_matches = True
-                    score += 60  # Gros bonus pour tiers qui correspond
-                    reasons.append(f"✓ Tiers correspond: {extracted_name} ≈ {thirdparty_name}")
-                elif name_similarity >= 50:
-                    thirdparty_matches = True
-                    score += 40
-                    reasons.append(f"Tiers similaire: {extracted_name} ~ {thirdparty_name}")
-                elif name_similarity < 30:
-                    # Le tiers de la facture ne correspond PAS au tiers du libellé
-                    # C'est probablement une mauvaise facture -> GROS malus
-                    score -= 100
-                    reasons.append(f"⛔ Tiers différent: {extracted_name} ≠ {thirdparty_name}")
-            
-            # Fallback: vérifier si le nom du tiers est directement dans le libellé
-            if thirdparty_name and transaction_label and not thirdparty_matches:
-                thirdparty_upper = thirdparty_name.upper()
-                label_upper = transaction_label.upper()
-                
-                # Vérifier correspondance directe
-                if thirdparty_upper in label_upper:
-                    thirdparty_matches = True
-                    score += 50
-                    reasons.append("✓ Nom du tiers dans le libellé")
-                else:
-                    # Essayer chaque partie du nom
-                    name_parts = [p for p in thirdparty_upper.split() if len(p) > 2]
-                    if name_parts:
-                        matched_parts = sum(1 for part in name_parts if part in label_upper)
-                        match_ratio = matched_parts / len(name_parts)
-                        
-                        if match_ratio >= 0.5:
-                            thirdparty_matches = True
-                            score += 30
-                            reasons.append(f"Parties du nom trouvées ({matched_parts}/{len(name_parts)})")
-                        elif extracted_name and match_ratio == 0:
-                            # Aucune partie du nom trouvée et on a extrait un autre nom
-                            # C'est probablement une mauvaise facture
-                            score -= 80
-                            reasons.append(f"⛔ Tiers non trouvé dans libellé")
-            
-            # Seuil minimum de 30 pour éviter les matchs peu fiables
-            if score >= 30:
-                matches.append({
-                    'invoice': invoice,
-                    'invoice_type': invoice_type,
-                    'score': max(0, score),  # Pas de score négatif affiché
-                    'reasons': reasons,
-                    'amount_diff': abs(transaction_amount - remain_to_pay),
-                    'matched': True
-                })
+        if features is None:
+            features = TransactionFeatures(transaction, self)
+        if index is None:
+            index = self._invoice_index(invoices, invoice_type)
+        
+        table = index.table
+        # Mots du nom extrait dans le vocabulaire de la table (une fois pour toutes les factures)
+        name_token_ids = table.encode_tokens(features.extracted_name_parts)
+        
+        if self._use_vector_scorer(index):
+            return index.vector_scorer.top_matches(features, invoices, name_token_ids)
+        
+        # Règles applicables à cette transaction, compilées une fois pour toutes ses factures
+        steps = scoring_rules.compile_rules(self, features, name_token_ids)
+        for position in index.candidates(features):
+            match = self._score_invoice(features, invoices[position], table, position, name_token_ids, steps)
+            if match:
+                matches.append(match)
         
         # Trier par score décroissant
         matches.sort(key=lambda x: x['score'], reverse=True)
         return matches[:5]  # Retourner les 5 meilleurs matches
     
-    def _match_with_bank_lines(self, transaction: Dict, bank_lines: List[Dict]) -> List[Dict]:
-        """Trouve les lignes bancaires correspondant à une transaction"""
+    def score_invoices(self, transaction: Dict, invoices: List[Dict], invoice_type: str = 'customer',
+                       min_score: Optional[int] = scoring_rules.MIN_SCORE) -> List[Dict]:
+        """
+        Score toutes les factures d'une liste courte (ex: factures d'un tiers), avec les
+        mêmes règles que le matching en lot, sans index ni cache d'instantané
+        
+        Args:
+            transaction: Transaction (montant, date, libellé)
+            invoices: Factures à scorer
+            invoice_type: Type de facture ('customer' ou 'supplier')
+            min_score: Score minimum d'un match (None = toutes les factures avec un montant)
+        
+        Returns:
+            Matches triés par score décroissant
+        """
+        features = TransactionFeatures(transaction, self)
+        table = InvoiceFeatureTable(invoices, invoice_type, self)
+        name_token_ids = table.encode_tokens(features.extracted_name_parts)
+        steps = scoring_rules.compile_rules(self, features, name_token_ids)
+        
+        matches = []
+        for position, invoice in enumerate(invoices):
+            match = self._score_invoice(features, invoice, table, position, name_token_ids, steps, min_score)
+            if match:
+                matches.append(match)
+        
+        matches.sort(key=lambda x: x['score'], reverse=True)
+        return matches
+    
+    def _invoice_amounts(self, invoice: Dict, invoice_type: str) -> Tuple[float, float]:
+        """
+        Retourne (montant de la facture, reste à payer)
+        Pour les factures fournisseurs, le champ peut être différent
+        Une facture déjà payée (recherche par tiers) est comparée à son montant total
+        """
+        if invoice_type == 'supplier':
+            total_ht = invoice.get('total_ht') or invoice.get('total_ttc') or 0
+            invoice_amount = abs(float(total_ht)) if total_ht else 0
+        else:
+            total_ttc = invoice.get('total_ttc') or 0
+            invoice_amount = abs(float(total_ttc)) if total_ttc else 0
+        remaintopay_raw = invoice.get('remaintopay')
+        remain_to_pay = abs(float(remaintopay_raw)) if remaintopay_raw is not None else invoice_amount
+        if '_already_paid' in invoice and (invoice['_already_paid'] or remain_to_pay == 0):
+            remain_to_pay = invoice_amount
+        return invoice_amount, remain_to_pay
+    
+    def _invoice_thirdparty_name(self, invoice: Dict) -> Optional[str]:
+        """Retourne le nom du tiers d'une facture (client ou fournisseur)"""
+        if invoice.get('thirdparty'):
+            return invoice['thirdparty'].get('name', '')
+        elif invoice.get('thirdparty_name'):
+            return invoice.get('thirdparty_name', '')
+        elif invoice.get('socname'):
+            return invoice.get('socname', '')
+        return None
+    
+    def _score_invoice(self, features: TransactionFeatures, invoice: Dict, table: InvoiceFeatureTable,
+                       position: int, name_token_ids: frozenset,
+                       steps: Optional[List[scoring_rules.CompiledRule]] = None,
+                       min_score: Optional[int] = scoring_rules.MIN_SCORE) -> Optional[Dict]:
+        """
+        Calcule le score d'une facture pour une transaction
+        
+        Args:
+            features: Caractéristiques de la transaction
+            invoice: Facture (pour le résultat)
+            table: Table des caractéristiques des factures
+            position: Position de la facture dans la table
+            name_token_ids: Mots du nom extrait, encodés avec le vocabulaire de la table
+            steps: Règles compilées pour la transaction (compilées ici si non fournies)
+            min_score: Score minimum (None = pas de seuil)
+        
+        Returns:
+            Le match si le score atteint le seuil minimum, sinon None
+        """
+        transaction_amount = features.amount
+        invoice_amount = table.invoice_amounts[position]
+        remain_to_pay = table.remain_to_pay[position]
+        
+        # Ignorer les factures sans montant
+        if invoice_amount == 0:
+            return None
+        
+        if steps is None:
+            steps = scoring_rules.compile_rules(self, features, name_token_ids)
+        
+        # Score de matching (abandonné dès que le seuil ne peut plus être atteint)
+        # Matching par tiers - CRITIQUE: une facture doit correspondre au bon tiers (voir scoring_rules)
+        score, reasons = scoring_rules.run_rules(steps, features, table, position, min_score)
+        
+        # Seuil minimum pour éviter les matchs peu fiables
+        if score is None or (min_score is not None and score < min_score):
+            return None
+        
+        return {
+            'invoice': invoice,
+            'invoice_type': table.invoice_type,
+            'score': max(0, score),  # Pas de score négatif affiché
+            'reasons': reasons,
+            'amount_diff': abs(transaction_amount - remain_to_pay),
+            'matched': True
+        }
+    
+    # ========== Règles de scoring des factures ==========
+    # Chaque règle ajoute ses raisons et retourne ses points (instrumentables une par une)
+    # Points et ordre d'évaluation : table SCORING_RULES de scoring_rules
+    
+    def _rule_amount(self, features: TransactionFeatures, table: InvoiceFeatureTable,
+                     position: int, reasons: List[str]) -> int:
+        """Montant de la transaction comparé au reste à payer"""
+        amount_match = self._match_amount(features.amount, table.remain_to_pay[position])
+        if amount_match['matched']:
+            reasons.append(f"Montant correspond ({amount_match['reason']})")
+            return amount_match['score']
+        return 0
+    
+    def _rule_period(self, features: TransactionFeatures, table: InvoiceFeatureTable,
+                     position: int, reasons: List[str]) -> int:
+        """Année/mois de la référence de la facture comparés à la date de la transaction"""
+        period_code = table.period_codes[position]
+        if period_code == table.NO_PERIOD:
+            return 0
+        
+        inv_year, inv_month = divmod(period_code, 100)
+        
+        # Si l'année de la facture ne correspond pas à la transaction = GROS malus
+        if inv_year != features.period_code // 100:
+            reasons.append(f"⚠️ Année incorrecte: transaction={features.year}, facture={inv_year:02d}")
+            return POINTS['period']['wrong_year']  # Pénalité très importante pour mauvaise année
+        
+        # Même année = bonus
+        reasons.append(f"Année correspond (20{inv_year:02d})")
+        
+        # Bonus supplémentaire si même mois
+        if period_code == features.period_code:
+            reasons.append(f"Mois correspond ({inv_month:02d})")
+            return POINTS['period']['month']
+        return POINTS['period']['year']
+    
+    def _rule_label_period(self, features: TransactionFeatures, table: InvoiceFeatureTable,
+                           position: int, reasons: List[str]) -> int:
+        """Période mentionnée dans le libellé comparée à celle de la facture"""
+        period_code = table.period_codes[position]
+        if not features.label_period or period_code == table.NO_PERIOD:
+            return 0
+        
+        label_month, label_year = features.label_period
+        if features.label_period_code == period_code:
+            reasons.append(f"Période libellé correspond ({label_month}/{label_year})")
+            return POINTS['label_period']['match']
+        if features.label_period_code // 100 != period_code // 100:
+            # Malus supplémentaire si le libellé mentionne une autre année
+            reasons.append(f"⚠️ Libellé mentionne {label_month}/{label_year}")
+            return POINTS['label_period']['wrong_year']
+        return 0
+    
+    def _rule_reference(self, features: TransactionFeatures, table: InvoiceFeatureTable,
+                        position: int, reasons: List[str]) -> int:
+        """Référence du libellé identique à ref, ref_supplier ou ref_ext"""
+        for inv_ref, inv_ref_normalized, inv_ref_clean in table.refs[position]:
+            if self._refs_equivalent(features.tx_ref_normalized, features.tx_ref_clean,
+                                     inv_ref_normalized, inv_ref_clean):
+                reasons.append(f"Référence {features.tx_ref_normalized} correspond à {inv_ref}")
+                return POINTS['reference']['match']  # Score très élevé pour une correspondance de référence
+        return 0
+    
+    def _rule_partial_reference(self, features: TransactionFeatures, table: InvoiceFeatureTable,
+                                position: int, reasons: List[str]) -> int:
+        """Les 4 derniers caractères de la référence correspondent"""
+        tx_ref_clean = features.tx_ref_clean
+        if len(tx_ref_clean) < 4:
+            return 0
+        for _, _, inv_ref_clean in table.refs[position]:
+            if len(inv_ref_clean) >= 4 and tx_ref_clean[-4:] == inv_ref_clean[-4:]:
+                reasons.append(f"Référence partielle: ...{tx_ref_clean[-4:]}")
+                return POINTS['partial_reference']['match']
+        return 0
+    
+    def _rule_due_date(self, features: TransactionFeatures, table: InvoiceFeatureTable,
+                       position: int, reasons: List[str]) -> int:
+        """Date de la transaction proche de l'échéance de la facture"""
+        due_date = table.due_dates[position]
+        if due_date is None:
+            return 0
+        date_match = self._match_date(features.date, due_date)
+        if date_match['matched']:
+            reasons.append(f"Date proche ({date_match['reason']})")
+            return date_match['score']
+        return 0
+    
+    def _score_thirdparty(self, features: TransactionFeatures, table: InvoiceFeatureTable,
+                          position: int, name_token_ids: frozenset) -> Tuple[int, List[str]]:
+        """
+        Partie du score liée au tiers de la facture (nom extrait et nom dans le libellé)
+        Ne dépend que du nom du tiers : toutes les factures d'un même tiers ont le même résultat
+        
+        Returns:
+            (points, raisons)
+        """
+        reasons = []
+        score, thirdparty_matches = self._rule_thirdparty(features, table, position, name_token_ids, reasons)
+        
+        # Fallback: vérifier si le nom du tiers est directement dans le libellé
+        if not thirdparty_matches and features.label:
+            score += self._rule_name_parts(features, table, position, reasons)
+        
+        return score, reasons
+    
+    def _rule_thirdparty(self, features: TransactionFeatures, table: InvoiceFeatureTable, position: int,
+                         name_token_ids: frozenset, reasons: List[str]) -> Tuple[int, bool]:
+        """
+        Nom extrait du libellé comparé au tiers de la facture
+        
+        Returns:
+            (points, le tiers correspond)
+        """
+        thirdparty_name = table.thirdparty_names[position]
+        extracted_name = features.extracted_name
+        if not (thirdparty_name and extracted_name):
+            return 0, False
+        
+        # Utiliser le nouveau système de comparaison intelligent (noms déjà normalisés)
+        name_similarity = self._name_similarity_normalized(
+            features.extracted_name_normalized, table.names_normalized[position],
+            name_token_ids, table.name_token_ids[position], features.extracted_name_parts)
+        
+        if name_similarity >= 70:
+            reasons.append(f"✓ Tiers correspond: {extracted_name} ≈ {thirdparty_name}")
+            return POINTS['thirdparty']['match'], True  # Gros bonus pour tiers qui correspond
+        if name_similarity >= 50:
+            reasons.append(f"Tiers similaire: {extracted_name} ~ {thirdparty_name}")
+            return POINTS['thirdparty']['similar'], True
+        if name_similarity < 30:
+            # Le tiers de la facture ne correspond PAS au tiers du libellé
+            # C'est probablement une mauvaise facture -> GROS malus
+            reasons.append(f"⛔ Tiers différent: {extracted_name} ≠ {thirdparty_name}")
+            return POINTS['thirdparty']['mismatch'], False
+        return 0, False
+    
+    def _rule_name_parts(self, features: TransactionFeatures, table: InvoiceFeatureTable,
+                         position: int, reasons: List[str]) -> int:
+        """Fallback : nom du tiers (ou une partie) présent dans le libellé"""
+        if not table.thirdparty_names[position]:
+            return 0
+        label_upper = features.label_upper
+        
+        # Vérifier correspondance directe
+        if table.names_upper[position] in label_upper:
+            reasons.append("✓ Nom du tiers dans le libellé")
+            return POINTS['name_parts']['in_label']
+        
+        # Essayer chaque partie du nom
+        name_parts = table.name_parts_upper[position]
+        if not name_parts:
+            return 0
+        matched_parts = sum(1 for part in name_parts if part in label_upper)
+        match_ratio = matched_parts / len(name_parts)
+        
+        if match_ratio >= 0.5:
+            reasons.append(f"Parties du nom trouvées ({matched_parts}/{len(name_parts)})")
+            return POINTS['name_parts']['parts']
+        if features.extracted_name and match_ratio == 0:
+            # Aucune partie du nom trouvée et on a extrait un autre nom
+            # C'est probablement une mauvaise facture
+            reasons.append(f"⛔ Tiers non trouvé dans libellé")
+            return POINTS['name_parts']['not_found']
+        return 0
+    
+    def _match_with_bank_lines(self, transaction: Dict, bank_lines: List[Dict],
+                               index: Optional[BankLineIndex] = None) -> List[Dict]:
+        """
+        Trouve les lignes bancaires correspondant à une transaction
+        
+        Args:
+            transaction: Transaction du CSV
+            bank_lines: Lignes bancaires du compte
+            index: Index des lignes bancaires (construit si non fourni), limite le scoring
+                   aux lignes proches en date ou de même montant
+        """
         matches = []
         transaction_amount = abs(transaction['amount'])
         transaction_date = datetime.fromtimestamp(int(transaction['date']))
+        transaction_label = transaction.get('label', '').upper()
+        if index is None:
+            index = self._bank_line_index(bank_lines)
         
-        for bank_line in bank_lines:
-            bank_amount = abs(float(bank_line.get('amount', 0)))
+        for position in index.candidates(transaction_amount, transaction_date):
+            bank_line = index.bank_lines[position]
+            bank_amount = index.amounts[position]
             
             score = 0
             reasons = []
@@ -594,8 +869,7 @@ class TransactionMatcher:
                 reasons.append("Montant exact")
             
             # Matching par libellé similaire
-            bank_label = bank_line.get('label', '').upper()
-            transaction_label = transaction.get('label', '').upper()
+            bank_label = index.labels_upper[position]
             if bank_label and transaction_label:
                 similarity = self._calculate_similarity(bank_label, transaction_label)
                 if similarity > 0.7:
@@ -603,8 +877,8 @@ class TransactionMatcher:
                     reasons.append(f"Libellé similaire ({similarity:.0%})")
             
             # Matching par date
-            if bank_line.get('date'):
-                bank_date = datetime.fromtimestamp(int(bank_line['date']))
+            bank_date = index.dates[position]
+            if bank_date is not None:
                 date_match = self._match_date(transaction_date, bank_date)
                 if date_match['matched']:
                     score += date_match['score']
@@ -626,44 +900,43 @@ class TransactionMatcher:
         """Vérifie si deux montants correspondent"""
         diff = abs(amount1 - amount2)
         
+        points = POINTS['amount']
+        
         # Montant exact
         if diff < self.amount_tolerance:
-            return {'matched': True, 'score': 100, 'reason': 'Montant exact'}
+            return {'matched': True, 'score': points['exact'], 'reason': 'Montant exact'}
         
         # Montant très proche (tolérance 0.1%)
         if diff / max(amount1, amount2) < 0.001:
-            return {'matched': True, 'score': 90, 'reason': 'Montant très proche'}
+            return {'matched': True, 'score': points['very_close'], 'reason': 'Montant très proche'}
         
         # Montant proche (tolérance 1%)
         if diff / max(amount1, amount2) < 0.01:
-            return {'matched': True, 'score': 70, 'reason': 'Montant proche'}
+            return {'matched': True, 'score': points['close'], 'reason': 'Montant proche'}
         
         # Montant relativement proche (tolérance 5%)
         if diff / max(amount1, amount2) < 0.05:
-            return {'matched': True, 'score': 40, 'reason': 'Montant relativement proche'}
+            return {'matched': True, 'score': points['near'], 'reason': 'Montant relativement proche'}
         
         return {'matched': False, 'score': 0, 'reason': ''}
     
     def _match_date(self, date1: datetime, date2: datetime) -> Dict:
         """Vérifie si deux dates correspondent"""
         diff_days = abs((date1 - date2).days)
+        points = POINTS['due_date']
         
         if diff_days == 0:
-            return {'matched': True, 'score': 30, 'reason': 'Même jour'}
+            return {'matched': True, 'score': points['same_day'], 'reason': 'Même jour'}
         elif diff_days <= 1:
-            return {'matched': True, 'score': 25, 'reason': f'{diff_days} jour(s) d\'écart'}
+            return {'matched': True, 'score': points['one_day'], 'reason': f'{diff_days} jour(s) d\'écart'}
         elif diff_days <= self.date_tolerance_days:
-            return {'matched': True, 'score': 20 - diff_days, 'reason': f'{diff_days} jours d\'écart'}
+            return {'matched': True, 'score': points['within_tolerance'] - diff_days, 'reason': f'{diff_days} jours d\'écart'}
         
         return {'matched': False, 'score': 0, 'reason': ''}
     
     def _normalize_ref(self, ref: str) -> str:
         """Normalise une référence pour faciliter la comparaison"""
-        if not ref:
-            return ''
-        # Supprimer les espaces, tirets, points
-        normalized = str(ref).upper().replace(' ', '').replace('-', '').replace('.', '').replace('_', '')
-        return normalized
+        return ref_index.clean_ref(ref)
     
     def extract_invoice_ref_from_label(self, label: str) -> Optional[str]:
         """
@@ -676,21 +949,21 @@ class TransactionMatcher:
         label_upper = label.upper()
         
         # Pattern 1: IN2601-0520 (avec tiret)
-        match = re.search(r'(IN\d{4}-\d{3,4})', label_upper)
+        match = label_patterns.LABEL_REF_IN_DASHED.search(label_upper)
         if match:
             return match.group(1)
         
         # Pattern 2: IN25120498 (sans tiret) -> normaliser en IN2512-0498
-        match = re.search(r'IN(\d{4})(\d{3,4})', label_upper)
+        match = label_patterns.LABEL_REF_IN_COMPACT.search(label_upper)
         if match:
             return f"IN{match.group(1)}-{match.group(2)}"
         
         # Pattern 3: FAC similaire
-        match = re.search(r'(FAC\d{4}-\d{3,4})', label_upper)
+        match = label_patterns.LABEL_REF_FAC_DASHED.search(label_upper)
         if match:
             return match.group(1)
         
-        match = re.search(r'FAC(\d{4})(\d{3,4})', label_upper)
+        match = label_patterns.LABEL_REF_FAC_COMPACT.search(label_upper)
         if match:
             return f"FAC{match.group(1)}-{match.group(2)}"
         
@@ -702,29 +975,7 @@ class TransactionMatcher:
         IN25120498 -> IN2512-0498
         IN2512-0498 -> IN2512-0498
         """
-        if not ref:
-            return ''
-        
-        ref = str(ref).upper().strip()
-        
-        # Si déjà au bon format avec tiret
-        if re.match(r'^IN\d{4}-\d{3,4}$', ref):
-            return ref
-        
-        # Si format sans tiret IN25120498
-        match = re.match(r'^IN(\d{4})(\d{3,4})$', ref)
-        if match:
-            return f"IN{match.group(1)}-{match.group(2)}"
-        
-        # Même chose pour FAC
-        if re.match(r'^FAC\d{4}-\d{3,4}$', ref):
-            return ref
-        
-        match = re.match(r'^FAC(\d{4})(\d{3,4})$', ref)
-        if match:
-            return f"FAC{match.group(1)}-{match.group(2)}"
-        
-        return ref
+        return ref_index.normalize_invoice_ref(ref)
     
     def refs_match(self, ref1: str, ref2: str) -> bool:
         """
@@ -734,16 +985,21 @@ class TransactionMatcher:
         if not ref1 or not ref2:
             return False
         
-        norm1 = self.normalize_invoice_ref(ref1)
-        norm2 = self.normalize_invoice_ref(ref2)
-        
+        return self._refs_match_normalized(self.normalize_invoice_ref(ref1), self._normalize_ref(ref1), ref2)
+    
+    def _refs_match_normalized(self, norm1: str, clean1: str, ref2: str) -> bool:
+        """
+        Variante de refs_match où la première référence est déjà normalisée
+        (forme normalize_invoice_ref et forme _normalize_ref)
+        """
+        return self._refs_equivalent(norm1, clean1, self.normalize_invoice_ref(ref2), self._normalize_ref(ref2))
+    
+    def _refs_equivalent(self, norm1: str, clean1: str, norm2: str, clean2: str) -> bool:
+        """Compare deux références dont les deux formes normalisées sont déjà calculées"""
         if norm1 == norm2:
             return True
         
         # Comparaison sans tirets ni espaces
-        clean1 = self._normalize_ref(ref1)
-        clean2 = self._normalize_ref(ref2)
-        
         if clean1 == clean2:
             return True
         
@@ -773,6 +1029,22 @@ class TransactionMatcher:
     def _determine_best_match(self, invoice_matches: List[Dict], 
                              bank_line_matches: List[Dict]) -> Optional[Dict]:
         """Détermine le meilleur match global"""
+        all_matches = self._best_match_candidates(invoice_matches, bank_line_matches)
+        
+        if not all_matches:
+            return None
+        
+        # Retourner le match avec le score le plus élevé
+        best = max(all_matches, key=lambda x: x['score'])
+        
+        # Ne considérer comme bon match que si le score est > 50
+        if best['score'] < self.BEST_MATCH_MIN_SCORE:
+            return None
+        
+        return best
+    
+    def _best_match_candidates(self, invoice_matches: List[Dict], bank_line_matches: List[Dict]) -> List[Dict]:
+        """Matches (factures puis lignes bancaires) au format de best_match"""
         all_matches = []
         
         for match in invoice_matches:
@@ -794,15 +1066,42 @@ class TransactionMatcher:
                 'amount_diff': match['amount_diff']
             })
         
-        if not all_matches:
-            return None
-        
-        # Retourner le match avec le score le plus élevé
-        best = max(all_matches, key=lambda x: x['score'])
-        
-        # Ne considérer comme bon match que si le score est > 50
-        if best['score'] < 50:
-            return None
-        
-        return best
+        return all_matches
+    
+    def _assign_one_to_one(self, matched_transactions: List[Dict]):
+        """
+        Affecte les meilleurs matches du lot en un-pour-un : une facture ou une ligne
+        bancaire n'est retenue comme best_match que pour une seule transaction
+        (celle qui maximise la somme des scores du relevé)
+        """
+        candidate_entries = []
+        candidates = []
+        for matches in matched_transactions:
+            entries = {}
+            for entry in self._best_match_candidates(matches['invoice_matches'], matches['bank_line_matches']):
+                if entry['score'] < self.BEST_MATCH_MIN_SCORE:
+                    continue
+                key = self._match_key(entry)
+                if key not in entries or entry['score'] > entries[key]['score']:
+                    entries[key] = entry
+            candidate_entries.append(entries)
+            candidates.append([(key, entry['score']) for key, entry in entries.items()])
+        
+        assignment = max_weight_assignment(candidates)
+        
+        for matches, entries, key in zip(matched_transactions, candidate_entries, assignment):
+            previous = matches['best_match']
+            best_match = entries[key] if key is not None else None
+            # Le meilleur match individuel a été laissé à une autre transaction
+            matches['assignment_changed'] = (self._match_key(previous) if previous else None) != key
+            matches['best_match'] = best_match
+            matches['match_score'] = best_match['score'] if best_match else 0
+    
+    def _match_key(self, entry: Dict) -> Tuple:
+        """Identifie la facture ou la ligne bancaire d'un match (pour l'affectation un-pour-un)"""
+        data = entry['data']
+        data_id = data.get('id') if data.get('id') is not None else id(data)
+        if entry['type'] == 'invoice':
+            return ('invoice', entry.get('invoice_type', 'customer'), data_id)
+        return ('bank_line', data_id)
 
@@ -0,0 +1,113 @@
+"""
+Instrumentation des règles de scoring du matcher (optionnelle)
+Quand elle est activée, chaque règle de TransactionMatcher est remplacée sur l'instance
+par une version chronométrée : temps passé, nombre d'appels, taux de déclenchement
+et points apportés, par lot de transactions. Désactivée, les règles d'origine sont
+appelées directement (aucun coût).
+"""
+from typing import Dict, Optional
+from collections import deque
+from datetime import datetime
+import json
+import time
+import scoring_rules
+
+
+class MatcherProfiler:
+    """Statistiques par règle, pour le lot en cours et les derniers lots"""
+
+    # Règles instrumentées (méthodes _rule_<nom> de TransactionMatcher)
+    RULES = scoring_rules.RULE_NAMES
+
+    def __init__(self, history: int = 20):
+        """
+        Args:
+            history: Nombre de lots terminés conservés
+        """
+        self.batches = deque(maxlen=history)
+        self.current: Optional[Dict] = None
+
+    def instrument(self, matcher):
+        """Remplace les règles du matcher par leurs versions chronométrées"""
+        for rule in self.RULES:
+            method = getattr(type(matcher), f'_rule_{rule}').__get__(matcher)
+            setattr(matcher, f'_rule_{rule}', self._timed(rule, method))
+
+    def uninstrument(self, matcher):
+        """Rétablit les règles d'origine"""
+        for rule in self.RULES:
+            matcher.__dict__.pop(f'_rule_{rule}', None)
+
+    def _timed(self, rule: str, method):
+        """Version chronométrée d'une règle (les points sont le premier élément d'un tuple éventuel)"""
+        perf_counter = time.perf_counter
+
+        def timed(*args):
+            start = perf_counter()
+            result = method(*args)
+            elapsed = perf_counter() - start
+            points = result[0] if isinstance(result, tuple) else result
+            self.record(rule, elapsed, 1, 1 if points else 0, points)
+            return result
+
+        return timed
+
+    def start_batch(self, transactions: int, mode: str):
+        """Démarre un lot (le lot précédent est clôturé s'il ne l'a pas été)"""
+        self.end_batch()
+        self.current = {
+            'started_at': datetime.now().isoformat(),
+            'mode': mode,
+            'transactions': transactions,
+            '_start': time.perf_counter(),
+            'rules': {}
+        }
+
+    def end_batch(self):
+        """Clôture le lot en cours"""
+        if self.current is None:
+            return
+        batch = self.current
+        batch['wall_time_ms'] = round((time.perf_counter() - batch.pop('_start')) * 1000, 3)
+        batch['rules'] = self._summary(batch['rules'])
+        self.batches.append(batch)
+        self.current = None
+
+    def record(self, rule: str, elapsed: float, calls: int, hits: int, points: float):
+        """Ajoute une mesure à la règle (calls évaluations, dont hits non nulles)"""
+        if self.current is None:
+            return
+        stats = self.current['rules'].get(rule)
+        if stats is None:
+            stats = self.current['rules'][rule] = {'calls': 0, 'hits': 0, 'time': 0.0, 'points': 0}
+        stats['calls'] += calls
+        stats['hits'] += hits
+        stats['time'] += elapsed
+        stats['points'] += points
+
+    @staticmethod
+    def _summary(rules: Dict[str, Dict]) -> Dict[str, Dict]:
+        """Statistiques lisibles : temps total et par appel, taux de déclenchement, points moyens"""
+        summary = {}
+        for rule, stats in rules.items():
+            calls = stats['calls']
+            hits = stats['hits']
+            summary[rule] = {
+                'calls': calls,
+                'hits': hits,
+                'hit_rate': round(hits / calls, 4) if calls else 0.0,
+                'time_ms': round(stats['time'] * 1000, 3),
+                'time_per_call_us': round(stats['time'] * 1e6 / calls, 3) if calls else 0.0,
+                'points': int(stats['points']),
+                'points_per_hit': round(stats['points'] / hits, 2) if hits else 0.0
+            }
+        return summary
+
+    def report(self) -> Dict:
+        """Derniers lots terminés (du plus ancien au plus récent)"""
+        return {'batches': list(self.batches)}
+
+    def dump(self, path: str):
+        """Écrit le rapport au format JSON"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2, ensure_ascii=False)
@@ -0,0 +1,108 @@
+"""
+Normalisation des noms de tiers pour la comparaison
+Une table de traduction (str.translate) replie en une passe les accents, ligatures
+(œ, æ, ß...) et majuscules, et retire la ponctuation. Les résultats sont gardés dans
+un cache LRU borné : l'annuaire ne compte que quelques milliers de noms, normalisés
+sans cesse par le scoring.
+"""
+from typing import Dict, Iterable
+from functools import lru_cache
+import unicodedata
+
+
+# Lettres sans décomposition Unicode (ligatures, lettres barrées)
+SPECIAL_FOLDS = {
+    'œ': 'oe', 'Œ': 'oe', 'æ': 'ae', 'Æ': 'ae', 'ß': 'ss', 'ẞ': 'ss',
+    'ø': 'o', 'Ø': 'o', 'đ': 'd', 'Đ': 'd', 'ð': 'd', 'Ð': 'd',
+    'ł': 'l', 'Ł': 'l', 'þ': 'th', 'Þ': 'th', 'ı': 'i', 'ħ': 'h', 'Ħ': 'h'
+}
+
+# Caractères repliés par la table (au-delà, repli caractère par caractère)
+TABLE_RANGE = 0x3000
+
+
+def fold_char(char: str) -> str:
+    """
+    Forme comparable d'un caractère : lettres et chiffres ASCII en minuscules,
+    espaces en ' ', le reste (ponctuation, symboles) supprimé
+    """
+    if char in SPECIAL_FOLDS:
+        return SPECIAL_FOLDS[char]
+    if char.isspace():
+        return ' '
+    if 'a' <= char <= 'z' or '0' <= char <= '9':
+        return char
+    if not unicodedata.category(char).startswith('L'):
+        return ''
+    # Lettre accentuée ou compatible (É, ñ, ﬁ...) : décomposition puis lettres ASCII seules
+    decomposed = unicodedata.normalize('NFKD', char).lower()
+    return ''.join(c for c in decomposed if 'a' <= c <= 'z' or '0' <= c <= '9')
+
+
+def _build_table() -> Dict[int, str]:
+    """Table str.translate des caractères dont la forme comparable diffère"""
+    table = {}
+    for code in range(TABLE_RANGE):
+        char = chr(code)
+        folded = fold_char(char)
+        if folded != char:
+            table[code] = folded
+    return table
+
+
+FOLD_TABLE = _build_table()
+
+
+def normalize_name(name: str) -> str:
+    """Normalise un nom (minuscules, sans accents ni ponctuation, espaces simples)"""
+    if not name:
+        return ''
+    name = name.translate(FOLD_TABLE)
+    if not name.isascii():
+        # Caractères hors de la table (écritures non latines, symboles rares)
+        name = ''.join(fold_char(char) for char in name)
+    return ' '.join(name.split())
+
+
+class NameNormalizer:
+    """
+    normalize_name avec un cache LRU borné et ses statistiques
+    (taux de succès du cache pour en ajuster la taille)
+    """
+
+    def __init__(self, maxsize: int = 50000):
+        """
+        Args:
+            maxsize: Nombre maximum de noms gardés en cache
+        """
+        self.maxsize = maxsize
+        self._normalize = lru_cache(maxsize=maxsize)(normalize_name)
+
+    def normalize(self, name: str) -> str:
+        """Retourne la forme normalisée d'un nom (calculée une seule fois tant qu'elle reste en cache)"""
+        return self._normalize(name) if name else ''
+
+    def precompute(self, names: Iterable[str]) -> int:
+        """Remplit le cache avec des noms connus (ex: tout l'annuaire des tiers)"""
+        count = 0
+        for name in names:
+            if name:
+                self._normalize(name)
+                count += 1
+        return count
+
+    def clear(self):
+        """Vide le cache et remet les statistiques à zéro"""
+        self._normalize.cache_clear()
+
+    def stats(self) -> Dict:
+        """Statistiques du cache : hits, misses, taux de succès, taille"""
+        info = self._normalize.cache_info()
+        lookups = info.hits + info.misses
+        return {
+            'hits': info.hits,
+            'misses': info.misses,
+            'hit_rate': round(info.hits / lookups, 4) if lookups else 0.0,
+            'size': info.currsize,
+            'maxsize': info.maxsize
+        }
@@ -0,0 +1,102 @@
+"""
+Matching parallèle des gros relevés (reprise d'historique, plusieurs milliers de lignes)
+Les transactions sont réparties par tranches entre des processus (ProcessPoolExecutor).
+Les factures, lignes bancaires et index sont préparés dans le processus principal puis
+hérités par fork : seules les bornes des tranches partent vers les processus, et seules
+les positions des factures et lignes bancaires retenues reviennent.
+
+Sans fork (Windows), available() vaut False et le matcher reste en série.
+"""
+from typing import List, Dict, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+
+# En dessous de ce nombre de transactions, le démarrage des processus coûte plus qu'il ne rapporte
+PARALLEL_MIN_TRANSACTIONS = 500
+# Nombre de tranches par processus (équilibrage de charge entre processus)
+SHARDS_PER_WORKER = 4
+
+# Instantané partagé avec les processus (positionné juste avant le fork)
+_shared = None
+
+
+def available() -> bool:
+    """Le démarrage des processus par fork est-il disponible ?"""
+    return 'fork' in multiprocessing.get_all_start_methods()
+
+
+def _prepare_index(matcher, index):
+    """Construit dans le processus principal les structures créées à la demande (héritées par fork)"""
+    index.refs._containment_structures()
+    if matcher._use_vector_scorer(index):
+        index.vector_scorer.name_index._prefix_structures()
+
+
+def _match_shard(start: int, end: int) -> List[Tuple[List[Dict], List[Dict]]]:
+    """Matche une tranche de transactions dans un processus (factures et lignes remplacées par leur position)"""
+    matcher, transactions, invoices, bank_lines, indexes, positions = _shared
+    results = []
+    for transaction in transactions[start:end]:
+        invoice_matches, bank_line_matches = matcher._match_transaction(
+            transaction, invoices['customer'], invoices['supplier'], bank_lines,
+            indexes['customer'], indexes['supplier'], indexes['bank_line'])
+        results.append((
+            [dict(match, invoice=positions[match['invoice_type']][id(match['invoice'])]) for match in invoice_matches],
+            [dict(match, bank_line=positions['bank_line'][id(match['bank_line'])]) for match in bank_line_matches]
+        ))
+    return results
+
+
+def match_in_parallel(matcher, transactions: List[Dict], customer_invoices: List[Dict],
+                      supplier_invoices: List[Dict], bank_lines: List[Dict],
+                      customer_index, supplier_index, bank_line_index, workers: int) -> List[Tuple[List[Dict], List[Dict]]]:
+    """
+    Matche les transactions dans plusieurs processus
+
+    Args:
+        matcher: TransactionMatcher (règles de scoring)
+        transactions: Transactions du relevé
+        customer_invoices / supplier_invoices: Factures (mêmes listes que les index)
+        bank_lines: Lignes bancaires
+        customer_index / supplier_index: InvoiceIndex des factures
+        bank_line_index: BankLineIndex des lignes bancaires
+        workers: Nombre de processus
+
+    Returns:
+        Pour chaque transaction, dans l'ordre : (matches factures, matches lignes bancaires),
+        identiques au matching en série (mêmes objets facture et ligne bancaire)
+    """
+    global _shared
+
+    invoices = {'customer': customer_invoices, 'supplier': supplier_invoices}
+    positions = {
+        'customer': {id(inv): position for position, inv in enumerate(customer_invoices)},
+        'supplier': {id(inv): position for position, inv in enumerate(supplier_invoices)},
+        'bank_line': {id(line): position for position, line in enumerate(bank_lines)}
+    }
+    for index in (customer_index, supplier_index):
+        _prepare_index(matcher, index)
+
+    shard_size = max(1, -(-len(transactions) // (workers * SHARDS_PER_WORKER)))
+    bounds = [(start, min(start + shard_size, len(transactions)))
+              for start in range(0, len(transactions), shard_size)]
+
+    _shared = (matcher, transactions, invoices, bank_lines,
+               {'customer': customer_index, 'supplier': supplier_index, 'bank_line': bank_line_index}, positions)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as pool:
+            futures = [pool.submit(_match_shard, start, end) for start, end in bounds]
+            shard_results = [future.result() for future in futures]
+    finally:
+        _shared = None
+
+    # Remplacer les positions par les factures et lignes bancaires d'origine
+    results = []
+    for shard in shard_results:
+        for invoice_matches, bank_line_matches in shard:
+            results.append((
+                [dict(match, invoice=invoices[match['invoice_type']][match['invoice']]) for match in invoice_matches],
+                [dict(match, bank_line=bank_lines[match['bank_line']]) for match in bank_line_matches]
+            ))
+    return results
@@ -0,0 +1,217 @@
+"""
+Paiements échelonnés : plusieurs virements d'un même payeur qui soldent une facture
+Les transactions en attente sont regroupées par tiers extrait du libellé et triées
+par date ; une fenêtre glissante (deux pointeurs) cherche les suites de virements
+consécutifs dont le total égale le reste à payer d'une facture ouverte du tiers.
+"""
+from typing import List, Dict, Tuple, Optional
+from bisect import insort
+from grouped_payments import to_cents
+from invoice_features import InvoiceFeatureTable
+from thirdparty_index import ThirdpartyIndex
+
+
+class PartialPaymentAggregator:
+    """
+    Agrégation incrémentale des transactions en attente par tiers
+
+    Les groupes (tiers normalisé, sens débit/crédit) restent en mémoire : l'import
+    d'un relevé n'ajoute que ses nouvelles transactions et seuls les groupes touchés
+    sont re-balayés. Les factures ouvertes sont ré-analysées quand leur instantané change.
+    """
+
+    # Écart maximum entre le premier et le dernier virement d'une fenêtre (jours)
+    MAX_WINDOW_DAYS = 120
+    # Nombre maximum de virements dans une fenêtre
+    MAX_WINDOW_TRANSACTIONS = 6
+    # Similarité minimum entre le tiers extrait et le tiers de la facture
+    MIN_NAME_SIMILARITY = 70
+
+    def __init__(self, matcher):
+        """
+        Args:
+            matcher: TransactionMatcher (extraction du tiers, similarité des noms, tolérance)
+        """
+        self.matcher = matcher
+        # (tiers normalisé, type de facture) -> [(date, id, centimes, transaction)] trié par date
+        self._groups: Dict[Tuple[str, str], List[Tuple[int, int, int, Dict]]] = {}
+        self._group_names: Dict[Tuple[str, str], str] = {}
+        self._group_of_transaction: Dict[int, Tuple[str, str]] = {}
+        # Groupes à re-balayer et propositions déjà calculées par groupe
+        self._dirty: set = set()
+        self._settlements: Dict[Tuple[str, str], List[Dict]] = {}
+        # Type de facture -> (empreinte des factures, index des noms, factures ouvertes par tiers)
+        self._invoices: Dict[str, Tuple[Tuple, ThirdpartyIndex, List[List[Dict]]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._group_of_transaction)
+
+    def add_transactions(self, transactions: List[Dict]) -> int:
+        """
+        Ajoute des transactions en attente (id, date, label, amount)
+
+        Returns:
+            Nombre de transactions ajoutées (les transactions déjà connues ou sans tiers sont ignorées)
+        """
+        added = 0
+        for tx in transactions:
+            tx_id = tx.get('id')
+            if tx_id is None or tx_id in self._group_of_transaction:
+                continue
+            amount = float(tx.get('amount') or 0)
+            thirdparty_name = self.matcher.extract_thirdparty_from_label(tx.get('label') or '')
+            normalized = self.matcher.normalize_name_for_comparison(thirdparty_name) if thirdparty_name else ''
+            if amount == 0 or not normalized:
+                continue
+            try:
+                date = int(float(tx.get('date')))
+            except (TypeError, ValueError):
+                continue
+
+            key = (normalized, 'supplier' if amount < 0 else 'customer')
+            insort(self._groups.setdefault(key, []), (date, tx_id, to_cents(amount), tx))
+            self._group_names.setdefault(key, thirdparty_name)
+            self._group_of_transaction[tx_id] = key
+            self._dirty.add(key)
+            added += 1
+        return added
+
+    def remove_transaction(self, tx_id: int) -> bool:
+        """Retire une transaction (réconciliée ou ignorée) de son groupe"""
+        key = self._group_of_transaction.pop(tx_id, None)
+        if key is None:
+            return False
+        group = self._groups[key]
+        group[:] = [item for item in group if item[1] != tx_id]
+        if not group:
+            del self._groups[key]
+            self._settlements.pop(key, None)
+        self._dirty.add(key)
+        return True
+
+    def sync_pending(self, transactions: List[Dict]):
+        """
+        Aligne les groupes sur la liste complète des transactions en attente
+        (ajoute les nouvelles, retire celles réconciliées ou ignorées entre-temps)
+        """
+        pending_ids = set(tx.get('id') for tx in transactions)
+        for tx_id in [tx_id for tx_id in self._group_of_transaction if tx_id not in pending_ids]:
+            self.remove_transaction(tx_id)
+        self.add_transactions(transactions)
+
+    def _open_invoices(self, invoices: List[Dict], invoice_type: str) -> Tuple[ThirdpartyIndex, List[List[Dict]]]:
+        """Index des tiers des factures ouvertes (réutilisé tant que les factures n'ont pas changé)"""
+        key = InvoiceFeatureTable.snapshot_key(invoices, self.matcher)
+        cached = self._invoices.get(invoice_type)
+        if cached and cached[0] == key:
+            return cached[1], cached[2]
+
+        name_index = ThirdpartyIndex(self.matcher)
+        positions: Dict[str, int] = {}
+        by_name: List[List[Dict]] = []
+        for inv in invoices:
+            name = self.matcher._invoice_thirdparty_name(inv)
+            _, remain_to_pay = self.matcher._invoice_amounts(inv, invoice_type)
+            if not name or remain_to_pay <= 0:
+                continue
+            if name not in positions:
+                positions[name] = len(by_name)
+                by_name.append([])
+                name_index.add(name, positions[name])
+            by_name[positions[name]].append(inv)
+
+        self._invoices[invoice_type] = (key, name_index, by_name)
+        # Factures différentes : toutes les propositions de ce type sont à recalculer
+        self._dirty.update(group for group in self._groups if group[1] == invoice_type)
+        return name_index, by_name
+
+    def _sweep(self, group: List[Tuple[int, int, int, Dict]], target: int, slack: int) -> List[Tuple[int, int]]:
+        """
+        Fenêtres [left, right] de 2 virements consécutifs ou plus dont le total vaut target
+
+        Deux pointeurs : les montants étant positifs, la fenêtre se rétrécit par la gauche
+        dès que le total dépasse la cible ou que la fenêtre est trop longue, en O(n).
+        """
+        max_seconds = self.MAX_WINDOW_DAYS * 86400
+        windows = []
+        left = 0
+        total = 0
+        for right, (date, _, cents, _) in enumerate(group):
+            total += cents
+            while left < right and (total > target + slack
+                                    or date - group[left][0] > max_seconds
+                                    or right - left + 1 > self.MAX_WINDOW_TRANSACTIONS):
+                total -= group[left][2]
+                left += 1
+            if right > left and abs(total - target) <= slack:
+                windows.append((left, right))
+        return windows
+
+    def _group_settlements(self, key: Tuple[str, str], name_index: ThirdpartyIndex,
+                           by_name: List[List[Dict]]) -> List[Dict]:
+        """Propositions d'un groupe : une par fenêtre qui solde une facture ouverte du tiers"""
+        group = self._groups.get(key)
+        if not group or len(group) < 2:
+            return []
+
+        invoice_type = key[1]
+        slack = max(int(round(self.matcher.amount_tolerance * 100)) - 1, 0)
+        thirdparty_name = self._group_names[key]
+        settlements = []
+        for similarity, name_position in name_index.search(thirdparty_name, limit=None, exhaustive=True):
+            if similarity < self.MIN_NAME_SIMILARITY:
+                break
+            for inv in by_name[name_position]:
+                _, remain_to_pay = self.matcher._invoice_amounts(inv, invoice_type)
+                for left, right in self._sweep(group, to_cents(remain_to_pay), slack):
+                    window = group[left:right + 1]
+                    total = sum(cents for _, _, cents, _ in window) / 100
+                    settlements.append({
+                        'invoice': inv,
+                        'invoice_type': invoice_type,
+                        'transactions': [{'id': tx_id, 'date': tx.get('date'), 'label': tx.get('label'),
+                                          'amount': tx.get('amount')}
+                                         for _, tx_id, _, tx in window],
+                        'thirdparty': thirdparty_name,
+                        'total': total,
+                        'score': min(70 + int(similarity) // 4, 95),
+                        'reasons': [f"Paiement échelonné en {len(window)} virements",
+                                    f"Total {total:.2f} = reste à payer de {inv.get('ref') or inv.get('ref_supplier') or '-'}",
+                                    f"Tiers ({int(similarity)}%)"],
+                        'amount_diff': abs(total - remain_to_pay)
+                    })
+        return settlements
+
+    def find_settlements(self, customer_invoices: Optional[List[Dict]] = None,
+                         supplier_invoices: Optional[List[Dict]] = None) -> List[Dict]:
+        """
+        Retourne les paiements échelonnés qui soldent une facture ouverte
+
+        Seuls les groupes modifiés depuis le dernier appel (ou dont les factures ont
+        changé) sont re-balayés, les autres propositions sont réutilisées.
+
+        Args:
+            customer_invoices: Factures clients ouvertes (virements reçus)
+            supplier_invoices: Factures fournisseurs ouvertes (virements émis)
+
+        Returns:
+            Liste de propositions, les plus sûres d'abord
+        """
+        indexes = {}
+        for invoice_type, invoices in (('customer', customer_invoices), ('supplier', supplier_invoices)):
+            if invoices is not None:
+                indexes[invoice_type] = self._open_invoices(invoices, invoice_type)
+
+        for key in list(self._dirty):
+            if key[1] not in indexes:
+                continue
+            self._dirty.discard(key)
+            if key in self._groups:
+                self._settlements[key] = self._group_settlements(key, *indexes[key[1]])
+            else:
+                self._settlements.pop(key, None)
+
+        settlements = [s for key, group_settlements in self._settlements.items() if key[1] in indexes
+                       for s in group_settlements]
+        settlements.sort(key=lambda s: (-s['score'], len(s['transactions'])))
+        return settlements
@@ -0,0 +1,137 @@
+"""
+Normalisation et index des références de factures Dolibarr
+Une référence extraite d'un libellé retrouve ses factures par table de hachage
+(forme normalisée IN2512-0498, forme nettoyée IN25120498, 4 derniers caractères)
+au lieu d'être comparée à chaque facture
+"""
+from typing import List, Dict, Optional
+import label_patterns
+from text_index import add_position, build_suffixes, key_lengths, substrings_in, keys_containing
+
+
+def normalize_invoice_ref(ref: str) -> str:
+    """
+    Normalise une référence de facture pour la comparaison
+    IN25120498 -> IN2512-0498
+    IN2512-0498 -> IN2512-0498
+    """
+    if not ref:
+        return ''
+
+    ref = str(ref).upper().strip()
+
+    # Si déjà au bon format avec tiret
+    if label_patterns.REF_IN_DASHED.match(ref):
+        return ref
+
+    # Si format sans tiret IN25120498
+    match = label_patterns.REF_IN_COMPACT.match(ref)
+    if match:
+        return f"IN{match.group(1)}-{match.group(2)}"
+
+    # Même chose pour FAC
+    if label_patterns.REF_FAC_DASHED.match(ref):
+        return ref
+
+    match = label_patterns.REF_FAC_COMPACT.match(ref)
+    if match:
+        return f"FAC{match.group(1)}-{match.group(2)}"
+
+    return ref
+
+
+def clean_ref(ref: str) -> str:
+    """Normalise une référence pour faciliter la comparaison (sans espaces, tirets, points)"""
+    if not ref:
+        return ''
+    return str(ref).upper().replace(' ', '').replace('-', '').replace('.', '').replace('_', '')
+
+
+class RefIndex:
+    """
+    Index des références de factures (positions dans une liste de factures)
+
+    Deux références correspondent (refs_match) si leurs formes normalisées sont égales,
+    si leurs formes nettoyées sont égales ou si l'une contient l'autre.
+    La correspondance partielle porte sur les 4 derniers caractères de la forme nettoyée.
+    """
+
+    def __init__(self):
+        self._normalized: Dict[str, List[int]] = {}
+        self._clean: Dict[str, List[int]] = {}
+        self._suffix: Dict[str, List[int]] = {}
+        # Structures des recherches "contient", reconstruites à la demande
+        self._clean_suffixes = None
+        self._clean_lengths = None
+
+    def add(self, ref: str, position: int):
+        """Ajoute une référence brute (les positions doivent être ajoutées dans l'ordre)"""
+        if ref:
+            self.add_forms(normalize_invoice_ref(ref), clean_ref(ref), position)
+
+    def add_forms(self, normalized: str, clean: str, position: int):
+        """Ajoute une référence dont les deux formes sont déjà calculées"""
+        add_position(self._normalized, normalized, position)
+        add_position(self._clean, clean, position)
+        if len(clean) >= 4:
+            add_position(self._suffix, clean[-4:], position)
+        self._clean_suffixes = None
+
+    def _containment_structures(self):
+        """Construit les suffixes triés et les longueurs des formes nettoyées"""
+        if self._clean_suffixes is None:
+            self._clean_suffixes = build_suffixes(self._clean)
+            self._clean_lengths = key_lengths(self._clean)
+
+    def exact(self, normalized: str, clean: str) -> List[int]:
+        """Positions dont la forme normalisée ou nettoyée est identique (en O(1))"""
+        found = set(self._normalized.get(normalized, ()))
+        found.update(self._clean.get(clean, ()))
+        return sorted(found)
+
+    def contained_in(self, clean: str, found: set):
+        """Ajoute les positions dont la forme nettoyée est contenue dans clean (égalité comprise)"""
+        self._containment_structures()
+        substrings_in(clean, self._clean, self._clean_lengths, found)
+
+    def containing(self, clean: str, found: set):
+        """Ajoute les positions dont la forme nettoyée contient clean (égalité comprise)"""
+        self._containment_structures()
+        for indexed_clean in keys_containing(self._clean_suffixes, clean):
+            found.update(self._clean[indexed_clean])
+
+    def suffix_matches(self, clean: str) -> List[int]:
+        """Positions dont les 4 derniers caractères correspondent (correspondance partielle)"""
+        if len(clean) < 4:
+            return []
+        return self._suffix.get(clean[-4:], [])
+
+    def candidates(self, normalized: str, clean: str, found: set):
+        """Ajoute toutes les positions qui peuvent correspondre, totalement ou partiellement"""
+        found.update(self._normalized.get(normalized, ()))
+        self.contained_in(clean, found)
+        self.containing(clean, found)
+        found.update(self.suffix_matches(clean))
+
+    def matches(self, ref: str, both_directions: bool = True) -> List[int]:
+        """
+        Positions dont une référence correspond à ref, triées
+        
+        Args:
+            ref: Référence recherchée
+            both_directions: True = même règle que refs_match (l'une contient l'autre),
+                             False = seules les références qui contiennent ref
+        """
+        if not ref:
+            return []
+        clean = clean_ref(ref)
+        found = set(self._normalized.get(normalize_invoice_ref(ref), ()))
+        self.containing(clean, found)
+        if both_directions:
+            self.contained_in(clean, found)
+        return sorted(found)
+
+    def first_match(self, ref: str, both_directions: bool = True) -> Optional[int]:
+        """Première position (dans l'ordre d'ajout) dont une référence correspond à ref"""
+        positions = self.matches(ref, both_directions)
+        return positions[0] if positions else None
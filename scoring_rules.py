@@ -0,0 +1,134 @@
+"""
+Table des règles de scoring des factures (points et ordre d'évaluation)
+Les points de chaque règle ne sont définis qu'ici : le scoring Python facture par
+facture (TransactionMatcher), le scoring vectorisé (VectorizedScorer) et la recherche
+des factures d'une transaction par son tiers (app.py) lisent tous cette table.
+
+compile_rules() transforme la table en étapes pour une transaction donnée :
+- les règles sans objet pour la transaction (pas de référence, pas de période
+  dans le libellé, pas de nom extrait...) sont retirées une fois pour toutes ;
+- chaque étape connaît le maximum de points que les étapes suivantes peuvent encore
+  apporter, ce qui permet d'abandonner une facture dès qu'elle ne peut plus
+  atteindre le seuil.
+"""
+from typing import List, Dict, Optional, Tuple
+
+
+# Score minimum d'un match de facture (en dessous, le match est jugé peu fiable)
+MIN_SCORE = 30
+
+# Règles dans l'ordre d'évaluation (et d'affichage des raisons) :
+# (nom, points par issue, caractéristique de la transaction requise, règle remplacée)
+# Une règle de repli n'est évaluée que si la règle qu'elle remplace n'a pas abouti.
+# Chaque règle est une méthode _rule_<nom> de TransactionMatcher.
+SCORING_RULES = (
+    # Montant de la transaction comparé au reste à payer
+    ('amount', {'exact': 100, 'very_close': 90, 'close': 70, 'near': 40}, None, None),
+    # Année/mois de la référence de la facture comparés à la date de la transaction
+    ('period', {'year': 20, 'month': 35, 'wrong_year': -80}, None, None),
+    # Période mentionnée dans le libellé ("loyer mars 2025")
+    ('label_period', {'match': 25, 'wrong_year': -30}, 'label_period', None),
+    # Référence complète, sinon ses 4 derniers caractères
+    ('reference', {'match': 80}, 'tx_ref', None),
+    ('partial_reference', {'match': 40}, 'tx_ref', 'reference'),
+    # Échéance proche (20 points moins l'écart en jours au-delà d'un jour)
+    ('due_date', {'same_day': 30, 'one_day': 25, 'within_tolerance': 20}, None, None),
+    # Nom extrait du libellé comparé au tiers, sinon nom du tiers cherché dans le libellé
+    ('thirdparty', {'match': 60, 'similar': 40, 'mismatch': -100}, 'extracted_name', None),
+    ('name_parts', {'in_label': 50, 'parts': 30, 'not_found': -80}, 'label', 'thirdparty'),
+)
+
+# Points par règle et par issue
+POINTS: Dict[str, Dict[str, int]] = {name: points for name, points, _, _ in SCORING_RULES}
+
+# Noms des règles, dans l'ordre
+RULE_NAMES = tuple(name for name, _, _, _ in SCORING_RULES)
+
+
+def max_points(name: str) -> int:
+    """Maximum de points qu'une règle peut apporter (0 si elle ne peut que pénaliser)"""
+    return max(0, max(POINTS[name].values()))
+
+
+# Maximum de points de chaque règle (calculé une fois pour compile_rules)
+MAX_POINTS: Dict[str, int] = {name: max_points(name) for name in RULE_NAMES}
+
+
+class CompiledRule:
+    """Étape du scoring : règle à appeler et borne des points encore possibles après elle"""
+
+    __slots__ = ('name', 'rule', 'replaces', 'remaining')
+
+    def __init__(self, name: str, rule, replaces: Optional[str]):
+        self.name = name
+        self.rule = rule
+        self.replaces = replaces
+        self.remaining = 0
+
+
+def compile_rules(matcher, features, name_token_ids: frozenset) -> List[CompiledRule]:
+    """
+    Étapes du scoring d'une transaction (à réutiliser pour toutes ses factures)
+
+    Args:
+        matcher: TransactionMatcher (ses méthodes _rule_<nom>, éventuellement instrumentées)
+        features: TransactionFeatures de la transaction
+        name_token_ids: Mots du nom extrait, encodés avec le vocabulaire de la table des factures
+
+    Returns:
+        Étapes applicables, dans l'ordre de SCORING_RULES
+    """
+    steps = []
+    kept = set()
+    for name, _, requires, replaces in SCORING_RULES:
+        if requires is not None and not getattr(features, requires):
+            continue
+        rule = getattr(matcher, f'_rule_{name}')
+        if name == 'thirdparty':
+            rule = _with_name_tokens(rule, name_token_ids)
+        # La règle remplacée est sans objet : la règle de repli s'applique toujours
+        steps.append(CompiledRule(name, rule, replaces if replaces in kept else None))
+        kept.add(name)
+
+    # Points encore possibles après chaque étape
+    remaining = 0
+    for step in reversed(steps):
+        step.remaining = remaining
+        remaining += MAX_POINTS[step.name]
+    return steps
+
+
+def _with_name_tokens(rule, name_token_ids: frozenset):
+    """Règle du tiers avec les mots du nom extrait déjà encodés (même signature que les autres règles)"""
+    def thirdparty_rule(features, table, position, reasons):
+        return rule(features, table, position, name_token_ids, reasons)
+    return thirdparty_rule
+
+
+def run_rules(steps: List[CompiledRule], features, table, position: int,
+              min_score: Optional[int] = MIN_SCORE) -> Tuple[Optional[int], List[str]]:
+    """
+    Évalue les étapes sur une facture
+
+    Returns:
+        (score, raisons) ; score None si la facture ne peut plus atteindre min_score
+        (les étapes restantes ne sont alors pas évaluées)
+    """
+    reasons = []
+    score = 0
+    matched = False
+    for step in steps:
+        if step.replaces is not None and matched:
+            # La règle remplacée a abouti : pas de repli
+            matched = False
+            continue
+        result = step.rule(features, table, position, reasons)
+        if isinstance(result, tuple):
+            points, matched = result
+        else:
+            points = result
+            matched = points != 0
+        score += points
+        if min_score is not None and score + step.remaining < min_score:
+            return None, reasons
+    return score, reasons
@@ -0,0 +1,141 @@
+"""
+Tests du parcours des listes de DolibarrClient (endpoints selon la version de Dolibarr)
+"""
+import asyncio
+import json
+
+import pytest
+
+from async_dolibarr_client import AsyncDolibarrClient, DolibarrSyncFacade
+from dolibarr_client import DolibarrClient, DolibarrListError
+
+
+NOT_FOUND = {'error': {'code': 404, 'message': 'Not Found'}}
+
+
+class FakeResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.text = json.dumps(body)
+        self.content = self.text.encode()
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class FakeSession:
+    """Instance Dolibarr simulée : endpoint de liste -> éléments (endpoint absent = route inconnue)"""
+
+    def __init__(self, lists):
+        self.lists = lists
+        self.headers = {}
+        self.calls = []
+
+    def get(self, url, params=None, **kwargs):
+        endpoint = url.split('/api/index.php/', 1)[1]
+        self.calls.append(endpoint)
+        if endpoint not in self.lists:
+            return FakeResponse(404, NOT_FOUND)
+        items = self.lists[endpoint]
+        if isinstance(items, list):
+            # Pagination de l'API (limit, page)
+            limit = int((params or {}).get('limit', 100))
+            page = int((params or {}).get('page', 0))
+            items = items[page * limit:(page + 1) * limit]
+        if not items:
+            return FakeResponse(404, {'error': {'code': 404, 'message': 'Not Found: No object found'}})
+        return FakeResponse(200, items)
+
+    def request(self, method, url, **kwargs):
+        return self.get(url, **kwargs)
+
+
+@pytest.fixture
+def make_client(tmp_path, monkeypatch):
+    # Carte des endpoints détectés écrite dans un dossier temporaire
+    monkeypatch.chdir(tmp_path)
+
+    def make(lists):
+        client = DolibarrClient()
+        client.session = FakeSession(lists)
+        return client
+    return make
+
+
+def test_unknown_route_is_an_error_not_an_empty_list(make_client):
+    client = make_client({'supplier_invoices': []})
+    with pytest.raises(DolibarrListError):
+        list(client.iter_list('supplierinvoices'))
+    assert list(client.iter_list('supplier_invoices')) == []
+
+
+def test_next_route_is_tried_when_first_route_is_missing(make_client):
+    invoice = {'id': 7, 'ref': 'SI-7', 'paye': '0', 'statut': '1'}
+    client = make_client({'supplier_invoices': [invoice]})
+    # Sans détection des endpoints : tous les noms possibles sont essayés dans l'ordre
+    client.capabilities.claim_probe = lambda resource, force=False: False
+
+    assert client.get_supplier_invoices(status=None) == [invoice]
+    assert client.session.calls[:2] == ['supplierinvoices', 'supplier_invoices']
+
+
+def test_invoice_is_found_by_ref_beyond_the_first_500(make_client):
+    invoices = [{'id': i, 'ref': f'FA2501-{i:04d}', 'socid': 1} for i in range(1, 1201)]
+    client = make_client({'invoices': invoices})
+
+    invoice = client.get_invoice_by_ref('FA2501-1150')
+    assert invoice['id'] == 1150
+    assert invoice['_invoice_type'] == 'customer'
+
+
+def test_endpoints_are_detected_once_and_persisted(make_client):
+    client = make_client({'status': {'success': {'dolibarr_version': '18.0.1'}},
+                          'supplier_invoices': [{'id': 1, 'paye': '0', 'statut': '1'}]})
+    client.get_supplier_invoices(status=None)
+    assert client.capabilities.get('supplier_invoices') == 'supplier_invoices'
+
+    restarted = make_client({'supplier_invoices': [{'id': 1, 'paye': '0', 'statut': '1'}]})
+    assert restarted.capabilities.version == '18.0.1'
+    restarted.get_supplier_invoices(status=None)
+    assert restarted.session.calls == ['supplier_invoices']
+
+
+def test_stale_endpoint_is_dropped_and_probed_again_on_missing_route(make_client):
+    thirdparty = {'id': 3, 'name': 'ACME'}
+    stale = make_client({'status': {'success': {'dolibarr_version': '18.0.1'}}, 'thirdparties': [thirdparty]})
+    stale.capabilities.set_version('18.0.1')
+    stale.capabilities.set('thirdparties', 'thirdparties')
+
+    # Même version, mais la route mémorisée n'existe plus sur cette instance
+    client = make_client({'status': {'success': {'dolibarr_version': '18.0.1'}}, 'societes': [thirdparty]})
+    assert client.capabilities.get('thirdparties') == 'thirdparties'
+    # Une détection récente ne retarde pas la nouvelle détection d'une route inexistante
+    assert client.capabilities.claim_probe('thirdparties')
+
+    assert client.get_thirdparties() == [thirdparty]
+    assert client.capabilities.get('thirdparties') == 'societes'
+    assert client.session.calls[0] == 'thirdparties'
+    assert client.session.calls[-1] == 'societes'
+
+
+def test_async_client_shares_route_selection_with_sync_client(make_client):
+    thirdparty = {'id': 3, 'name': 'ACME'}
+    client = make_client({'status': {'success': {'dolibarr_version': '18.0.1'}}, 'societes': [thirdparty]})
+    client.capabilities.set_version('18.0.1')
+    client.capabilities.set('thirdparties', 'thirdparties')
+    async_client = AsyncDolibarrClient(client)
+
+    # Route inexistante vue par le client asyncio : nouvelle détection par DolibarrClient._routes
+    client.capabilities.route_missing('thirdparties/3')
+
+    async def routes():
+        return [endpoint async for endpoint in async_client._routes('thirdparties')]
+    assert asyncio.run(routes()) == ['societes']
+    assert client.capabilities.get('thirdparties') == 'societes'
+
+    # Les listes sont celles de DolibarrClient, exécutées dans un thread
+    facade = DolibarrSyncFacade(async_client)
+    try:
+        assert facade.get_thirdparties() == [thirdparty]
+    finally:
+        facade.close()
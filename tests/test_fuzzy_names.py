@@ -0,0 +1,41 @@
+"""
+Tests de la similarité approximative des noms de tiers
+"""
+import pytest
+
+from matcher import TransactionMatcher
+
+
+@pytest.fixture(scope='module')
+def matcher():
+    return TransactionMatcher()
+
+
+@pytest.mark.parametrize('name1, name2', [
+    ('JEAN MARTIN', 'JEAN DUPONT'),
+    ('JEAN MARTIN', 'JEAN MARTINEZ'),
+    ('TRANSPORTS DUBOIS', 'TRANSPORTS DUPUIS'),
+])
+def test_shared_first_word_different_surname_is_a_different_thirdparty(matcher, name1, name2):
+    assert matcher.calculate_name_similarity(name1, name2) < 30
+
+
+@pytest.mark.parametrize('name1, name2', [
+    ('RESTAURATION SASU', 'RESTAURATION SCI'),
+    ('PLOMBERIE SAS', 'PLOMBERIE SCI'),
+])
+def test_legal_forms_do_not_create_a_match(matcher, name1, name2):
+    assert matcher.calculate_name_similarity(name1, name2) < 30
+
+
+@pytest.mark.parametrize('name1, name2', [
+    ('EHUEINA', 'EHUIENA'),
+    ('EHUEINA SARL', 'EHUIENA SARL'),
+    ('GESCOAD', 'GESCO AD'),
+])
+def test_typo_is_a_similar_thirdparty(matcher, name1, name2):
+    assert 50 <= matcher.calculate_name_similarity(name1, name2) < 70
+
+
+def test_digits_must_be_equal(matcher):
+    assert matcher.calculate_name_similarity('SOCIETE 044', 'SOCIETE 048') < 30
@@ -0,0 +1,21 @@
+"""
+Tests de la réutilisation des caractéristiques de factures (instantanés)
+"""
+from matcher import TransactionMatcher
+
+
+def test_already_paid_flag_invalidates_the_snapshot():
+    matcher = TransactionMatcher()
+    invoice = {'id': 1, 'ref': 'FA2501-0001', 'total_ttc': '120.00', 'remaintopay': '0',
+               'socname': 'ACME'}
+
+    unpaid = matcher._invoice_index([dict(invoice)], 'customer')
+    paid = matcher._invoice_index([dict(invoice, _already_paid=True)], 'customer')
+
+    # Facture déjà payée (recherche par tiers) : comparée à son montant total
+    assert paid is not unpaid
+    assert unpaid.table.remain_to_pay == [0.0]
+    assert paid.table.remain_to_pay == [120.0]
+
+    # Même instantané : l'index est réutilisé
+    assert matcher._invoice_index([dict(invoice, _already_paid=True)], 'customer') is paid
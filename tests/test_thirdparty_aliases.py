@@ -0,0 +1,45 @@
+"""
+Tests de la mémoire des tiers (signature du libellé -> payeur réconcilié)
+"""
+import pytest
+
+from database import Database
+from matcher import TransactionMatcher
+
+
+@pytest.fixture
+def db(tmp_path):
+    return Database(str(tmp_path / 'bankia.db'))
+
+
+@pytest.fixture(scope='module')
+def matcher():
+    return TransactionMatcher()
+
+
+def reconcile(db, matcher, label, amount, thirdparty_id, thirdparty_name):
+    """Importe une transaction et la réconcilie avec une facture du tiers"""
+    imported = db.import_transactions([{'date': '1735689600', 'label': label, 'amount': amount}])
+    transaction_id = imported['imported'][0]['id']
+    db.reconcile_transaction(transaction_id, invoice_id=transaction_id, invoice_type='customer',
+                             invoice_ref=f'FA{transaction_id}', thirdparty_name=thirdparty_name,
+                             thirdparty_id=thirdparty_id, alias_signature=matcher.label_signature(label))
+
+
+def lookup(db, matcher, label):
+    return db.get_thirdparty_alias(matcher.label_signature(label), min_hits=matcher.alias_min_hits(label))
+
+
+def test_generic_label_does_not_resolve_to_a_single_payer(db, matcher):
+    reconcile(db, matcher, 'REMISE CHEQUE 01/25', 120.0, 7, 'DUPONT JEAN')
+    assert lookup(db, matcher, 'REMISE CHEQUE 02/25') is None
+
+    # Chèques suivants d'autres clients : la signature reste ambiguë
+    reconcile(db, matcher, 'REMISE CHEQUE 03/25', 80.0, 8, 'MARTIN PAUL')
+    assert lookup(db, matcher, 'REMISE CHEQUE 04/25') is None
+
+
+def test_extracted_payer_name_is_learned_after_one_reconciliation(db, matcher):
+    reconcile(db, matcher, 'VIRT RECU EHUEINA SARL EUR', 500.0, 3, 'EHUEINA SARL')
+    alias = lookup(db, matcher, 'VIRT RECU EHUEINA SARL EUR')
+    assert alias is not None and alias['id'] == 3
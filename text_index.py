@@ -0,0 +1,53 @@
+"""
+Outils communs aux index de recherche (factures, références, tiers)
+Listes de positions par clé et recherches "contient" / "est contenu dans"
+"""
+from typing import List, Dict, Tuple
+from bisect import bisect_left
+
+
+def add_position(mapping: Dict, key, position: int):
+    """Ajoute une position à la liste associée à une clé (positions ajoutées dans l'ordre)"""
+    positions = mapping.get(key)
+    if positions is None:
+        mapping[key] = [position]
+    elif positions[-1] != position:
+        positions.append(position)
+
+
+def build_suffixes(keys) -> Tuple[List[str], List[str]]:
+    """Construit la liste triée de tous les suffixes des clés (suffixe, clé)"""
+    suffixes = []
+    for key in keys:
+        for start in range(len(key) + 1):
+            suffixes.append((key[start:], key))
+    suffixes.sort()
+    return [s for s, _ in suffixes], [k for _, k in suffixes]
+
+
+def key_lengths(keys) -> List[int]:
+    """Longueurs existantes des clés, triées (pour borner les sous-chaînes à tester)"""
+    return sorted(set(len(key) for key in keys))
+
+
+def substrings_in(text: str, mapping: Dict[str, List[int]], lengths: List[int], found: set):
+    """Ajoute les positions de toutes les clés qui sont des sous-chaînes de text"""
+    size = len(text)
+    for start in range(size + 1):
+        for length in lengths:
+            if start + length > size:
+                break
+            positions = mapping.get(text[start:start + length])
+            if positions:
+                found.update(positions)
+
+
+def keys_containing(suffixes: Tuple[List[str], List[str]], needle: str) -> set:
+    """Retourne les clés qui contiennent needle (via les suffixes qui commencent par needle)"""
+    values, keys = suffixes
+    found = set()
+    i = bisect_left(values, needle)
+    while i < len(values) and values[i].startswith(needle):
+        found.add(keys[i])
+        i += 1
+    return found
@@ -0,0 +1,246 @@
+"""
+Annuaire des tiers Dolibarr en mémoire, partagé par tout le processus
+Les tiers sont téléchargés une fois, puis seuls ceux modifiés depuis le dernier
+rafraîchissement (champ tms, via sqlfilters) sont relus ; un rafraîchissement complet
+périodique retire les tiers supprimés. Les recherches par nom (exacte, tous les mots)
+sont servies par un index des mots au lieu de parcourir les tiers à chaque appel,
+et l'index de similarité (ThirdpartyIndex) est construit depuis le même annuaire.
+Les noms chargés sont normalisés d'avance dans le cache du matcher (NameNormalizer).
+"""
+from typing import List, Dict, Optional, Set
+from dolibarr_client import modified_timestamp, modified_since_filter
+from thirdparty_index import ThirdpartyIndex
+from text_index import build_suffixes, keys_containing
+import threading
+import time
+
+
+class ThirdpartyDirectory:
+    """Tiers Dolibarr indexés par nom, rafraîchis de façon incrémentale"""
+
+    # Âge maximum de l'annuaire avant un rafraîchissement incrémental (secondes)
+    REFRESH_INTERVAL = 300
+    # Intervalle des rafraîchissements complets (tiers supprimés dans Dolibarr)
+    FULL_REFRESH_INTERVAL = 24 * 3600
+    # Recouvrement de la fenêtre incrémentale (filtre tms dans le fuseau du serveur Dolibarr)
+    REFRESH_OVERLAP_SECONDS = 24 * 3600
+
+    def __init__(self, dolibarr, matcher):
+        """
+        Args:
+            dolibarr: DolibarrClient utilisé pour le chargement
+            matcher: TransactionMatcher (normalisation des noms de l'index de similarité)
+        """
+        self.dolibarr = dolibarr
+        self.matcher = matcher
+        self._lock = threading.RLock()
+        # ID -> tiers, et ID -> nom en minuscules
+        self._thirdparties: Dict[str, Dict] = {}
+        self._names: Dict[str, str] = {}
+        # Nom en minuscules -> IDs, mot -> IDs
+        self._by_name: Dict[str, Set[str]] = {}
+        self._by_word: Dict[str, Set[str]] = {}
+        # Suffixes des mots (recherche "contient"), reconstruits quand le vocabulaire change
+        self._word_suffixes = None
+        # Index de similarité, reconstruit après une modification ou une suppression
+        self._fuzzy_index: Optional[ThirdpartyIndex] = None
+        self._last_tms: Optional[int] = None
+        self._last_refresh: Optional[float] = None
+        self._last_full_refresh: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._thirdparties)
+
+    @staticmethod
+    def _name(thirdparty: Dict) -> str:
+        return (thirdparty.get('name', '') or thirdparty.get('nom', '') or '').lower().strip()
+
+    @staticmethod
+    def _rank(thirdparty_id: str):
+        """Ordre des résultats : celui de la liste Dolibarr (rowid croissant)"""
+        return (0, int(thirdparty_id), '') if thirdparty_id.isdigit() else (1, 0, thirdparty_id)
+
+    # ========== Écriture ==========
+
+    def _unindex(self, thirdparty_id: str):
+        name = self._names.pop(thirdparty_id, None)
+        self._thirdparties.pop(thirdparty_id, None)
+        if name is None:
+            return
+        ids = self._by_name.get(name)
+        if ids is not None:
+            ids.discard(thirdparty_id)
+            if not ids:
+                del self._by_name[name]
+        for word in set(name.split()):
+            ids = self._by_word.get(word)
+            if ids is not None:
+                ids.discard(thirdparty_id)
+                if not ids:
+                    del self._by_word[word]
+                    self._word_suffixes = None
+
+    def _index(self, thirdparty: Dict) -> str:
+        thirdparty_id = str(thirdparty.get('id'))
+        self._unindex(thirdparty_id)
+        name = self._name(thirdparty)
+        self._thirdparties[thirdparty_id] = thirdparty
+        self._names[thirdparty_id] = name
+        self._by_name.setdefault(name, set()).add(thirdparty_id)
+        for word in set(name.split()):
+            if word not in self._by_word:
+                self._by_word[word] = set()
+                self._word_suffixes = None
+            self._by_word[word].add(thirdparty_id)
+        return thirdparty_id
+
+    def add(self, thirdparty: Dict):
+        """Ajoute ou met à jour un tiers (ex: tiers créé depuis un PDF, sans attendre le rafraîchissement)"""
+        if not thirdparty or thirdparty.get('id') is None:
+            return
+        with self._lock:
+            known = str(thirdparty.get('id')) in self._thirdparties
+            self._index(thirdparty)
+            name = thirdparty.get('name', '') or thirdparty.get('nom', '')
+            self.matcher.name_normalizer.precompute([name])
+            if self._fuzzy_index is not None:
+                if known:
+                    self._fuzzy_index = None
+                elif name:
+                    self._fuzzy_index.add(name, thirdparty)
+
+    def remove(self, thirdparty_id):
+        """Retire un tiers supprimé dans Dolibarr"""
+        with self._lock:
+            self._unindex(str(thirdparty_id))
+            self._fuzzy_index = None
+
+    # ========== Rafraîchissement ==========
+
+    def refresh(self, full: bool = False) -> bool:
+        """
+        Relit les tiers dans Dolibarr
+
+        Args:
+            full: Relire tous les tiers (sinon seuls ceux modifiés depuis le dernier rafraîchissement)
+
+        Returns:
+            False si Dolibarr n'a pas répondu (l'annuaire est alors laissé tel quel)
+        """
+        with self._lock:
+            full = full or self._last_refresh is None
+            started_at = time.time()
+
+            sqlfilters = ''
+            if not full:
+                since = (self._last_tms or int(self._last_refresh)) - self.REFRESH_OVERLAP_SECONDS
+                sqlfilters = modified_since_filter(since)
+
+            thirdparties = self.dolibarr.list_thirdparties(sqlfilters=sqlfilters)
+            if thirdparties is None:
+                print("[SEARCH] Rafraîchissement de l'annuaire des tiers impossible, annuaire inchangé")
+                return False
+
+            changed = 0
+            loaded_names = []
+            if full:
+                seen = set(str(tp.get('id')) for tp in thirdparties)
+                for thirdparty_id in set(self._thirdparties) - seen:
+                    self._unindex(thirdparty_id)
+                    changed += 1
+            for thirdparty in thirdparties:
+                modified_at = modified_timestamp(thirdparty)
+                if modified_at is not None and (self._last_tms is None or modified_at > self._last_tms):
+                    self._last_tms = modified_at
+                # Tiers du recouvrement déjà à jour
+                if self._thirdparties.get(str(thirdparty.get('id'))) == thirdparty:
+                    continue
+                self._index(thirdparty)
+                loaded_names.append(thirdparty.get('name', '') or thirdparty.get('nom', ''))
+                changed += 1
+
+            # Noms des tiers normalisés une fois, avant le scoring des factures
+            self.matcher.name_normalizer.precompute(loaded_names)
+            if changed:
+                self._fuzzy_index = None
+            self._last_refresh = started_at
+            if full:
+                self._last_full_refresh = started_at
+
+            print(f"[SEARCH] Annuaire des tiers : {len(thirdparties)} lu(s), {changed} changement(s), "
+                  f"{len(self._thirdparties)} tiers ({'complet' if full else 'incrémental'}, "
+                  f"{time.time() - started_at:.2f}s)")
+            return True
+
+    def refresh_if_stale(self, max_age: Optional[float] = None):
+        """Rafraîchit l'annuaire s'il date de plus de max_age secondes (complet une fois par jour)"""
+        max_age = self.REFRESH_INTERVAL if max_age is None else max_age
+        now = time.time()
+        if self._last_refresh is not None and now - self._last_refresh < max_age:
+            return
+        with self._lock:
+            # Rafraîchi entre-temps par un autre thread
+            if self._last_refresh is not None and time.time() - self._last_refresh < max_age:
+                return
+            full = self._last_full_refresh is None or now - self._last_full_refresh > self.FULL_REFRESH_INTERVAL
+            try:
+                self.refresh(full=full)
+            except Exception as e:
+                print(f"[SEARCH] Erreur rafraîchissement de l'annuaire des tiers: {e}")
+
+    # ========== Recherche ==========
+
+    def _ids_containing(self, part: str) -> Set[str]:
+        """Tiers dont le nom contient part (part n'a pas d'espace : il est dans un seul mot)"""
+        if self._word_suffixes is None:
+            self._word_suffixes = build_suffixes(self._by_word)
+        ids = set()
+        for word in keys_containing(self._word_suffixes, part):
+            ids.update(self._by_word[word])
+        return ids
+
+    def search(self, name: str) -> List[Dict]:
+        """
+        Recherche un tiers par nom, comme DolibarrClient.search_thirdparty : les tiers de nom
+        identique en priorité, sinon ceux dont le nom contient tous les mots recherchés
+
+        Returns:
+            Tiers trouvés, dans l'ordre de la liste Dolibarr
+        """
+        self.refresh_if_stale()
+        name_lower = name.lower().strip()
+        name_parts = [p for p in name_lower.split() if len(p) >= 2]
+
+        with self._lock:
+            ids = set(self._by_name.get(name_lower, ()))
+            if not ids and name_parts:
+                # Mots les plus longs (les plus sélectifs) d'abord : l'intersection se réduit vite
+                candidates = None
+                for part in sorted(name_parts, key=len, reverse=True):
+                    containing = self._ids_containing(part)
+                    candidates = containing if candidates is None else candidates & containing
+                    if not candidates:
+                        break
+                ids = candidates
+            return [self._thirdparties[thirdparty_id] for thirdparty_id in sorted(ids, key=self._rank)]
+
+    def fuzzy_index(self) -> ThirdpartyIndex:
+        """Index de similarité des noms (recherche tolérante, typeahead), construit depuis l'annuaire"""
+        self.refresh_if_stale()
+        with self._lock:
+            if self._fuzzy_index is None:
+                thirdparties = [self._thirdparties[thirdparty_id]
+                                for thirdparty_id in sorted(self._thirdparties, key=self._rank)]
+                self._fuzzy_index = ThirdpartyIndex.from_thirdparties(thirdparties, self.matcher)
+                print(f"[SEARCH] Index des tiers construit ({len(self._fuzzy_index)} tiers)")
+            return self._fuzzy_index
+
+    def stats(self) -> Dict:
+        """Taille de l'annuaire et dates des rafraîchissements"""
+        return {
+            'thirdparties': len(self._thirdparties),
+            'words': len(self._by_word),
+            'last_tms': self._last_tms,
+            'last_refresh': self._last_refresh,
+            'last_full_refresh': self._last_full_refresh
+        }
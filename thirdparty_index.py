@@ -0,0 +1,168 @@
+"""
+Index inversé des noms de tiers (mot normalisé -> tiers qui le contiennent)
+Permet de retrouver les tiers proches d'un nom sans comparer le nom à tout l'annuaire :
+seuls les tiers qui partagent un mot, un préfixe ou un mot-clé avec la recherche sont scorés
+"""
+from typing import List, Dict, Tuple, Any, Optional
+from bisect import bisect_left
+from itertools import combinations
+from fuzzy_names import TrigramIndex
+
+
+class ThirdpartyIndex:
+    """
+    Index des noms de tiers pour calculate_name_similarity
+
+    Un tiers ne peut avoir une similarité non nulle avec la recherche que si :
+    - il partage au moins un mot (égalité, Jaccard, inclusion des mots)
+    - l'un des deux noms est préfixe de l'autre
+    - un mot de 4+ caractères de la recherche est contenu dans un de ses mots
+    - son nom est proche à quelques fautes près (index de trigrammes)
+    Chacun de ces ensembles est retrouvé par les listes de l'index.
+    """
+
+    # Au-delà de ce nombre de tiers, un mot est considéré comme très fréquent (SARL, SAS...)
+    FREQUENT_TOKEN_POSTINGS = 1000
+
+    def __init__(self, matcher):
+        """
+        Args:
+            matcher: TransactionMatcher dont on réutilise la normalisation et la similarité
+        """
+        self.matcher = matcher
+        self.entries: List[Any] = []
+        self._names: List[str] = []
+        self._token_sets: List[frozenset] = []
+        # Mot -> positions des tiers (listes croissantes)
+        self._postings: Dict[str, List[int]] = {}
+        # Nom normalisé -> positions, ensemble de mots -> positions
+        self._by_name: Dict[str, List[int]] = {}
+        self._by_token_set: Dict[frozenset, List[int]] = {}
+        # Trigrammes des noms (noms mal orthographiés)
+        self._trigrams = TrigramIndex()
+        # Structures de recherche par préfixe / sous-chaîne, reconstruites à la demande
+        self._sorted_names: Optional[List[str]] = None
+        self._token_suffixes: Optional[Tuple[List[str], List[str]]] = None
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, name: str, entry: Any):
+        """Ajoute un tiers à l'index (entry est retourné tel quel par search)"""
+        position = len(self.entries)
+        normalized = self.matcher.normalize_name_for_comparison(name)
+        tokens = frozenset(normalized.split())
+
+        self.entries.append(entry)
+        self._names.append(normalized)
+        self._token_sets.append(tokens)
+        for token in tokens:
+            self._postings.setdefault(token, []).append(position)
+        self._by_name.setdefault(normalized, []).append(position)
+        self._by_token_set.setdefault(tokens, []).append(position)
+        self._trigrams.add(normalized)
+
+        self._sorted_names = None
+        self._token_suffixes = None
+
+    @classmethod
+    def from_thirdparties(cls, thirdparties: List[Dict], matcher) -> 'ThirdpartyIndex':
+        """Construit l'index depuis une liste de tiers Dolibarr (champ name ou nom)"""
+        index = cls(matcher)
+        for tp in thirdparties:
+            tp_name = tp.get('name', '') or tp.get('nom', '')
+            if tp_name:
+                index.add(tp_name, tp)
+        return index
+
+    def _prefix_structures(self):
+        """Construit les noms triés et les suffixes triés du vocabulaire"""
+        if self._sorted_names is None:
+            self._sorted_names = sorted(self._by_name)
+            suffixes = sorted((token[start:], token) for token in self._postings for start in range(len(token)))
+            self._token_suffixes = ([s for s, _ in suffixes], [t for _, t in suffixes])
+
+    def _tokens_containing(self, part: str) -> List[str]:
+        """Mots du vocabulaire qui contiennent part"""
+        values, tokens = self._token_suffixes
+        found = []
+        i = bisect_left(values, part)
+        while i < len(values) and values[i].startswith(part):
+            found.append(tokens[i])
+            i += 1
+        return found
+
+    def _candidates(self, n1: str, parts1: set, exhaustive: bool) -> set:
+        """Positions des tiers qui peuvent avoir une similarité non nulle avec n1"""
+        self._prefix_structures()
+        found = set()
+
+        # Nom du tiers préfixe de la recherche (dont nom identique)
+        for end in range(len(n1) + 1):
+            found.update(self._by_name.get(n1[:end], ()))
+
+        # Recherche préfixe du nom du tiers
+        i = bisect_left(self._sorted_names, n1)
+        while i < len(self._sorted_names) and self._sorted_names[i].startswith(n1):
+            found.update(self._by_name[self._sorted_names[i]])
+            i += 1
+
+        postings = sorted((self._postings.get(token, ()) for token in parts1), key=len)
+        frequent = [token for token in parts1 if len(self._postings.get(token, ())) > self.FREQUENT_TOKEN_POSTINGS]
+        for rank, positions in enumerate(postings):
+            # La liste la plus courte contient tous les tiers dont le nom inclut tous les mots recherchés
+            if exhaustive or rank == 0 or len(positions) <= self.FREQUENT_TOKEN_POSTINGS:
+                found.update(positions)
+
+        if not exhaustive and len(frequent) <= 8:
+            # Tiers dont les mots sont tous des mots fréquents de la recherche (ex: "SAS")
+            for size in range(1, len(frequent) + 1):
+                for subset in combinations(frequent, size):
+                    found.update(self._by_token_set.get(frozenset(subset), ()))
+
+        # Mot-clé de 4+ caractères contenu dans un mot du tiers
+        for part in parts1:
+            if len(part) >= 4:
+                for token in self._tokens_containing(part):
+                    positions = self._postings[token]
+                    if exhaustive or len(positions) <= self.FREQUENT_TOKEN_POSTINGS:
+                        found.update(positions)
+
+        # Nom proche à quelques fautes près
+        for name in self._trigrams.search(n1):
+            found.update(self._by_name[name])
+
+        return found
+
+    def search(self, name: str, limit: Optional[int] = 20, exhaustive: bool = False) -> List[Tuple[float, Any]]:
+        """
+        Retourne les tiers les plus proches d'un nom, triés par similarité décroissante
+        (à similarité égale, dans l'ordre d'ajout)
+
+        Args:
+            name: Nom recherché
+            limit: Nombre maximum de résultats (None = tous)
+            exhaustive: Si False, les mots très fréquents ne servent à trouver que les tiers
+                        qui contiennent tous les mots recherchés ou dont tous les mots sont
+                        dans la recherche (réponse rapide sur un gros annuaire). Si True, tous
+                        les tiers de similarité non nulle sont retournés.
+
+        Returns:
+            Liste de (similarité 0-100, entry)
+        """
+        n1 = self.matcher.normalize_name_for_comparison(name)
+        if not n1 or not self.entries:
+            return []
+
+        parts1 = set(n1.split())
+        results = []
+        for position in self._candidates(n1, parts1, exhaustive):
+            similarity = self.matcher._name_similarity_normalized(
+                n1, self._names[position], parts1, self._token_sets[position], parts1)
+            if similarity > 0:
+                results.append((similarity, position))
+
+        results.sort(key=lambda r: (-r[0], r[1]))
+        if limit is not None:
+            results = results[:limit]
+        return [(similarity, self.entries[position]) for similarity, position in results]
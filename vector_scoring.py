@@ -0,0 +1,235 @@
+"""
+Scoring vectorisé (NumPy) des factures pour le matching en lot
+Les règles arithmétiques du scoring (montant, année/mois, période du libellé,
+échéance) sont évaluées d'un coup sur toutes les factures. Les références passent
+par l'index des références (hachage des 4 derniers caractères, formes normalisées)
+et le tiers par le code Python habituel, mais une seule fois par tiers ou par
+référence candidate au lieu d'une fois par facture.
+
+NumPy est optionnel : sans lui, AVAILABLE vaut False et le matcher garde le scoring Python.
+"""
+from typing import List, Dict, Tuple
+from thirdparty_index import ThirdpartyIndex
+from scoring_rules import POINTS, MIN_SCORE
+from date_utils import local_seconds
+import time
+
+try:
+    import numpy as np
+    AVAILABLE = True
+except ImportError:  # pragma: no cover - dépend de l'environnement
+    np = None
+    AVAILABLE = False
+
+
+class VectorizedScorer:
+    """
+    Scoring des factures d'un InvoiceIndex sous forme de tableaux NumPy
+
+    Donne exactement les mêmes scores que TransactionMatcher._score_invoice :
+    seules les 5 meilleures factures sont ensuite re-scorées en Python pour
+    produire les raisons affichées.
+    """
+
+    def __init__(self, index, matcher):
+        """
+        Args:
+            index: InvoiceIndex (et sa table de caractéristiques)
+            matcher: TransactionMatcher (tolérances et règles Python)
+        """
+        self.index = index
+        self.matcher = matcher
+        table = index.table
+        self.table = table
+
+        self.remain_to_pay = np.array(table.remain_to_pay, dtype=np.float64)
+        self.has_amount = np.array(table.invoice_amounts, dtype=np.float64) != 0
+
+        period_codes = np.array(table.period_codes, dtype=np.int64)
+        self.has_period = period_codes != table.NO_PERIOD
+        self.period_codes = period_codes
+        self.period_years = period_codes // 100
+
+        self.has_due_date = np.array([d is not None for d in table.due_dates], dtype=bool)
+        self.due_seconds = np.array(
+            [local_seconds(d) if d is not None else 0 for d in table.due_dates], dtype=np.int64)
+
+        self.name_group_ids = np.array(table.name_group_ids, dtype=np.int64)
+
+        # Tiers des groupes: index inversé des noms, présence d'un nom et de parties de nom
+        self.name_index = ThirdpartyIndex(matcher)
+        has_name = []
+        has_parts = []
+        for group_id, position in enumerate(table.name_group_positions):
+            thirdparty_name = table.thirdparty_names[position]
+            if thirdparty_name:
+                self.name_index.add(thirdparty_name, group_id)
+            has_name.append(bool(thirdparty_name))
+            has_parts.append(bool(thirdparty_name) and bool(table.name_parts_upper[position]))
+        self.group_has_name = np.array(has_name, dtype=bool)
+        self.group_has_parts = np.array(has_parts, dtype=bool)
+
+    def _amount_scores(self, amount: float):
+        """Règle du montant (_match_amount) sur toutes les factures"""
+        diff = np.abs(amount - self.remain_to_pay)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = diff / np.maximum(amount, self.remain_to_pay)
+        points = POINTS['amount']
+        return np.select(
+            [diff < self.matcher.amount_tolerance, ratio < 0.001, ratio < 0.01, ratio < 0.05],
+            [points['exact'], points['very_close'], points['close'], points['near']], 0)
+
+    def _period_scores(self, features):
+        """Règles année/mois de la transaction et période mentionnée dans le libellé"""
+        tx_year = features.period_code // 100
+        points = POINTS['period']
+        scores = np.where(self.period_years != tx_year, points['wrong_year'],
+                          np.where(self.period_codes == features.period_code, points['month'], points['year']))
+
+        if features.label_period:
+            label_code = features.label_period_code
+            label_points = POINTS['label_period']
+            scores = scores + np.where(self.period_codes == label_code, label_points['match'],
+                                       np.where(self.period_years != label_code // 100,
+                                                label_points['wrong_year'], 0))
+
+        return np.where(self.has_period, scores, 0)
+
+    def _due_date_scores(self, features):
+        """Règle de l'échéance (_match_date) sur toutes les factures"""
+        diff_days = np.abs((local_seconds(features.date) - self.due_seconds) // 86400)
+        points = POINTS['due_date']
+        scores = np.where(diff_days == 0, points['same_day'],
+                          np.where(diff_days <= 1, points['one_day'],
+                                   np.where(diff_days <= self.matcher.date_tolerance_days,
+                                            points['within_tolerance'] - diff_days, 0)))
+        return np.where(self.has_due_date, scores, 0)
+
+    def _ref_scores(self, features):
+        """Référence complète (vérifiée en Python sur les candidates) sinon partielle"""
+        scores = np.zeros(self.table.size, dtype=np.int64)
+        if not features.tx_ref:
+            return scores
+
+        refs = self.index.refs
+        tx_ref_clean = features.tx_ref_clean
+        scores[refs.suffix_matches(tx_ref_clean)] = POINTS['partial_reference']['match']
+
+        # L'index donne toutes les factures dont une référence peut correspondre complètement
+        found = set(refs.exact(features.tx_ref_normalized, tx_ref_clean))
+        refs.contained_in(tx_ref_clean, found)
+        refs.containing(tx_ref_clean, found)
+        for position in found:
+            for _, inv_ref_normalized, inv_ref_clean in self.table.refs[position]:
+                if self.matcher._refs_equivalent(features.tx_ref_normalized, tx_ref_clean,
+                                                 inv_ref_normalized, inv_ref_clean):
+                    scores[position] = POINTS['reference']['match']
+                    break
+        return scores
+
+    def _thirdparty_scores(self, features, name_token_ids: frozenset):
+        """
+        Règles du tiers, évaluées une fois par tiers puis diffusées à ses factures
+
+        Seuls les tiers proches du nom extrait (index inversé) ou présents dans le libellé
+        sont évalués en Python. Pour les autres le résultat est connu d'avance :
+        tiers différent et aucune partie du nom dans le libellé (deux malus).
+        """
+        extracted_name = features.extracted_name
+        if not extracted_name and not features.label:
+            return 0
+        group_positions = self.table.name_group_positions
+
+        if extracted_name and not features.extracted_name_normalized:
+            # Nom extrait vide une fois normalisé : proche de tous les tiers, pas de raccourci
+            hit_groups = range(len(group_positions))
+        else:
+            hit_groups = set()
+            if extracted_name:
+                hit_groups.update(group_id for _, group_id in
+                                  self.name_index.search(extracted_name, limit=None, exhaustive=True))
+            if features.label:
+                found = set()
+                self.index._label_name_candidates(features.label_upper, found)
+                hit_groups.update(self.table.name_group_ids[position] for position in found)
+
+        group_scores = np.zeros(len(group_positions), dtype=np.int64)
+        if extracted_name:
+            group_scores[self.group_has_name] += POINTS['thirdparty']['mismatch']
+            if features.label:
+                group_scores[self.group_has_parts] += POINTS['name_parts']['not_found']
+
+        for group_id in hit_groups:
+            group_scores[group_id] = self.matcher._score_thirdparty(
+                features, self.table, group_positions[group_id], name_token_ids)[0]
+        return group_scores[self.name_group_ids]
+
+    def _profiled_scores(self, features, name_token_ids: frozenset):
+        """Même somme que top_matches, chaque règle vectorisée étant mesurée par l'instrumentation"""
+        profiler = self.matcher.profiler
+        rules = (
+            ('vector_amount', lambda: self._amount_scores(features.amount)),
+            ('vector_period', lambda: self._period_scores(features)),
+            ('vector_reference', lambda: self._ref_scores(features)),
+            ('vector_due_date', lambda: self._due_date_scores(features)),
+            ('vector_thirdparty', lambda: self._thirdparty_scores(features, name_token_ids)),
+        )
+        scores = 0
+        for rule, compute in rules:
+            start = time.perf_counter()
+            rule_scores = np.broadcast_to(compute(), (self.table.size,))
+            elapsed = time.perf_counter() - start
+            profiler.record(rule, elapsed, self.table.size, int(np.count_nonzero(rule_scores)),
+                            int(rule_scores.sum()))
+            scores = scores + rule_scores
+        return scores
+
+    def _scores(self, features, name_token_ids: frozenset):
+        """Score de chaque facture de la table (somme des règles vectorisées)"""
+        if self.matcher.profiler is not None:
+            return self._profiled_scores(features, name_token_ids)
+        return (self._amount_scores(features.amount)
+                + self._period_scores(features)
+                + self._ref_scores(features)
+                + self._due_date_scores(features)
+                + self._thirdparty_scores(features, name_token_ids))
+
+    def scores_above_threshold(self, features, name_token_ids: frozenset) -> List[Tuple[int, int]]:
+        """
+        Toutes les factures qui atteignent le seuil, dans l'ordre de la table
+
+        Returns:
+            Liste de (position, score)
+        """
+        if self.table.size == 0:
+            return []
+        scores = self._scores(features, name_token_ids)
+        positions = np.flatnonzero(self.has_amount & (scores >= MIN_SCORE))
+        return list(zip(positions.tolist(), scores[positions].tolist()))
+
+    def top_matches(self, features, invoices: List[Dict], name_token_ids: frozenset, limit: int = 5) -> List[Dict]:
+        """
+        Retourne les meilleurs matches (même résultat que le scoring Python facture par facture)
+
+        Args:
+            features: TransactionFeatures de la transaction
+            invoices: Factures correspondant à la table (pour le résultat)
+            name_token_ids: Mots du nom extrait encodés avec le vocabulaire de la table
+            limit: Nombre maximum de matches retournés
+        """
+        if self.table.size == 0:
+            return []
+
+        scores = self._scores(features, name_token_ids)
+        # Seuil minimum, factures sans montant ignorées
+        positions = np.flatnonzero(self.has_amount & (scores >= MIN_SCORE))
+        # Tri stable par score décroissant : à score égal, l'ordre des factures est conservé
+        order = np.argsort(-scores[positions], kind='stable')[:limit]
+
+        matches = []
+        for position in positions[order]:
+            position = int(position)
+            match = self.matcher._score_invoice(features, invoices[position], self.table, position, name_token_ids)
+            if match:
+                matches.append(match)
+        return matches